@@ -0,0 +1,174 @@
+# Background avatar generation: job queue, prompt-hash dedup and WebP derivatives on a process pool
+import asyncio
+import hashlib
+import io
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from PIL import Image
+
+# Longest edge in pixels; thumbnail() never upscales, so "full" keeps the source size up to 1024
+AVATAR_SIZES = {"thumb": 64, "medium": 256, "full": 1024}
+WEBP_QUALITY = {"thumb": 80, "medium": 82, "full": 85}
+
+TERMINAL = ("done", "failed")
+
+
+def render_webp_sizes(data: bytes) -> Dict[str, bytes]:
+    """Decode once, encode every size as WebP. Runs in a worker process."""
+    renders = {}
+    with Image.open(io.BytesIO(data)) as source:
+        image = source.convert("RGBA" if "A" in source.getbands() else "RGB")
+    for name, edge in AVATAR_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((edge, edge), Image.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, "WEBP", quality=WEBP_QUALITY[name], method=4)
+        renders[name] = buffer.getvalue()
+    return renders
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class AvatarJob:
+    def __init__(self, prompt: str):
+        self.id = uuid.uuid4().hex
+        self.prompt = prompt
+        self.prompt_hash = prompt_hash(prompt)
+        self.status = "queued"
+        self.progress = 0
+        self.avatars: Optional[Dict[str, str]] = None
+        self.error: Optional[str] = None
+        self.user_ids: Set[str] = set()
+        self.applied: Set[str] = set()
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self._changed = asyncio.Event()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "avatars": self.avatars,
+            "avatar": self.avatars["medium"] if self.avatars else None,
+            "error": self.error,
+        }
+
+
+class AvatarJobs:
+    """Runs avatar generation off the request path.
+
+    ``submit`` returns at once. Identical prompts share one job while it is
+    queued or running, and every user attached to it gets its result through
+    ``on_done``; a request after it finishes starts a new generation, since
+    the user asked for a new picture. Finished jobs stay pollable for ``ttl``
+    seconds. Resizing and WebP encoding run on a process pool so they never
+    block the event loop.
+    """
+
+    def __init__(self, generate: Callable[[str], Awaitable[bytes]], store, url_for: Callable[[str], str],
+                 on_done: Callable[[str, Dict[str, str]], Awaitable[None]], ttl: float = 600.0):
+        self.generate = generate
+        self.store = store
+        self.url_for = url_for
+        self.on_done = on_done
+        self.ttl = ttl
+        self._jobs: Dict[str, AvatarJob] = {}
+        self._by_prompt: Dict[str, AvatarJob] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._executor: Optional[Executor] = None
+        self.submitted = 0
+        self.deduplicated = 0
+        self.failed = 0
+
+    def start(self, workers: int) -> None:
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+
+    def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get(self, job_id: str) -> Optional[AvatarJob]:
+        return self._jobs.get(job_id)
+
+    async def submit(self, prompt: str, user_id: str) -> AvatarJob:
+        self._purge()
+        self.submitted += 1
+        job = self._by_prompt.get(prompt_hash(prompt))
+        if job is not None and job.status not in TERMINAL:
+            self.deduplicated += 1
+            job.user_ids.add(user_id)
+            return job
+
+        job = AvatarJob(prompt)
+        job.user_ids.add(user_id)
+        self._jobs[job.id] = job
+        self._by_prompt[job.prompt_hash] = job
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def events(self, job: AvatarJob) -> AsyncIterator[Dict[str, Any]]:
+        """Snapshots of ``job`` on every change, ending with its terminal state."""
+        while True:
+            changed = job._changed
+            yield job.snapshot()
+            if job.status in TERMINAL:
+                return
+            await changed.wait()
+
+    def _update(self, job: AvatarJob, status: str, progress: int) -> None:
+        job.status = status
+        job.progress = progress
+        if status in TERMINAL:
+            job.finished_at = time.monotonic()
+        changed, job._changed = job._changed, asyncio.Event()
+        changed.set()
+
+    async def _apply(self, job: AvatarJob) -> None:
+        for user_id in sorted(job.user_ids - job.applied):
+            job.applied.add(user_id)
+            await self.on_done(user_id, job.avatars)
+
+    async def _run(self, job: AvatarJob) -> None:
+        try:
+            self._update(job, "generating", 10)
+            image = await self.generate(job.prompt)
+            self._update(job, "processing", 60)
+            renders = await asyncio.get_running_loop().run_in_executor(self._executor, render_webp_sizes, image)
+            self._update(job, "storing", 85)
+            job.avatars = {name: self.url_for(await self.store.put(data, "image/webp")) for name, data in renders.items()}
+            # Users who joined while earlier ones were being applied are picked up by the loop
+            while job.user_ids - job.applied:
+                await self._apply(job)
+            self._update(job, "done", 100)
+        except Exception as e:
+            self.failed += 1
+            job.error = str(e) or type(e).__name__
+            self._update(job, "failed", job.progress)
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and now - job.finished_at > self.ttl:
+                del self._jobs[job_id]
+                if self._by_prompt.get(job.prompt_hash) is job:
+                    del self._by_prompt[job.prompt_hash]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": len(self._jobs),
+            "running": sum(job.status not in TERMINAL for job in self._jobs.values()),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+        }
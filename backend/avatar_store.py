@@ -0,0 +1,147 @@
+# Content-addressed storage for avatar images; users documents keep only the URL
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+_DATA_URL = re.compile(r"^data:(?P<type>image/[\w.+-]+);base64,(?P<data>.*)$", re.DOTALL)
+
+# Magic bytes -> content type, for blobs stored without metadata
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+]
+
+
+def digest_of(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sniff_content_type(data: bytes) -> str:
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, content_type in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    return "application/octet-stream"
+
+
+def parse_data_url(value: str) -> Optional[Tuple[str, bytes]]:
+    """``(content_type, bytes)`` for a base64 image data URL, else None."""
+    match = _DATA_URL.match(value)
+    if not match:
+        return None
+    try:
+        return match.group("type"), base64.b64decode(match.group("data"), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+class LocalBlobStore:
+    """Blobs as files named by their SHA-256 under ``root/<2-char shard>/``."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def _write(self, digest: str, data: bytes) -> None:
+        path = self._path(digest)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temp file per write: concurrent puts of one digest (threads or
+        # processes) each rename a complete file, and the last rename wins harmlessly
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{digest}.", suffix=".tmp", delete=False) as tmp:
+            tmp.write(data)
+        try:
+            os.replace(tmp.name, path)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        try:
+            return self._path(digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    async def put(self, data: bytes, content_type: str) -> str:
+        digest = digest_of(data)
+        await asyncio.to_thread(self._write, digest, data)
+        return digest
+
+    async def get(self, digest: str) -> Optional[Tuple[bytes, str]]:
+        data = await asyncio.to_thread(self._read, digest)
+        return None if data is None else (data, sniff_content_type(data))
+
+
+class GridFSBlobStore:
+    """Blobs in a GridFS bucket, using the digest as the file ``_id``."""
+
+    def __init__(self, db, bucket_name: str = "avatars"):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+        self.files = db[f"{bucket_name}.files"]
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+
+    async def put(self, data: bytes, content_type: str) -> str:
+        digest = digest_of(data)
+        if await self.files.find_one({"_id": digest}, {"_id": 1}):
+            return digest
+        try:
+            await self.bucket.upload_from_stream_with_id(digest, digest, data, metadata={"content_type": content_type})
+        except DuplicateKeyError:
+            pass
+        return digest
+
+    async def get(self, digest: str) -> Optional[Tuple[bytes, str]]:
+        from gridfs.errors import NoFile
+
+        try:
+            stream = await self.bucket.open_download_stream(digest)
+        except NoFile:
+            return None
+        data = await stream.read()
+        content_type = (stream.metadata or {}).get("content_type") or sniff_content_type(data)
+        return data, content_type
+
+
+def blob_store_from_env(db, default_root: Path):
+    """AVATAR_STORE=local (AVATAR_STORE_DIR) or gridfs"""
+    backend = os.environ.get('AVATAR_STORE', 'local')
+    if backend == 'gridfs':
+        return GridFSBlobStore(db)
+    if backend == 'local':
+        return LocalBlobStore(Path(os.environ.get('AVATAR_STORE_DIR', str(default_root))))
+    raise RuntimeError(f"Unknown AVATAR_STORE: {backend}")
+
+
+async def migrate_data_url_avatars(users, store, url_for) -> int:
+    """Move avatars still stored inline as data URLs into ``store``."""
+    migrated = 0
+    async for doc in users.find({"avatar": {"$regex": "^data:"}}, {"user_id": 1, "avatar": 1}):
+        parsed = parse_data_url(doc["avatar"])
+        if parsed is None:
+            logger.error(f"Unreadable avatar data URL for user {doc.get('user_id')}")
+            continue
+        content_type, data = parsed
+        digest = await store.put(data, content_type)
+        await users.update_one({"_id": doc["_id"], "avatar": doc["avatar"]}, {"$set": {"avatar": url_for(digest)}})
+        migrated += 1
+    if migrated:
+        logger.info(f"Moved {migrated} inline avatars to the blob store")
+    return migrated
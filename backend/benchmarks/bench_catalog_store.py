@@ -0,0 +1,115 @@
+"""Open time, lookup cost and memory: a dict of MovieDetail vs the memory-mapped catalog.
+
+Builds a synthetic catalog of N films by varying the built-in ones, writes
+it with catalog_store.write_catalog into a temporary directory and compares
+loading everything into pydantic objects (what movies_data does for the
+built-in films) with opening it through MappedCatalog. Then times what a
+worker builds on top of the mapped catalog: the local recommender (features
+tokenized in memory vs precomputed with write_features) and the catalog
+service with its lazily built search indexes.
+
+    python backend/benchmarks/bench_catalog_store.py [--films N] [--lookups N]
+"""
+import argparse
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from catalog_service import CatalogService  # noqa: E402
+from catalog_store import MappedCatalog, write_catalog  # noqa: E402
+from local_recommender import LocalRecommender, write_features  # noqa: E402
+from movies_data import BUILTIN_MOVIES, BUILTIN_TAGS, MovieDetail  # noqa: E402
+
+
+def synthetic(count: int):
+    base = [movie.model_dump() for movie in BUILTIN_MOVIES.values()]
+    movies, tags = [], {}
+    for i in range(count):
+        source = base[i % len(base)]
+        movie_id = f"{source['id']}_{i}"
+        movies.append({**source, "id": movie_id, "title": f"{source['title']} {i}", "year": 1950 + i % 75, "rating": round(5 + (i % 50) / 10, 1)})
+        tags[movie_id] = BUILTIN_TAGS[source["id"]]
+    return movies, tags
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    movies, tags = synthetic(args.films)
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        meta = write_catalog(Path(tmp), movies, tags)
+        print(f"build: {time.perf_counter() - started:.2f} s, {meta['strings']} strings for {meta['string_references']} references")
+        size = sum(path.stat().st_size for path in Path(tmp).iterdir())
+        print(f"on disk: {size / 2**20:.1f} MiB")
+
+        # Timed before the dict is built: its allocations and tracemalloc skew later timings
+        started = time.perf_counter()
+        catalog = MappedCatalog(Path(tmp), MovieDetail, cache_size=1024)
+        mapped_s = time.perf_counter() - started
+        tracemalloc.start()
+        MappedCatalog(Path(tmp), MovieDetail)
+        mapped_mb = tracemalloc.get_traced_memory()[0] / 2**20
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        objects = {movie["id"]: MovieDetail(**movie) for movie in movies}
+        dict_s = time.perf_counter() - started
+        dict_mb = tracemalloc.get_traced_memory()[0] / 2**20
+        tracemalloc.stop()
+        print(f"load: dict {dict_s * 1000:.0f} ms / {dict_mb:.0f} MiB heap, mapped {mapped_s * 1000:.2f} ms / {mapped_mb:.2f} MiB heap")
+
+        ids = [movie["id"] for movie in movies]
+        random.seed(0)
+        sample = [random.choice(ids) for _ in range(args.lookups)]
+        hot = sample[:1000]
+        cases = [("dict", objects.__getitem__, sample), ("mapped, cold", catalog.__getitem__, sample[1000:]),
+                 ("mapped, warm", catalog.__getitem__, hot)]
+        for name, lookup, keys in cases:
+            if name == "mapped, warm":
+                # Ids that fit in the hydration cache
+                for movie_id in keys:
+                    lookup(movie_id)
+            started = time.perf_counter()
+            for movie_id in keys:
+                lookup(movie_id)
+            print(f"lookup {name:<13} {(time.perf_counter() - started) / len(keys) * 1e6:7.2f} us")
+        assert catalog[ids[-1]] == objects[ids[-1]]
+
+        for features in ("tokenized", "precomputed"):
+            if features == "precomputed":
+                started = time.perf_counter()
+                write_features(Path(tmp))
+                print(f"write_features: {time.perf_counter() - started:.2f} s")
+            engine_catalog = MappedCatalog(Path(tmp), MovieDetail)
+            started = time.perf_counter()
+            recommender = LocalRecommender(engine_catalog, engine_catalog.tags)
+            recommender_s = time.perf_counter() - started
+            started = time.perf_counter()
+            service = CatalogService(engine_catalog, engine_catalog.tags, version=engine_catalog.version)
+            service_s = time.perf_counter() - started
+            similarity = recommender.similarity.stats()
+            print(f"engines, {features:<11}: recommender {recommender_s * 1000:.0f} ms, service {service_s * 1000:.0f} ms, "
+                  f"{engine_catalog.stats()['hydrated']} records hydrated, similarity {similarity['bytes'] / 2**20:.1f} MiB "
+                  f"(dense: {args.films ** 2 * 4 / 2**20:.0f} MiB)")
+        started = time.perf_counter()
+        service.warm()
+        print(f"search indexes on first use: {time.perf_counter() - started:.2f} s {service.stats()['index_ms']}")
+        started = time.perf_counter()
+        recommender.recommend("мрачный триллер", service.candidates("мрачный триллер", 500))
+        print(f"local recommendation: {(time.perf_counter() - started) * 1000:.1f} ms")
+        print(f"max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Compare the verbose and compact LLM output contracts for /movies/recommend.
+
+Both payloads are rendered for the same film selections (taken from the local
+recommender so they are realistic), then measured in output tokens. Decode
+time dominates end-to-end latency, so the estimate is
+``ttft + tokens / decode_rate``.
+
+    python backend/benchmarks/bench_llm_contract.py
+    python backend/benchmarks/bench_llm_contract.py --live   # needs EMERGENT_LLM_KEY
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from movies_data import MOCK_MOVIES, MOVIE_TAGS  # noqa: E402
+from local_recommender import LocalRecommender  # noqa: E402
+
+QUERIES = [
+    "Как Интерстеллар, но медленнее и грустнее",
+    "Мрачный детектив с неожиданной развязкой",
+    "Что-то про одиночество в большом городе",
+    "Психологический триллер 2010-х",
+    "Эпичная фантастика про будущее человечества",
+]
+
+
+def count_tokens(text: str) -> int:
+    try:
+        import tiktoken
+    except ImportError:
+        # ~4 characters per token for mixed RU/EN JSON
+        return max(1, len(text) // 4)
+    return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+
+def verbose_payload(graph: dict) -> str:
+    """The previous contract: full node fields plus model-written links."""
+    return json.dumps({
+        "nodes": [
+            {key: node[key] for key in ("id", "title", "title_ru", "year", "vibe", "is_top")}
+            for node in graph["nodes"]
+        ],
+        "links": [
+            {"source": link["source"], "target": link["target"], "strength": link["strength"]}
+            for link in graph["links"]
+        ],
+        "query_summary": graph["query_summary"],
+    }, ensure_ascii=False)
+
+
+def compact_payload(graph: dict) -> str:
+    return json.dumps({
+        "nodes": [{"id": node["id"], "top": int(node["is_top"]), "vibe": node["vibe"]} for node in graph["nodes"]],
+        "summary": graph["query_summary"],
+    }, ensure_ascii=False, separators=(",", ":"))
+
+
+def run_offline(ttft_ms: float, tokens_per_second: float) -> None:
+    recommender = LocalRecommender(MOCK_MOVIES, MOVIE_TAGS)
+    totals = {"verbose": 0, "compact": 0}
+    print(f"{'query':<45} {'verbose':>8} {'compact':>8} {'ratio':>6}")
+    for query in QUERIES:
+        graph = recommender.recommend(query)
+        verbose = count_tokens(verbose_payload(graph))
+        compact = count_tokens(compact_payload(graph))
+        totals["verbose"] += verbose
+        totals["compact"] += compact
+        print(f"{query[:44]:<45} {verbose:>8} {compact:>8} {verbose / compact:>5.1f}x")
+
+    print()
+    for name, tokens in totals.items():
+        average = tokens / len(QUERIES)
+        latency = ttft_ms + average / tokens_per_second * 1000
+        print(f"{name:<8} avg {average:7.1f} output tokens, est. {latency:7.0f} ms end-to-end")
+    print(f"output tokens reduced {totals['verbose'] / totals['compact']:.1f}x "
+          f"(assuming {tokens_per_second:.0f} tok/s decode, {ttft_ms:.0f} ms TTFT)")
+
+
+async def run_live() -> None:
+    """Time the real model on the compact prompt the server uses."""
+    import server
+
+    for query in QUERIES:
+        started = time.perf_counter()
+        reply = await server.llm_provider.complete("recommend", query)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{query[:44]:<45} {count_tokens(reply):>6} tokens {elapsed:8.0f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ttft-ms", type=float, default=600.0)
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    run_offline(args.ttft_ms, args.tokens_per_second)
+    if args.live:
+        if not os.environ.get("EMERGENT_LLM_KEY"):
+            sys.exit("EMERGENT_LLM_KEY is not set")
+        print()
+        asyncio.run(run_live())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Per-request client setup cost: inline construction vs the LlmProvider layer.
+
+The "inline" path is what each handler used to do before calling the model:
+a function-local import, rebuilding the recommendation system prompt
+f-string around ALL_MOVIES_STR, and constructing LlmChat (plus a new
+OpenAIImageGeneration for avatars). No network calls are made.
+
+    python backend/benchmarks/bench_llm_provider.py [--iterations N]
+"""
+import argparse
+import sys
+import timeit
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+def inline_recommend_chat():
+    from emergentintegrations.llm.chat import LlmChat
+
+    return LlmChat(
+        api_key=server.EMERGENT_LLM_KEY,
+        session_id=f"recommend_{uuid.uuid4().hex[:8]}",
+        system_message=f"""Ты - эксперт по кино. На основе запроса выбери 15-20 фильмов из списка:
+{server.ALL_MOVIES_STR}
+
+Выбери 4-5 TOP фильмов (top: 1), остальные 10-15 - связанные (top: 0).
+Сначала перечисли TOP фильмы, затем связанные. Связи между фильмами НЕ нужны.
+Названия и годы НЕ пиши - только id из списка и vibe в 1-3 слова.
+
+Отвечай СТРОГО в компактном JSON без пробелов и переносов:
+{{"nodes":[{{"id":"arrival","top":1,"vibe":"философская тишина"}}],"summary":"Краткое описание"}}""",
+    ).with_model("openai", "gpt-5.2")
+
+
+def inline_image_client():
+    from emergentintegrations.llm.openai.image_generation import OpenAIImageGeneration
+
+    return OpenAIImageGeneration(api_key=server.EMERGENT_LLM_KEY)
+
+
+def provider_recommend_chat():
+    return server.llm_provider.chat("recommend")
+
+
+def provider_image_client():
+    return server.llm_provider.images
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    cases = [
+        ("recommend chat", inline_recommend_chat, provider_recommend_chat),
+        ("image client", inline_image_client, provider_image_client),
+    ]
+    print(f"{'case':<16} {'inline us':>10} {'provider us':>12} {'saved us':>9}")
+    for name, inline, provider in cases:
+        inline_us = min(timeit.repeat(inline, number=args.iterations, repeat=3)) / args.iterations * 1e6
+        provider_us = min(timeit.repeat(provider, number=args.iterations, repeat=3)) / args.iterations * 1e6
+        print(f"{name:<16} {inline_us:>10.2f} {provider_us:>12.2f} {inline_us - provider_us:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Serialization cost of the recommend and detail paths: FastAPI defaults vs the fast paths.
+
+"before" reproduces what the handlers did with FastAPI's stock machinery:
+json.loads plus validating constructors for LLM output, re-validating the
+returned GraphResponse against response_model, jsonable_encoder and the
+stdlib JSONResponse. "after" is the current code: model_validate_json for
+the LLM text, one validation pass over catalog-built dicts, pydantic-core
+JSON for the graph and pre-serialized detail bytes. Both parse cases
+include the similarity links, which cost the same either way. No network
+calls are made.
+
+    python backend/benchmarks/bench_serialization.py [--iterations N]
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+LLM_TEXT = json.dumps({
+    "nodes": [{"id": movie_id, "top": int(i < 5), "vibe": "атмосферный"} for i, movie_id in enumerate(list(server.MOCK_MOVIES)[:18])],
+    "summary": "Подборка атмосферного кино.",
+}, ensure_ascii=False, separators=(",", ":"))
+
+HISTORY = [
+    {"id": f"h{i}", "user_id": "user_1", "query": "мрачный детектив с неожиданной концовкой", "created_at": server.datetime.now(server.timezone.utc)}
+    for i in range(20)
+]
+
+GRAPH_FIELD = create_response_field(name="Response_recommend", type_=server.GraphResponse)
+
+
+def run(coroutine):
+    """Drive a coroutine that never actually suspends, without an event loop."""
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+def legacy_graph(result):
+    nodes = []
+    for item in result["nodes"]:
+        movie = server.MOCK_MOVIES[item["id"]]
+        nodes.append(server.MovieNode(
+            id=movie.id, title=movie.title, title_ru=movie.title_ru, year=movie.year,
+            poster=movie.poster, vibe=str(item["vibe"]), is_top=bool(item["top"]),
+        ))
+    return server.GraphResponse(
+        nodes=nodes,
+        links=server.movie_similarity.links_for([node.id for node in nodes]),
+        query_summary=str(result["summary"]),
+    )
+
+
+GRAPH = server.graph_from_llm_result(server.LlmGraph.model_validate_json(LLM_TEXT))
+
+
+def recommend_parse_before():
+    return legacy_graph(json.loads(LLM_TEXT))
+
+
+def recommend_parse_after():
+    return server.graph_from_llm_result(server.LlmGraph.model_validate_json(LLM_TEXT))
+
+
+def recommend_render_before():
+    content = run(serialize_response(field=GRAPH_FIELD, response_content=GRAPH))
+    return JSONResponse(content)
+
+
+def recommend_render_after():
+    return server.model_response(GRAPH)
+
+
+def detail_before():
+    return JSONResponse(jsonable_encoder(server.MOCK_MOVIES["interstellar"].model_dump()))
+
+
+def detail_after():
+    payload = server.catalog.payload("interstellar")
+    return server.Response(content=payload.raw, media_type="application/json")
+
+
+def history_before():
+    return JSONResponse(jsonable_encoder(HISTORY))
+
+
+def history_after():
+    return ORJSONResponse(HISTORY)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    assert json.loads(recommend_render_before().body) == json.loads(recommend_render_after().body)
+    assert json.loads(detail_before().body) == json.loads(detail_after().body)
+    assert json.loads(history_before().body) == json.loads(history_after().body)
+
+    cases = [
+        ("recommend parse", recommend_parse_before, recommend_parse_after),
+        ("recommend render", recommend_render_before, recommend_render_after),
+        ("movie detail", detail_before, detail_after),
+        ("history (Mongo)", history_before, history_after),
+    ]
+    print(f"{'case':<18} {'before us':>10} {'after us':>9} {'speedup':>8}")
+    for name, before, after in cases:
+        before_us = min(timeit.repeat(before, number=args.iterations, repeat=3)) / args.iterations * 1e6
+        after_us = min(timeit.repeat(after, number=args.iterations, repeat=3)) / args.iterations * 1e6
+        print(f"{name:<18} {before_us:>10.2f} {after_us:>9.2f} {before_us / after_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+# Catalog indexes over the catalog's columns: year/rating/tag lookups and typo-tolerant RU/EN title search
+import bisect
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from catalog_store import catalog_columns
+from text_search import InvertedIndex
+
+# BM25 field weights: the curated "why" lines say more per word than the synopsis
+TEXT_FIELDS = {"description": 1.0, "description_ru": 1.0, "why_recommended": 1.5}
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_title(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", text.lower().replace("ё", "е")).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DetailPayload(NamedTuple):
+    """One film's detail JSON, serialized once, with a strong ETag per encoding."""
+    raw: bytes
+    gzipped: bytes
+    etag: str
+    gzip_etag: str
+
+
+def serialize_detail(detail: Dict[str, Any], catalog_version: str) -> DetailPayload:
+    # Same bytes FastAPI's JSONResponse would render for the dict
+    raw = json.dumps(detail, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+    tag = f"{catalog_version[:12]}-{hashlib.sha256(raw).hexdigest()[:20]}"
+    # mtime=0 keeps the gzip bytes, and so the ETag, identical across restarts
+    return DetailPayload(raw, gzip.compress(raw, compresslevel=9, mtime=0), f'"{tag}"', f'"{tag}-gz"')
+
+
+def etag_matches(if_none_match: Optional[str], etags: Iterable[str]) -> bool:
+    """Weak comparison of an If-None-Match header against ``etags``, as RFC 9110 asks for GET."""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or not candidates.isdisjoint(etags)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for coding in (accept_encoding or "").lower().split(","):
+        name, _, params = coding.partition(";")
+        if name.strip() not in ("gzip", "*"):
+            continue
+        weight = params.replace(" ", "").removeprefix("q=")
+        try:
+            return not weight or float(weight) > 0
+        except ValueError:
+            return False
+    return False
+
+
+class PrefixTrie:
+    """Maps every prefix of the inserted keys to at most ``per_node`` ids.
+
+    Keys are inserted best-first (by rating), so each node already holds the
+    best completions and a lookup costs O(len(prefix)) regardless of catalog size.
+    """
+
+    def __init__(self, per_node: int = 20):
+        self.per_node = per_node
+        self._root: Dict[str, Any] = {}
+        self.nodes = 1
+
+    def insert(self, key: str, movie_id: str) -> None:
+        node = self._root
+        for char in key:
+            child = node.get(char)
+            if child is None:
+                child = node[char] = {"": []}
+                self.nodes += 1
+            node = child
+            ids = node[""]
+            if len(ids) < self.per_node and movie_id not in ids:
+                ids.append(movie_id)
+
+    def lookup(self, prefix: str) -> List[str]:
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get("", [])
+
+
+class TrigramIndex:
+    """Posting lists of title trigrams; similarity is the Jaccard index of the trigram sets.
+
+    Postings are frozen into NumPy arrays on first search, so scoring every
+    candidate is a ``bincount`` over the query's lists rather than a Python loop.
+    """
+
+    def __init__(self):
+        self._lists: Dict[str, List[int]] = defaultdict(list)
+        self._owners: List[str] = []
+        self._sizes: List[int] = []
+        self._postings: Optional[Dict[str, np.ndarray]] = None
+
+    def add(self, movie_id: str, key: str) -> None:
+        grams = trigrams(key)
+        slot = len(self._owners)
+        self._owners.append(movie_id)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            self._lists[gram].append(slot)
+        self._postings = None
+
+    def _freeze(self) -> Dict[str, np.ndarray]:
+        self._postings = {gram: np.array(slots, dtype=np.int32) for gram, slots in self._lists.items()}
+        self._size_array = np.array(self._sizes, dtype=np.float32)
+        return self._postings
+
+    def search(self, query: str, threshold: float, limit: int) -> List[Tuple[str, float]]:
+        postings = self._postings if self._postings is not None else self._freeze()
+        grams = trigrams(query)
+        lists = [postings[gram] for gram in grams if gram in postings]
+        if not lists:
+            return []
+        shared = np.bincount(np.concatenate(lists), minlength=len(self._owners))
+        scores = shared / (len(grams) + self._size_array - shared)
+        candidates = np.flatnonzero(scores >= threshold)
+        best: Dict[str, float] = {}
+        for slot in candidates[np.argsort(-scores[candidates], kind="stable")]:
+            movie_id = self._owners[slot]
+            if movie_id not in best:
+                best[movie_id] = float(scores[slot])
+                if len(best) == limit:
+                    break
+        return list(best.items())
+
+    @property
+    def size(self) -> int:
+        return len(self._lists)
+
+
+class TitleIndex(NamedTuple):
+    by_title: Dict[str, List[str]]
+    trie: PrefixTrie
+    fuzzy: TrigramIndex
+
+
+class CatalogService:
+    """Catalog plus its secondary indexes.
+
+    Rating and year order are built at load from the catalog's columns; the
+    title, tag and full-text indexes are built from the columns on first use.
+    No record is hydrated for any of them, so a large memory-mapped catalog
+    costs a worker only what it actually serves.
+    """
+
+    def __init__(self, movies: Dict[str, Any], tags: Dict[str, Dict[str, Any]], fuzzy_threshold: float = 0.3,
+                 version: str = ""):
+        started = time.perf_counter()
+        self.movies = movies
+        self.tags = tags
+        self.version = version
+        self.fuzzy_threshold = fuzzy_threshold
+        self.ids = list(movies)
+        columns = catalog_columns(movies, tags, ("rating", "year"))
+        ratings = np.asarray(columns["rating"], dtype=np.float64)
+        # Rows best-rated first, ties in catalog order
+        self._rating_order = np.argsort(-ratings, kind="stable")
+
+        self.by_rating = [self.ids[row] for row in self._rating_order]
+        self._ratings_desc = (-ratings[self._rating_order]).tolist()
+        self._years = sorted(zip(np.asarray(columns["year"]).tolist(), self.ids))
+        self.index_ms: Dict[str, float] = {}
+        self._indexes: Dict[str, Any] = {}
+        self._index_lock = threading.Lock()
+        # Detail dicts and payloads are built on first request and then kept,
+        # so a large memory-mapped catalog is not dumped in full per worker
+        self._details: Dict[str, Dict[str, Any]] = {}
+        self._payloads: Dict[str, DetailPayload] = {}
+        first = next(iter(movies), None)
+        self.detail_fields = frozenset(self.detail(first) or {}) if first is not None else frozenset()
+        self.build_ms = (time.perf_counter() - started) * 1000
+
+    def _index(self, name: str, build: Callable[[], Any]) -> Any:
+        """Index ``name``, built by ``build`` on first use; ``warm`` may be building it in a thread."""
+        index = self._indexes.get(name)
+        if index is None:
+            with self._index_lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    started = time.perf_counter()
+                    index = self._indexes[name] = build()
+                    self.index_ms[name] = (time.perf_counter() - started) * 1000
+        return index
+
+    def warm(self) -> None:
+        """Build every lazy index now, e.g. in a worker thread at startup."""
+        for name, build in (("titles", self._build_titles), ("tags", self._build_tags), ("text", self._build_text)):
+            self._index(name, build)
+
+    @property
+    def title_index(self) -> TitleIndex:
+        return self._index("titles", self._build_titles)
+
+    @property
+    def by_title(self) -> Dict[str, List[str]]:
+        return self.title_index.by_title
+
+    @property
+    def trie(self) -> PrefixTrie:
+        return self.title_index.trie
+
+    @property
+    def fuzzy(self) -> TrigramIndex:
+        return self.title_index.fuzzy
+
+    @property
+    def by_tag(self) -> Dict[str, Set[str]]:
+        return self._index("tags", self._build_tags)
+
+    @property
+    def text(self) -> InvertedIndex:
+        return self._index("text", self._build_text)
+
+    def _build_titles(self) -> TitleIndex:
+        columns = catalog_columns(self.movies, self.tags, ("title", "title_ru"))
+        # Full normalized title -> ids, best-rated first; the trie keeps only 20 ids per prefix
+        by_title: Dict[str, List[str]] = defaultdict(list)
+        trie = PrefixTrie()
+        fuzzy = TrigramIndex()
+        # Best-rated first, so every trie node keeps the best completions
+        for row in self._rating_order:
+            movie_id = self.ids[row]
+            for title in {normalize_title(title): None for title in (columns["title"][row], columns["title_ru"][row]) if title}:
+                by_title[title].append(movie_id)
+                # Every word start is an entry point, so "runner" finds "Blade Runner 2049"
+                words = title.split()
+                for i in range(len(words)):
+                    trie.insert(" ".join(words[i:]), movie_id)
+                    fuzzy.add(movie_id, " ".join(words[i:]))
+        return TitleIndex(dict(by_title), trie, fuzzy)
+
+    def _build_tags(self) -> Dict[str, Set[str]]:
+        columns = catalog_columns(self.movies, self.tags, ("tags", "vibe"))
+        by_tag: Dict[str, Set[str]] = defaultdict(set)
+        for movie_id, tags, vibe in zip(self.ids, columns["tags"], columns["vibe"]):
+            for tag in list(tags or ()) + normalize_title(vibe or "").split():
+                by_tag[normalize_title(tag)].add(movie_id)
+        return dict(by_tag)
+
+    def _build_text(self) -> InvertedIndex:
+        columns = catalog_columns(self.movies, self.tags, ("description", "description_ru", "why_recommended"))
+        text = InvertedIndex(TEXT_FIELDS)
+        for movie_id, description, description_ru, why_recommended in zip(
+                self.ids, columns["description"], columns["description_ru"], columns["why_recommended"]):
+            text.add(movie_id, {
+                "description": description,
+                "description_ru": description_ru or "",
+                "why_recommended": " ".join(why_recommended),
+            })
+        return text
+
+    def titles(self, movie_id: str) -> List[str]:
+        return self._titles_of(self.movies[movie_id])
+
+    @staticmethod
+    def _titles_of(movie: Any) -> List[str]:
+        return [normalize_title(title) for title in (movie.title, movie.title_ru) if title]
+
+    def get(self, movie_id: str) -> Optional[Any]:
+        return self.movies.get(movie_id)
+
+    def detail(self, movie_id: str) -> Optional[Dict[str, Any]]:
+        detail = self._details.get(movie_id)
+        if detail is None and movie_id in self.movies:
+            detail = self._details[movie_id] = self.movies[movie_id].model_dump()
+        return detail
+
+    def payload(self, movie_id: str) -> Optional[DetailPayload]:
+        payload = self._payloads.get(movie_id)
+        if payload is None:
+            detail = self.detail(movie_id)
+            if detail is None:
+                return None
+            payload = self._payloads[movie_id] = serialize_detail(detail, self.version)
+        return payload
+
+    def details(self, movie_ids: Iterable[str], fields: Optional[Iterable[str]] = None) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """``({id: detail}, missing ids)``; ``fields`` keeps only those keys (``id`` is always kept)."""
+        keep = None if fields is None else ["id"] + [field for field in fields if field != "id"]
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for movie_id in movie_ids:
+            detail = self.detail(movie_id)
+            if detail is None:
+                if movie_id not in missing:
+                    missing.append(movie_id)
+            elif movie_id not in found:
+                found[movie_id] = detail if keep is None else {field: detail[field] for field in keep}
+        return found, missing
+
+    def in_years(self, start: int, end: int) -> List[str]:
+        lo = bisect.bisect_left(self._years, (start, ""))
+        hi = bisect.bisect_right(self._years, (end, "￿"))
+        return [movie_id for _, movie_id in self._years[lo:hi]]
+
+    def top_rated(self, min_rating: float = 0.0, limit: Optional[int] = None) -> List[str]:
+        ids = self.by_rating[:bisect.bisect_right(self._ratings_desc, -min_rating)]
+        return ids[:limit] if limit is not None else ids
+
+    def with_tag(self, tag: str) -> Set[str]:
+        return set(self.by_tag.get(normalize_title(tag), ()))
+
+    def search(self, query: str, limit: int = 10, allowed: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Exact titles, then prefix completions (best-rated first), then fuzzy title matches."""
+        text = normalize_title(query)
+        if not text:
+            return []
+        allowed = set(allowed) if allowed is not None else None
+        results: List[Dict[str, Any]] = []
+        seen: Set[str] = set()
+
+        def take(movie_id: str, match: str, score: float) -> None:
+            if movie_id in seen or (allowed is not None and movie_id not in allowed):
+                return
+            seen.add(movie_id)
+            results.append(self._hit(movie_id, match, score))
+
+        for movie_id in self.by_title.get(text, ()):
+            take(movie_id, "exact", 1.0)
+        for movie_id in self.trie.lookup(text):
+            take(movie_id, "prefix", 1.0)
+        if len(results) < limit:
+            for movie_id, score in self.fuzzy.search(text, self.fuzzy_threshold, limit * 2):
+                take(movie_id, "fuzzy", round(score, 3))
+        return results[:limit]
+
+    def search_text(self, query: str, limit: int = 10, allowed: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """BM25-ranked matches on what the film is about rather than its title."""
+        return [self._hit(movie_id, "text", round(score, 3)) for movie_id, score in self.text.search(query, limit, allowed)]
+
+    def candidates(self, query: str, limit: int) -> List[str]:
+        """Ids with any content match for ``query``, best first, for pre-filtering a recommender."""
+        return [movie_id for movie_id, _ in self.text.search(query, limit)]
+
+    def _hit(self, movie_id: str, match: str, score: float) -> Dict[str, Any]:
+        movie = self.movies[movie_id]
+        return {
+            "id": movie_id,
+            "title": movie.title,
+            "title_ru": movie.title_ru,
+            "year": movie.year,
+            "poster": movie.poster,
+            "rating": movie.rating,
+            "match": match,
+            "score": score,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        # Indexes that have not been needed yet are reported as None rather than built here
+        built = self._indexes
+        return {
+            "films": len(self.movies),
+            "tags": len(built["tags"]) if "tags" in built else None,
+            "titles": len(built["titles"].by_title) if "titles" in built else None,
+            "trie_nodes": built["titles"].trie.nodes if "titles" in built else None,
+            "trigrams": built["titles"].fuzzy.size if "titles" in built else None,
+            "text_index": built["text"].stats() if "text" in built else None,
+            "payloads": len(self._payloads),
+            "payload_bytes": sum(len(payload.raw) for payload in self._payloads.values()),
+            "payload_gzip_bytes": sum(len(payload.gzipped) for payload in self._payloads.values()),
+            "build_ms": round(self.build_ms, 3),
+            "index_ms": {name: round(ms, 3) for name, ms in self.index_ms.items()},
+        }
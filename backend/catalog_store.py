@@ -0,0 +1,326 @@
+# Read-only, memory-mapped columnar catalog built offline; records are hydrated on access
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+NUMERIC_COLUMNS = {"year": np.int32, "rating": np.float32}
+# One string-table index per record; -1 stands for None
+STRING_COLUMNS = ("id", "title", "title_ru", "poster", "backdrop", "description", "description_ru", "vibe")
+# Variable-length columns: an offsets array (count + 1) into a flat array of string indices
+LIST_COLUMNS = ("why_recommended", "tags")
+# Lists of small objects; each object is interned as compact JSON, so repeated
+# providers and reviews are stored once for the whole catalog
+OBJECT_LIST_COLUMNS = ("reviews", "watch_providers")
+
+# Columns that live in MOVIE_TAGS rather than MovieDetail
+TAG_COLUMNS = ("vibe", "tags")
+
+NONE = -1
+
+
+def id_hash(movie_id: str) -> int:
+    """Stable across processes, unlike ``hash()``; the key of the id index."""
+    return int.from_bytes(hashlib.blake2b(movie_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _items(array: np.ndarray, code: str) -> memoryview:
+    """Native memoryview over a mapped array: indexing it yields plain Python
+    numbers, several times cheaper than numpy scalars on the lookup path."""
+    return memoryview(np.ascontiguousarray(array)).cast("B").cast(code)
+
+
+class StringTableBuilder:
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self.values: List[str] = []
+        self.references = 0
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return NONE
+        self.references += 1
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def write(self, directory: Path) -> None:
+        encoded = [value.encode("utf-8") for value in self.values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        (directory / "strings.bin").write_bytes(b"".join(encoded))
+        np.save(directory / "strings.offsets.npy", offsets)
+
+
+class StringTable:
+    def __init__(self, directory: Path):
+        self._offsets = _items(np.load(directory / "strings.offsets.npy", mmap_mode="r"), "q")
+        with open(directory / "strings.bin", "rb") as source:
+            # mmap refuses empty files
+            self._data = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get(self, index: int) -> Optional[str]:
+        if index == NONE:
+            return None
+        return self._data[self._offsets[index]:self._offsets[index + 1]].decode("utf-8")
+
+
+def write_catalog(directory: Path, movies: Iterable[Dict[str, Any]], tags: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Write ``movies`` (MovieDetail dicts) and their ``tags`` entries as a catalog directory.
+
+    Rows are sorted by id and an id-hash index is written next to them, so
+    readers find a film without building an id -> row dict in every worker.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rows = sorted(movies, key=lambda movie: movie["id"])
+    strings = StringTableBuilder()
+    digest = hashlib.sha256()
+
+    columns: Dict[str, List[Any]] = {name: [] for name in (*NUMERIC_COLUMNS, *STRING_COLUMNS)}
+    lists: Dict[str, Tuple[List[int], List[int]]] = {name: ([0], []) for name in (*LIST_COLUMNS, *OBJECT_LIST_COLUMNS)}
+    for movie in rows:
+        record = {**movie, **{name: tags.get(movie["id"], {}).get(name) for name in TAG_COLUMNS}}
+        record["tags"] = record["tags"] or []
+        digest.update(json.dumps(record, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        for name in NUMERIC_COLUMNS:
+            columns[name].append(record[name])
+        for name in STRING_COLUMNS:
+            columns[name].append(strings.intern(record.get(name)))
+        for name in (*LIST_COLUMNS, *OBJECT_LIST_COLUMNS):
+            offsets, items = lists[name]
+            for value in record.get(name) or []:
+                if name in OBJECT_LIST_COLUMNS:
+                    value = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+                items.append(strings.intern(value))
+            offsets.append(len(items))
+
+    for name, dtype in NUMERIC_COLUMNS.items():
+        np.save(directory / f"{name}.npy", np.array(columns[name], dtype=dtype))
+    for name in STRING_COLUMNS:
+        np.save(directory / f"{name}.npy", np.array(columns[name], dtype=np.int32))
+    for name, (offsets, items) in lists.items():
+        np.save(directory / f"{name}.offsets.npy", np.array(offsets, dtype=np.int64))
+        np.save(directory / f"{name}.items.npy", np.array(items, dtype=np.int32))
+    # Id index: 64-bit id hashes sorted, with the row each one belongs to
+    hashes = np.array([id_hash(movie["id"]) for movie in rows], dtype=np.uint64)
+    order = np.argsort(hashes, kind="stable")
+    np.save(directory / "id_hash.npy", hashes[order])
+    np.save(directory / "id_row.npy", order.astype(np.int32))
+    strings.write(directory)
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "count": len(rows),
+        "version": digest.hexdigest()[:16],
+        "strings": len(strings.values),
+        "string_references": strings.references,
+    }
+    # meta.json goes last: a directory without it is an unfinished build
+    (directory / "meta.json").write_text(json.dumps(meta, indent=2))
+    return meta
+
+
+class CatalogIds(Sequence):
+    """Film ids in row (sorted) order, decoded from the string table on access."""
+
+    def __init__(self, directory: Path, column: memoryview, strings: StringTable):
+        self._column = column
+        self._strings = strings
+        # Plain ndarray over the mapping: searchsorted on the np.memmap subclass is twice as slow
+        self._hashes = np.asarray(np.load(directory / "id_hash.npy", mmap_mode="r"))
+        self._rows = _items(np.load(directory / "id_row.npy", mmap_mode="r"), "i")
+
+    def __len__(self) -> int:
+        return len(self._column)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        return self._strings.get(self._column[row])
+
+    def row(self, movie_id: str) -> Optional[int]:
+        """Row of ``movie_id`` via the id index: one binary search over the mapped hashes."""
+        key = np.uint64(id_hash(movie_id))
+        position = int(np.searchsorted(self._hashes, key))
+        # Walk the (almost always single) run of equal hashes and compare the ids
+        while position < len(self._rows) and self._hashes[position] == key:
+            row = self._rows[position]
+            if self[row] == movie_id:
+                return row
+            position += 1
+        return None
+
+
+class MappedCatalog(Mapping):
+    """``{id: MovieDetail}`` over a catalog directory written by ``write_catalog``.
+
+    Every array is memory-mapped read-only, so workers share the same page
+    cache and opening a catalog costs the same for 30 films or 100k. A record
+    becomes a ``model`` instance only when it is looked up; the most recent
+    ``cache_size`` of them are kept.
+    """
+
+    def __init__(self, directory: Path, model, cache_size: int = 4096):
+        self.directory = Path(directory)
+        self.model = model
+        self.meta = json.loads((self.directory / "meta.json").read_text())
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise RuntimeError(f"Unsupported catalog format {self.meta.get('format')} in {self.directory}")
+        self.version = self.meta["version"]
+        self.strings = StringTable(self.directory)
+        load = lambda name, code: _items(np.load(self.directory / f"{name}.npy", mmap_mode="r"), code)  # noqa: E731
+        self._columns = {name: load(name, "f" if name == "rating" else "i") for name in (*NUMERIC_COLUMNS, *STRING_COLUMNS)}
+        self._lists = {name: (load(f"{name}.offsets", "q"), load(f"{name}.items", "i")) for name in (*LIST_COLUMNS, *OBJECT_LIST_COLUMNS)}
+        self.ids = CatalogIds(self.directory, self._columns["id"], self.strings)
+        self.tags = CatalogTags(self)
+        self._hydrate = lru_cache(maxsize=cache_size)(self._hydrate_row)
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ids)
+
+    def __contains__(self, movie_id: object) -> bool:
+        return isinstance(movie_id, str) and self.ids.row(movie_id) is not None
+
+    def __getitem__(self, movie_id: str):
+        row = self.ids.row(movie_id) if isinstance(movie_id, str) else None
+        if row is None:
+            raise KeyError(movie_id)
+        return self._hydrate(row)
+
+    def string(self, name: str, row: int) -> Optional[str]:
+        return self.strings.get(self._columns[name][row])
+
+    def strings_of(self, name: str, row: int) -> List[str]:
+        offsets, items = self._lists[name]
+        return [self.strings.get(index) for index in items[offsets[row]:offsets[row + 1]]]
+
+    def column(self, name: str) -> Any:
+        """Field ``name`` of every row in row order, read straight from the columns;
+        numeric fields come back as arrays, string and list fields as lists."""
+        if name in NUMERIC_COLUMNS:
+            values = np.asarray(self._columns[name])
+            # Same shortest-decimal rounding as ``record``
+            return values.astype(str).astype(np.float64) if name == "rating" else values
+        if name in STRING_COLUMNS:
+            return [self.strings.get(index) for index in self._columns[name]]
+        return [self.strings_of(name, row) for row in range(len(self))]
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """Plain dict of the MovieDetail fields of ``row``."""
+        record = {name: self.string(name, row) for name in STRING_COLUMNS if name not in TAG_COLUMNS}
+        record["year"] = self._columns["year"][row]
+        # float32 -> shortest decimal, so 8.1 comes back as 8.1 and not 8.100000381
+        record["rating"] = float(str(np.float32(self._columns["rating"][row])))
+        for name in LIST_COLUMNS:
+            if name not in TAG_COLUMNS:
+                record[name] = self.strings_of(name, row)
+        for name in OBJECT_LIST_COLUMNS:
+            record[name] = [json.loads(value) for value in self.strings_of(name, row)]
+        return record
+
+    def _hydrate_row(self, row: int):
+        return self.model.model_validate(self.record(row))
+
+    def stats(self) -> Dict[str, Any]:
+        info = self._hydrate.cache_info()
+        return {
+            "films": len(self),
+            "strings": len(self.strings),
+            "hydrated": info.currsize,
+            "hydrate_hits": info.hits,
+            "hydrate_misses": info.misses,
+        }
+
+
+class CatalogTags(Mapping):
+    """``{id: {"vibe", "tags"}}`` view with the shape of the built-in MOVIE_TAGS."""
+
+    def __init__(self, catalog: MappedCatalog):
+        self._catalog = catalog
+
+    def __len__(self) -> int:
+        return len(self._catalog)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._catalog.ids)
+
+    def __getitem__(self, movie_id: str) -> Dict[str, Any]:
+        row = self._catalog.ids.row(movie_id) if isinstance(movie_id, str) else None
+        if row is None:
+            raise KeyError(movie_id)
+        return {"vibe": self._catalog.string("vibe", row) or "", "tags": self._catalog.strings_of("tags", row)}
+
+
+def catalog_columns(movies: Mapping, tags: Mapping, names: Iterable[str]) -> Dict[str, Any]:
+    """``{name: values in iteration order}`` for MovieDetail fields plus "vibe"/"tags".
+
+    A MappedCatalog answers from its columns without hydrating a record; any
+    other ``{id: MovieDetail}`` mapping is read attribute by attribute.
+    """
+    if isinstance(movies, MappedCatalog):
+        return {name: movies.column(name) for name in names}
+    columns: Dict[str, Any] = {}
+    for name in names:
+        if name in TAG_COLUMNS:
+            columns[name] = [tags.get(movie_id, {}).get(name) for movie_id in movies]
+        else:
+            values = [getattr(movie, name) for movie in movies.values()]
+            columns[name] = np.array(values, dtype=np.float64 if name == "rating" else np.int32) if name in NUMERIC_COLUMNS else values
+    return columns
+
+
+def read_jsonl(path: Path) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """MovieDetail records from a JSONL export; optional "vibe"/"tags" keys go to the tags table."""
+    movies, tags = [], {}
+    with open(path, encoding="utf-8") as source:
+        for line in source:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            tags[record["id"]] = {name: record.pop(name) for name in TAG_COLUMNS if name in record}
+            movies.append(record)
+    return movies, tags
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a memory-mapped catalog directory for CATALOG_PATH")
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--jsonl", type=Path, help="MovieDetail records, one per line (default: the built-in catalog)")
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    if args.jsonl:
+        movies, tags = read_jsonl(args.jsonl)
+    else:
+        from movies_data import BUILTIN_MOVIES, BUILTIN_TAGS
+
+        movies, tags = [movie.model_dump() for movie in BUILTIN_MOVIES.values()], BUILTIN_TAGS
+    meta = write_catalog(args.output, movies, tags)
+    # The local recommender's vectors, so workers map them instead of tokenizing the catalog
+    from local_recommender import write_features
+
+    meta["features"] = write_features(args.output)
+    print(json.dumps(meta))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Consecutive-failure circuit breaker for the LLM provider
+import time
+from typing import Any, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and rejects calls
+    for ``cooldown`` seconds. It then lets a single probe through (half-open);
+    the probe's outcome closes the breaker or re-opens it for another cool-down.
+
+    A probe that never reports back (e.g. it was shed before reaching the
+    provider) is replaced by a new one after another cool-down.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self.opened = 0
+        self.short_circuited = 0
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self._opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._probe_started = None
+        if self.state == HALF_OPEN and (self._probe_started is None or now - self._probe_started >= self.cooldown):
+            self._probe_started = now
+            return True
+        self.short_circuited += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            self._probe_started = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "cooldown_s": self.cooldown,
+            "opened": self.opened,
+            "short_circuited": self.short_circuited,
+        }
@@ -0,0 +1,148 @@
+# Onboarding compliments precomputed for every menu combination, composed from generic phrases for the rest
+import random
+from itertools import product
+from typing import Any, Dict, List, Tuple
+
+from recommend_cache import normalize_query
+
+# Onboarding menu (frontend App.js) -> two interchangeable sentences per answer
+GENRE_PHRASES = {
+    "Научная фантастика": [
+        "Любовь к научной фантастике выдаёт в вас человека, который смотрит дальше горизонта.",
+        "Научная фантастика — выбор тех, кто не боится больших вопросов о будущем.",
+    ],
+    "Триллер": [
+        "Страсть к триллерам говорит об остром уме и крепких нервах.",
+        "Триллеры выбирают те, кто любит разгадывать загадки раньше героев.",
+    ],
+    "Драма": [
+        "Выбор драмы говорит о вашей чуткости к настоящим человеческим историям.",
+        "Драма — жанр для тех, кто умеет сопереживать по-настоящему.",
+    ],
+    "Криминал": [
+        "Интерес к криминальным историям выдаёт в вас внимательного детектива.",
+        "Криминальное кино выбирают ценители сложных характеров и точных деталей.",
+    ],
+    "Фэнтези": [
+        "Любовь к фэнтези показывает, что вы не разучились верить в чудо.",
+        "Фэнтези выбирают мечтатели с богатым воображением.",
+    ],
+}
+
+MOOD_PHRASES = {
+    "Философское": [
+        "Философское настроение — знак того, что кино для вас не просто развлечение, а повод подумать.",
+        "Вам важны фильмы, после которых хочется долго молчать и размышлять.",
+    ],
+    "Напряжённое": [
+        "Тяга к напряжению выдаёт человека, который любит, когда сюжет держит до последней минуты.",
+        "Вы цените кино, от которого невозможно оторваться ни на секунду.",
+    ],
+    "Эпическое": [
+        "Любовь к эпическому размаху говорит о том, что вы мыслите масштабно.",
+        "Вас вдохновляют большие истории, и это прекрасно.",
+    ],
+    "Меланхоличное": [
+        "Меланхоличное настроение выдаёт тонкую и глубоко чувствующую натуру.",
+        "Вы умеете находить красоту в тихой грусти — это редкий дар.",
+    ],
+    "Динамичное": [
+        "Любовь к динамике говорит о вашей энергии и жажде новых впечатлений.",
+        "Вы цените кино, которое не даёт заскучать ни на минуту.",
+    ],
+}
+
+ERA_PHRASES = {
+    "Классика (до 2000)": [
+        "А уважение к классике — признак настоящего синефила.",
+        "А любовь к классике показывает, что вы цените проверенное временем.",
+    ],
+    "2000-е": [
+        "А кино 2000-х — отличный выбор: эпоха смелых экспериментов ждёт вас.",
+        "А нулевые подарили немало фильмов, которые вам точно понравятся.",
+    ],
+    "2010-е": [
+        "А 2010-е — десятилетие современных шедевров, и мы покажем лучшие из них.",
+        "А вкус к кино 2010-х обещает нам много общих находок.",
+    ],
+    "Современные (2020+)": [
+        "А интерес к новинкам показывает, что вы всегда держите руку на пульсе.",
+        "А свежее кино — отличный выбор для того, кто открыт новому.",
+    ],
+    "Любые": [
+        "А открытость к фильмам любых эпох — редкое и ценное качество.",
+        "А раз эпоха для вас не важна, нас ждёт по-настоящему широкая карта фильмов.",
+    ],
+}
+
+# Answers outside the menu (the API takes free text) get a phrase that names nothing
+GENERIC_PHRASES = {
+    "genre": [
+        "Ваш выбор жанра говорит о человеке, который знает, чего хочет от кино.",
+        "Такой выбор жанра выдаёт зрителя со своим, непохожим на других вкусом.",
+    ],
+    "mood": [
+        "Настроение, которое вы ищете, подскажет нам самые точные находки.",
+        "Вы точно знаете, какие чувства хотите испытать у экрана, — это редкость.",
+    ],
+    "era": [
+        "А ваш взгляд на эпохи кино сделает карту фильмов по-настоящему вашей.",
+        "А с таким выбором нас ждёт немало открытий.",
+    ],
+}
+
+DEFAULT_COMPLIMENT = "У вас отличный вкус в кино! Мы подберём для вас идеальные фильмы."
+
+Key = Tuple[str, str, str]
+
+
+def compliment_key(genre: str, mood: str, era: str) -> Key:
+    return normalize_query(genre or ""), normalize_query(mood or ""), normalize_query(era or "")
+
+
+class ComplimentStore:
+    """In-memory table of compliment variants per (genre, mood, era).
+
+    Every menu combination is composed from the phrase tables at construction,
+    so onboarding never waits on the LLM. Answers outside the menu are not
+    added to the table: their part of the compliment comes from
+    ``GENERIC_PHRASES``, so free-form input can neither trigger LLM calls nor
+    grow the table past the menu's 125 combinations.
+    """
+
+    def __init__(self):
+        self._variants: Dict[Key, List[str]] = {}
+        self._phrases = [
+            {normalize_query(answer): phrases for answer, phrases in table.items()}
+            for table in (GENRE_PHRASES, MOOD_PHRASES, ERA_PHRASES)
+        ]
+        self.hits = 0
+        self.misses = 0
+        for genre, mood, era in product(GENRE_PHRASES, MOOD_PHRASES, ERA_PHRASES):
+            self._variants[compliment_key(genre, mood, era)] = [
+                " ".join(parts)
+                for parts in product(GENRE_PHRASES[genre], MOOD_PHRASES[mood], ERA_PHRASES[era])
+            ]
+
+    def pick(self, genre: str, mood: str, era: str) -> str:
+        key = compliment_key(genre, mood, era)
+        variants = self._variants.get(key)
+        if variants:
+            self.hits += 1
+            return random.choice(variants)
+        self.misses += 1
+        known = [phrases.get(answer) for phrases, answer in zip(self._phrases, key)]
+        if not any(known):
+            return DEFAULT_COMPLIMENT
+        return " ".join(
+            random.choice(phrases or GENERIC_PHRASES[slot])
+            for slot, phrases in zip(("genre", "mood", "era"), known)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "combinations": len(self._variants),
+            "variants": sum(len(variants) for variants in self._variants.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
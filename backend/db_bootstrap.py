@@ -0,0 +1,127 @@
+# Startup index creation and one-time data migrations for the Mongo collections
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# collection -> indexes; TTL indexes with expireAfterSeconds=0 drop a document
+# once its own expires_at (a BSON date) has passed
+INDEXES = {
+    "users": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "user_sessions": [
+        IndexModel([("session_token", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "revoked_sessions": [
+        IndexModel([("jti", ASCENDING)], unique=True),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "search_history": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        # Window scan for the prewarm aggregation
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+    "favorites": [
+        IndexModel([("user_id", ASCENDING), ("movie_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "recommendation_cache": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "job_leases": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+# Fields that older documents stored as ISO strings
+DATE_FIELDS = {
+    "users": ["created_at"],
+    "user_sessions": ["expires_at", "created_at"],
+    "search_history": ["created_at"],
+    "favorites": ["created_at"],
+}
+
+MIGRATION_ID = "iso_strings_to_bson_dates"
+BATCH_SIZE = 500
+
+
+async def ensure_indexes(db) -> None:
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicates blocking a unique index; keep serving and surface it in logs
+            logger.error(f"Index creation failed for {collection}: {e}")
+
+
+def parse_iso_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+async def heal_string_date(collection, query: Dict[str, Any], field: str, value: Any) -> Optional[datetime]:
+    """``value`` as a datetime, or None if it is not a date.
+
+    An ISO string left by an unfinished migration or by a worker still on the
+    old code is parsed and written back as a BSON date, so the TTL index
+    covers that document from now on.
+    """
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = parse_iso_date(value)
+    except ValueError:
+        return None
+    try:
+        # Only if no one has rewritten it since it was read
+        await collection.update_one({**query, field: value}, {"$set": {field: parsed}})
+    except Exception as e:
+        logger.error(f"Could not rewrite {field} as a date: {e}")
+    return parsed
+
+
+async def migrate_string_dates(db) -> int:
+    """Convert ISO-string timestamps to BSON dates; runs once per database."""
+    if await db.schema_migrations.find_one({"_id": MIGRATION_ID}):
+        return 0
+
+    converted = 0
+    for collection, fields in DATE_FIELDS.items():
+        for field in fields:
+            ops = []
+            cursor = db[collection].find({field: {"$type": "string"}}, {field: 1})
+            async for doc in cursor:
+                try:
+                    ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: parse_iso_date(doc[field])}}))
+                except ValueError:
+                    logger.warning(f"Unparseable {collection}.{field} on {doc['_id']}: {doc[field]!r}")
+                if len(ops) >= BATCH_SIZE:
+                    converted += (await db[collection].bulk_write(ops, ordered=False)).modified_count
+                    ops = []
+            if ops:
+                converted += (await db[collection].bulk_write(ops, ordered=False)).modified_count
+
+    await db.schema_migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"completed_at": datetime.now(timezone.utc), "converted": converted}},
+        upsert=True,
+    )
+    logger.info(f"Migrated {converted} string timestamps to BSON dates")
+    return converted
+
+
+async def bootstrap_database(db) -> None:
+    await migrate_string_dates(db)
+    await ensure_indexes(db)
@@ -0,0 +1,98 @@
+# Incremental parser that extracts array elements from a JSON object as it streams in, and a deadline-bounded event reader
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+
+class JsonArrayItemParser:
+    """Feed text chunks of a JSON object; get back each element of the watched
+    top-level arrays as soon as its closing brace arrives.
+
+    Anything before the first ``{`` (e.g. a markdown code fence) is skipped.
+    Only object elements are emitted; the full document is still available
+    from ``result()`` once the stream ends.
+    """
+
+    def __init__(self, arrays: Iterable[str]):
+        self.arrays = set(arrays)
+        self._buffer = ""
+        self._pos = 0
+        self._root_start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        self._buffer += chunk
+        items = []
+        buffer = self._buffer
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._root_start is None:
+                if char == "{":
+                    self._root_start = pos
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = json.loads(buffer[self._string_start:pos + 1])
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char == ":" and self._depth == 1:
+                self._current_key = self._last_string
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2:
+                    self._array_key = self._current_key
+                elif char == "{" and self._depth == 3 and self._array_key in self.arrays:
+                    self._item_start = pos
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._depth == 2 and self._item_start is not None:
+                    items.append((self._array_key, json.loads(buffer[self._item_start:pos + 1])))
+                    self._item_start = None
+                elif char == "]" and self._depth == 1:
+                    self._array_key = None
+        self._pos = len(buffer)
+        return items
+
+    def result(self) -> Dict[str, Any]:
+        """Parse the complete document; raises ValueError if it is incomplete."""
+        if self._root_start is None:
+            raise ValueError("No JSON object in stream")
+        end = self._buffer.rfind("}")
+        return json.loads(self._buffer[self._root_start:end + 1])
+
+
+async def until_deadline(queue: "asyncio.Queue[Tuple[str, Any]]", budget: float) -> AsyncIterator[Tuple[str, Any]]:
+    """Yield the ``(kind, value)`` events put on ``queue``; once ``budget`` seconds
+    have passed without the caller stopping, yield ``("timeout", None)`` and end.
+
+    The producer is not cancelled, so a slow LLM call still finishes and fills
+    the cache for the next request.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    while True:
+        if not queue.empty():
+            yield queue.get_nowait()
+            continue
+        try:
+            event = await asyncio.wait_for(queue.get(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            yield "timeout", None
+            return
+        yield event
@@ -0,0 +1,85 @@
+# App-lifetime pooled HTTP client for outbound calls (OAuth session exchange)
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+class PooledHttpClient:
+    """Wraps one ``httpx.AsyncClient`` so connections (and TLS sessions) are
+    kept alive across requests, with explicit timeouts and bounded retries.
+
+    Retries use exponential backoff with full jitter and only apply to
+    idempotent GETs that failed at the transport level or got a 502/503/504.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 10.0,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+    ):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client: Optional[httpx.AsyncClient] = None
+        self.latency = LatencyStats()
+        self.retry_count = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = await self.client.get(url, **kwargs)
+            except httpx.TransportError as e:
+                self.latency.observe((time.perf_counter() - start) * 1000, error=True)
+                if attempt >= self.retries:
+                    raise
+                logger.warning(f"GET {url} failed ({type(e).__name__}), retrying")
+            else:
+                retryable = response.status_code in RETRYABLE_STATUS
+                self.latency.observe((time.perf_counter() - start) * 1000, error=retryable)
+                if not retryable or attempt >= self.retries:
+                    return response
+                logger.warning(f"GET {url} returned {response.status_code}, retrying")
+            self.retry_count += 1
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"retries": self.retry_count, **self.latency.snapshot()}
@@ -0,0 +1,76 @@
+# Compact LLM recommendation contract: {id, top, vibe} nodes in, catalog-hydrated graph parts out
+from typing import Any, Dict, List, Mapping, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class LlmNode(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+    id: str
+    top: bool = False
+    vibe: str = ""
+
+
+class LlmGraph(BaseModel):
+    """What the model returns; anything else it adds (titles, links) is ignored."""
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+    nodes: List[LlmNode] = []
+    summary: str = ""
+
+
+def parse_llm_reply(text: str) -> LlmGraph:
+    """Validate the reply text, tolerating a markdown code fence; raises ValueError"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:]
+    return LlmGraph.model_validate_json(text)
+
+
+def prompt_line(movie_id: str, movies: Mapping[str, Any], tags: Mapping[str, Dict[str, Any]]) -> Optional[str]:
+    """One film of the prompt's candidate list, ``- id (title, year) - vibe``; None for unknown ids"""
+    movie = movies.get(movie_id)
+    if movie is None:
+        return None
+    vibe = tags.get(movie.id, {}).get("vibe", "")
+    line = f"- {movie.id} ({movie.title_ru or movie.title}, {movie.year})"
+    return f"{line} - {vibe}" if vibe else line
+
+
+def catalog_node(item: LlmNode, movies: Mapping[str, Any], tags: Mapping[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """MovieNode fields for a validated {id, top, vibe} entry; None for unknown ids"""
+    movie = movies.get(item.id)
+    if movie is None:
+        return None
+    return {
+        "id": movie.id,
+        "title": movie.title,
+        "title_ru": movie.title_ru,
+        "year": movie.year,
+        "poster": movie.poster,
+        "vibe": item.vibe or tags.get(movie.id, {}).get("vibe", ""),
+        "is_top": item.top,
+    }
+
+
+def hydrate_graph(result: LlmGraph, movies: Mapping[str, Any], tags: Mapping[str, Dict[str, Any]], similarity) -> Dict[str, Any]:
+    """GraphResponse-shaped dict: known ids in reply order, first occurrence only.
+
+    Titles, years and posters always come from the catalog, never the model,
+    and links come from ``similarity`` restricted to the surviving nodes.
+    """
+    nodes = []
+    seen = set()
+    for item in result.nodes:
+        node = catalog_node(item, movies, tags)
+        if node is None or node["id"] in seen:
+            continue
+        seen.add(node["id"])
+        nodes.append(node)
+    if not nodes:
+        raise ValueError("LLM returned no catalog films")
+
+    links = [link for link in similarity.links_for([node["id"] for node in nodes])
+             if link["source"] in seen and link["target"] in seen]
+    return {"nodes": nodes, "links": links, "query_summary": result.summary}
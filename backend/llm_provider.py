@@ -0,0 +1,88 @@
+# Provider layer: one place that builds LLM/image clients, holds the prebuilt prompts and times every call
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from emergentintegrations.llm.chat import LlmChat, UserMessage
+from emergentintegrations.llm.openai.image_generation import OpenAIImageGeneration
+
+from metrics import LatencyStats
+
+
+class LlmProvider:
+    """Holds the system prompt for each operation (built once, not per request),
+    a shared image client and per-operation latency stats.
+
+    ``LlmChat`` keeps the conversation history of its session, so a fresh one is
+    still created per call; with the prompt prebuilt that is just an object
+    allocation.
+
+    ``LlmChat`` has no token streaming. With ``streaming`` on, ``stream`` calls
+    litellm (the library LlmChat is built on) with ``stream=True`` against
+    ``api_base``, which must accept ``api_key``. With it off, ``stream`` yields
+    the whole reply as one chunk after the full LLM latency.
+    """
+
+    def __init__(self, api_key: str, system_prompts: Dict[str, str], provider: str = "openai",
+                 model: str = "gpt-5.2", image_model: str = "gpt-image-1",
+                 streaming: bool = False, api_base: Optional[str] = None):
+        self.api_key = api_key
+        self.system_prompts = dict(system_prompts)
+        self.provider = provider
+        self.model = model
+        self.image_model = image_model
+        self.images = OpenAIImageGeneration(api_key=api_key)
+        self.timings: Dict[str, LatencyStats] = {}
+        self.api_base = api_base
+        self._litellm = None
+        if streaming:
+            import litellm
+
+            self._litellm = litellm
+
+    def _timing(self, operation: str) -> LatencyStats:
+        stats = self.timings.get(operation)
+        if stats is None:
+            stats = self.timings[operation] = LatencyStats()
+        return stats
+
+    def chat(self, operation: str) -> LlmChat:
+        return LlmChat(
+            api_key=self.api_key,
+            session_id=f"{operation}_{uuid.uuid4().hex[:8]}",
+            system_message=self.system_prompts[operation],
+        ).with_model(self.provider, self.model)
+
+    async def complete(self, operation: str, text: str) -> str:
+        with self._timing(operation).time():
+            return await self.chat(operation).send_message(UserMessage(text=text))
+
+    async def stream(self, operation: str, text: str) -> AsyncIterator[str]:
+        """Yield the reply in chunks as the model produces them, or in one chunk without ``streaming``"""
+        started = time.perf_counter()
+        error = True
+        try:
+            if self._litellm is None:
+                yield await self.chat(operation).send_message(UserMessage(text=text))
+            else:
+                response = await self._litellm.acompletion(
+                    model=f"{self.provider}/{self.model}",
+                    messages=[{"role": "system", "content": self.system_prompts[operation]}, {"role": "user", "content": text}],
+                    api_key=self.api_key,
+                    api_base=self.api_base,
+                    stream=True,
+                )
+                async for chunk in response:
+                    content = chunk.choices[0].delta.content if chunk.choices else None
+                    if content:
+                        yield content
+            error = False
+        finally:
+            self._timing(operation).observe((time.perf_counter() - started) * 1000, error=error)
+
+    async def generate_images(self, prompt: str, number_of_images: int = 1) -> List[bytes]:
+        with self._timing("image").time():
+            return await self.images.generate_images(prompt=prompt, model=self.image_model, number_of_images=number_of_images)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"streaming": self._litellm is not None, **{operation: stats.snapshot() for operation, stats in self.timings.items()}}
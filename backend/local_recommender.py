@@ -0,0 +1,271 @@
+# LLM-free recommender: sparse TF-IDF-style feature vectors over the catalog, scored with NumPy
+import json
+import logging
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from catalog_store import MappedCatalog, catalog_columns
+from similarity import SimilarityMatrix, SparseRows
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[\w-]+")
+
+# Prefix stemming is crude but merges most Russian inflections
+# ("медленный"/"медленнее", "Интерстеллар"/"Интерстеллара") at no cost
+STEM_LENGTH = 6
+
+STOP_WORDS = {
+    "как", "типа", "вроде", "но", "и", "а", "в", "на", "с", "про", "по", "что", "то", "это", "же",
+    "фильм", "фильмы", "фильма", "кино", "хочу", "подбери", "посоветуй", "что-то", "нибудь",
+    "like", "a", "an", "the", "movie", "movies", "film", "films", "something", "but", "with", "about",
+}
+
+# Words that exclude what follows them: "не"/"not" the next word, the rest up to the end of the clause
+NEGATORS = {"не": 1, "not": 1, "без": None, "кроме": None, "no": None, "without": None, "except": None}
+_CLAUSE_BREAK = re.compile(r"[,.;:!?()]|\s(?:но|а|but)\s")
+# How hard an excluded term pulls a film down, relative to a wanted one
+NEGATION_WEIGHT = 1.0
+
+# Field weights when building a film's document
+FIELD_WEIGHTS = {"tags": 3.0, "vibe": 3.0, "why_recommended": 2.0, "description": 1.0}
+
+# Query substrings that express an era preference: (marker, (min_year, max_year))
+ERA_MARKERS = [
+    ("90-х", (1990, 1999)), ("90е", (1990, 1999)), ("90s", (1990, 1999)),
+    ("2000-", (2000, 2009)), ("нулев", (2000, 2009)), ("2000s", (2000, 2009)),
+    ("2010-", (2010, 2019)), ("2010s", (2010, 2019)),
+    ("класси", (0, 1999)), ("classi", (0, 1999)), ("стары", (0, 1999)),
+    ("соврем", (2015, 9999)), ("новое", (2015, 9999)), ("новые", (2015, 9999)), ("recent", (2015, 9999)),
+]
+
+
+def stem(word: str) -> str:
+    return word[:STEM_LENGTH]
+
+
+def tokenize(text: str) -> List[str]:
+    words = _WORD.findall(text.lower().replace("ё", "е"))
+    return [stem(word) for word in words if word not in STOP_WORDS and len(word) > 1]
+
+
+def parse_query(text: str) -> Tuple[List[str], List[str]]:
+    """``(wanted terms, excluded terms)``, stemmed like the documents.
+
+    "без космоса" and "не мрачный" name what the user does not want; those
+    terms must count against a film, not for it.
+    """
+    wanted: List[str] = []
+    excluded: List[str] = []
+    for clause in _CLAUSE_BREAK.split(text.lower().replace("ё", "е")):
+        scope = 0.0
+        for word in _WORD.findall(clause):
+            if word in NEGATORS:
+                scope = NEGATORS[word] or float("inf")
+                continue
+            if word in STOP_WORDS or len(word) <= 1:
+                continue
+            if scope:
+                excluded.append(stem(word))
+                scope -= 1
+            else:
+                wanted.append(stem(word))
+    return wanted, excluded
+
+
+# Fields a film's document is built from, and where precomputed features live in a catalog directory
+DOCUMENT_COLUMNS = ("tags", "vibe", "why_recommended", "description", "description_ru")
+FEATURES_META = "features.json"
+
+
+def film_document(tags: Iterable[str], vibe: str, why_recommended: Iterable[str], description: str, description_ru: str) -> Dict[str, float]:
+    fields = {
+        "tags": " ".join(tags or ()),
+        "vibe": vibe or "",
+        "why_recommended": " ".join(why_recommended or ()),
+        "description": f"{description or ''} {description_ru or ''}",
+    }
+    doc: Dict[str, float] = {}
+    for field, text in fields.items():
+        for term in tokenize(text):
+            doc[term] = doc.get(term, 0.0) + FIELD_WEIGHTS[field]
+    return doc
+
+
+def build_features(columns: Dict[str, List[Any]]) -> Tuple[List[str], np.ndarray, SparseRows]:
+    """``(terms, idf, rows)``: one L2-normalised log-TF x IDF row per film, stored sparse."""
+    vocabulary: Dict[str, int] = {}
+    indptr, indices, weights = [0], [], []
+    for values in zip(*(columns[name] for name in DOCUMENT_COLUMNS)):
+        for term, weight in film_document(*values).items():
+            indices.append(vocabulary.setdefault(term, len(vocabulary)))
+            weights.append(weight)
+        indptr.append(len(indices))
+
+    indptr = np.array(indptr, dtype=np.int64)
+    indices = np.array(indices, dtype=np.int32)
+    films = len(indptr) - 1
+    document_frequency = np.bincount(indices, minlength=len(vocabulary))
+    idf = np.log((1 + films) / (1 + document_frequency)).astype(np.float32) + 1.0
+    data = np.log1p(np.array(weights, dtype=np.float32)) * idf[indices]
+    row_of = np.repeat(np.arange(films), np.diff(indptr))
+    norms = np.sqrt(np.bincount(row_of, weights=data * data, minlength=films)).astype(np.float32)
+    data /= np.where(norms == 0, 1, norms)[row_of]
+    return list(vocabulary), idf, SparseRows(indptr, indices, data.astype(np.float32), len(vocabulary))
+
+
+def write_features(directory: Path) -> Dict[str, Any]:
+    """Precompute the recommender features of the catalog in ``directory``, next to its columns.
+
+    Tokenizing every description is most of the recommender's start-up cost;
+    with these files a worker memory-maps the vectors instead.
+    """
+    directory = Path(directory)
+    # Columns only; no record is hydrated, so no model is needed
+    catalog = MappedCatalog(directory, None)
+    terms, idf, rows = build_features(catalog_columns(catalog, catalog.tags, DOCUMENT_COLUMNS))
+    np.save(directory / "features.idf.npy", idf)
+    for name in ("indptr", "indices", "data"):
+        np.save(directory / f"features.{name}.npy", getattr(rows, name))
+    meta = {"version": catalog.version, "films": len(rows), "terms": len(terms), "nonzeros": len(rows.data)}
+    # Written last, like meta.json: features without it are an unfinished build
+    (directory / FEATURES_META).write_text(json.dumps({**meta, "vocabulary": terms}, ensure_ascii=False))
+    return meta
+
+
+def load_features(catalog: MappedCatalog) -> Optional[Tuple[List[str], np.ndarray, SparseRows]]:
+    """Memory-mapped features written by ``write_features``; None when absent or built for another catalog version."""
+    path = catalog.directory / FEATURES_META
+    if not path.exists():
+        return None
+    meta = json.loads(path.read_text(encoding="utf-8"))
+    if meta.get("version") != catalog.version or meta.get("films") != len(catalog):
+        logger.warning(f"Ignoring features in {catalog.directory}: built for catalog {meta.get('version')}, not {catalog.version}")
+        return None
+    load = lambda name: np.load(catalog.directory / f"features.{name}.npy", mmap_mode="r")  # noqa: E731
+    rows = SparseRows(load("indptr"), load("indices"), load("data"), len(meta["vocabulary"]))
+    return meta["vocabulary"], np.asarray(load("idf")), rows
+
+
+class LocalRecommender:
+    """Holds one sparse L2-normalised feature row per film; a query is scored
+    against all rows with a single pass over their non-zeros.
+
+    Nothing is hydrated at construction: the features come from the catalog's
+    columns (or from files precomputed next to a mapped catalog), and only the
+    films that end up in a graph are looked up as records.
+    """
+
+    def __init__(self, movies: Dict[str, Any], tags: Dict[str, Dict[str, Any]], top_count: int = 5, related_count: int = 12):
+        self.movies = movies
+        self.tags = tags
+        self.top_count = top_count
+        self.related_count = related_count
+        self.ids = list(movies)
+        self._index = {movie_id: i for i, movie_id in enumerate(self.ids)}
+
+        features = load_features(movies) if isinstance(movies, MappedCatalog) else None
+        self.precomputed = features is not None
+        columns = catalog_columns(movies, tags, ("year", "rating", "title", "title_ru") + (() if features else DOCUMENT_COLUMNS))
+        terms, self.idf, self.vectors = features or build_features(columns)
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.similarity = SimilarityMatrix(self.ids, self.vectors, row_of=self._index.get)
+
+        ratings = np.asarray(columns["rating"], dtype=np.float32)
+        self.years = np.asarray(columns["year"], dtype=np.float32)
+        self.rating_score = (ratings - ratings.min()) / max(float(np.ptp(ratings)), 1e-6) if len(ratings) else ratings
+        # First stem of each title -> (row, all its stems): a query only checks titles it could contain
+        self._titles_by_stem: Dict[str, List[Tuple[int, frozenset]]] = defaultdict(list)
+        for row, titles in enumerate(zip(columns["title"], columns["title_ru"])):
+            for title in titles:
+                stems = tokenize(title or "")
+                if stems:
+                    self._titles_by_stem[stems[0]].append((row, frozenset(stems)))
+
+    def referenced_movies(self, query_terms: List[str]) -> List[str]:
+        """Catalog films whose full RU or EN title appears in the query."""
+        terms = set(query_terms)
+        rows = {row for term in terms for row, title in self._titles_by_stem.get(term, ()) if title <= terms}
+        return [self.ids[row] for row in sorted(rows)]
+
+    def query_vector(self, query_terms: List[str], references: List[str]) -> np.ndarray:
+        vector = np.zeros(self.vectors.width, dtype=np.float32)
+        for term in query_terms:
+            column = self.vocabulary.get(term)
+            if column is not None:
+                vector[column] += self.idf[column]
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        # "Like <film>": blend in the referenced films' own profiles
+        for movie_id in references:
+            indices, data = self.vectors.row(self._index[movie_id])
+            vector[indices] += data
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def score(self, query: str, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, List[str]]:
+        """Scores for ``rows`` (every film by default) and the films the query names."""
+        lowered = query.lower().replace("ё", "е")
+        terms, excluded = parse_query(lowered)
+        references = self.referenced_movies(terms)
+        scores = self.vectors.dot(self.query_vector(terms, references))
+        if excluded:
+            scores -= NEGATION_WEIGHT * self.vectors.dot(self.query_vector(excluded, []))
+        rows = slice(None) if rows is None else rows
+        scores = scores[rows] + 0.05 * self.rating_score[rows]
+        years = self.years[rows]
+        for marker, (min_year, max_year) in ERA_MARKERS:
+            if marker in lowered:
+                scores = scores + 0.15 * ((years >= min_year) & (years <= max_year))
+        return scores, references
+
+    def candidate_rows(self, candidates: Optional[List[str]]) -> Optional[np.ndarray]:
+        """Rows to score, or None when the candidates cannot fill a graph on their own."""
+        rows = [self._index[movie_id] for movie_id in candidates or () if movie_id in self._index]
+        if len(rows) < self.top_count + self.related_count:
+            return None
+        return np.array(rows, dtype=np.intp)
+
+    def ranked(self, query: str, candidates: Optional[List[str]] = None) -> Tuple[List[str], List[str]]:
+        """``(scored films best first, films the query names)``; the named films are not in the ranking."""
+        rows = self.candidate_rows(candidates)
+        scores, references = self.score(query, rows)
+        ids = self.ids if rows is None else [self.ids[i] for i in rows]
+        ranked = [ids[i] for i in np.argsort(-scores, kind="stable")]
+        # A referenced film anchors the map but is not recommended back as a top pick
+        return [movie_id for movie_id in ranked if movie_id not in references], references
+
+    def recommend(self, query: str, candidates: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Return a GraphResponse-shaped dict for ``query``.
+
+        ``candidates`` (e.g. full-text matches) limits scoring to those films;
+        with too few of them the whole catalog is scored.
+        """
+        ordered, references = self.ranked(query, candidates)
+        top = ordered[:self.top_count]
+        related = (references + ordered[self.top_count:])[:self.related_count]
+
+        nodes = []
+        for movie_id in top + related:
+            movie = self.movies[movie_id]
+            nodes.append({
+                "id": movie_id,
+                "title": movie.title,
+                "title_ru": movie.title_ru,
+                "year": movie.year,
+                "poster": movie.poster,
+                "vibe": self.tags.get(movie_id, {}).get("vibe", ""),
+                "is_top": movie_id in top,
+            })
+
+        top_titles = ", ".join(self.movies[movie_id].title_ru or self.movies[movie_id].title for movie_id in top[:3])
+        return {
+            "nodes": nodes,
+            "links": self.similarity.links_for(top + related),
+            "query_summary": f"Подборка по запросу «{query.strip()}»: {top_titles} и похожие фильмы.",
+        }
@@ -0,0 +1,52 @@
+# Lightweight in-process latency/counter metrics surfaced by /api/metrics
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict
+
+
+class LatencyStats:
+    """Count, error count and latency percentiles over a sliding sample window."""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._recent = deque(maxlen=window)
+
+    def observe(self, elapsed_ms: float, error: bool = False) -> None:
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self._recent.append(elapsed_ms)
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe((time.perf_counter() - start) * 1000, error=error)
+
+    def percentile(self, q: float) -> float:
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "max_ms": round(self.max_ms, 3),
+        }
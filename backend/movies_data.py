@@ -1,4 +1,8 @@
-# Extended movie database - 30 carefully selected films
+# Extended movie database - 30 carefully selected films, or a memory-mapped catalog from CATALOG_PATH
+import hashlib
+import json
+import os
+from pathlib import Path
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 
@@ -16,7 +20,7 @@ class MovieDetail(BaseModel):
     reviews: List[Dict[str, Any]]
     watch_providers: List[Dict[str, str]]
 
-MOCK_MOVIES = {
+BUILTIN_MOVIES = {
     # === SCI-FI ===
     "arrival": MovieDetail(
         id="arrival", title="Arrival", title_ru="Прибытие", year=2016,
@@ -303,4 +307,56 @@ MOCK_MOVIES = {
     ),
 }
 
-ALL_MOVIE_IDS = list(MOCK_MOVIES.keys())
+# Genre/mood tags (RU + EN) and a short vibe per film, used by the local recommender
+BUILTIN_TAGS = {
+    "arrival": {"vibe": "философская sci-fi", "tags": ["фантастика", "sci-fi", "философия", "медленный", "медитативный", "инопланетяне", "контакт", "язык", "время", "тишина", "philosophical", "slow", "aliens"]},
+    "blade_runner_2049": {"vibe": "неонуар", "tags": ["фантастика", "sci-fi", "киберпанк", "нуар", "неон", "антиутопия", "медленный", "атмосферный", "визуал", "репликанты", "cyberpunk", "noir", "dystopia"]},
+    "interstellar": {"vibe": "эпическая sci-fi", "tags": ["фантастика", "sci-fi", "космос", "эпический", "время", "семья", "любовь", "наука", "эмоциональный", "space", "epic", "nolan", "нолан"]},
+    "matrix": {"vibe": "киберпанк", "tags": ["фантастика", "sci-fi", "киберпанк", "экшен", "реальность", "симуляция", "философия", "хакер", "культовый", "cyberpunk", "action", "simulation"]},
+    "inception": {"vibe": "сны", "tags": ["фантастика", "sci-fi", "сны", "подсознание", "головоломка", "ограбление", "экшен", "реальность", "нолан", "dreams", "heist", "mind-bending", "nolan"]},
+    "ex_machina": {"vibe": "камерная sci-fi", "tags": ["фантастика", "sci-fi", "ии", "искусственный", "интеллект", "робот", "сознание", "камерный", "минимализм", "триллер", "ai", "robot", "android"]},
+    "her": {"vibe": "романтическая sci-fi", "tags": ["фантастика", "sci-fi", "романтика", "любовь", "одиночество", "ии", "искусственный", "интеллект", "меланхоличный", "тёплый", "romance", "lonely", "ai"]},
+    "dune": {"vibe": "эпическая фантастика", "tags": ["фантастика", "sci-fi", "эпический", "пустыня", "космос", "политика", "пророчество", "масштабный", "визуал", "epic", "desert", "space"]},
+    "drive": {"vibe": "минималистичный криминал", "tags": ["криминал", "неон", "минимализм", "стильный", "водитель", "тишина", "насилие", "атмосферный", "80-е", "crime", "neon", "stylish"]},
+    "memento": {"vibe": "психологический триллер", "tags": ["триллер", "психологический", "память", "амнезия", "нелинейный", "головоломка", "месть", "нолан", "thriller", "memory", "nonlinear", "nolan"]},
+    "prisoners": {"vibe": "мрачный триллер", "tags": ["триллер", "мрачный", "похищение", "детектив", "расследование", "мораль", "напряжённый", "вильнёв", "thriller", "dark", "kidnapping"]},
+    "no_country": {"vibe": "криминальная драма", "tags": ["криминал", "драма", "вестерн", "напряжённый", "насилие", "тишина", "погоня", "зло", "коэны", "crime", "western", "tense"]},
+    "prestige": {"vibe": "загадочный триллер", "tags": ["триллер", "загадка", "фокусы", "магия", "соперничество", "повороты", "головоломка", "нолан", "mystery", "magic", "twist", "nolan"]},
+    "shutter_island": {"vibe": "психологический триллер", "tags": ["триллер", "психологический", "детектив", "остров", "безумие", "загадка", "повороты", "мрачный", "thriller", "mystery", "twist", "psychological"]},
+    "seven": {"vibe": "мрачный детектив", "tags": ["детектив", "триллер", "мрачный", "маньяк", "расследование", "нуар", "дождь", "финчер", "thriller", "dark", "serial", "killer", "detective"]},
+    "gone_girl": {"vibe": "триллер", "tags": ["триллер", "детектив", "брак", "исчезновение", "повороты", "психологический", "финчер", "thriller", "twist", "marriage"]},
+    "sicario": {"vibe": "напряжённый боевик", "tags": ["боевик", "экшен", "криминал", "наркокартель", "граница", "напряжённый", "мораль", "вильнёв", "action", "cartel", "tense"]},
+    "nightcrawler": {"vibe": "тёмная драма", "tags": ["драма", "триллер", "тёмный", "журналистика", "ночь", "неон", "амбиции", "социопат", "dark", "night", "journalism"]},
+    "fight_club": {"vibe": "культовая драма", "tags": ["драма", "культовый", "бунт", "анархия", "раздвоение", "повороты", "сатира", "финчер", "cult", "twist", "rebellion"]},
+    "whiplash": {"vibe": "напряжённая драма", "tags": ["драма", "музыка", "джаз", "одержимость", "учитель", "напряжённый", "противостояние", "drama", "music", "jazz", "obsession"]},
+    "eternal_sunshine": {"vibe": "романтика и память", "tags": ["романтика", "любовь", "память", "драма", "фантастика", "меланхоличный", "расставание", "нелинейный", "romance", "memory", "melancholic"]},
+    "there_will_be_blood": {"vibe": "эпическая драма", "tags": ["драма", "эпический", "нефть", "жадность", "вестерн", "история", "характер", "drama", "epic", "greed"]},
+    "dark_knight": {"vibe": "супергеройский эпик", "tags": ["супергерои", "бэтмен", "джокер", "экшен", "криминал", "эпический", "хаос", "нолан", "superhero", "batman", "action", "nolan"]},
+    "pulp_fiction": {"vibe": "культовая классика", "tags": ["криминал", "культовый", "классика", "нелинейный", "диалоги", "юмор", "гангстеры", "тарантино", "crime", "cult", "classic", "nonlinear"]},
+    "goodfellas": {"vibe": "гангстерская классика", "tags": ["криминал", "гангстеры", "мафия", "классика", "биография", "реальная", "история", "скорсезе", "crime", "mafia", "gangster", "classic"]},
+    "parasite": {"vibe": "социальная сатира", "tags": ["сатира", "триллер", "драма", "неравенство", "семья", "социальный", "повороты", "комедия", "satire", "thriller", "twist", "class"]},
+    "joker": {"vibe": "характерная драма", "tags": ["драма", "психологический", "безумие", "джокер", "одиночество", "тёмный", "характер", "общество", "drama", "dark", "psychological"]},
+    "oppenheimer": {"vibe": "эпическая биография", "tags": ["биография", "драма", "история", "наука", "бомба", "эпический", "война", "нолан", "biopic", "history", "epic", "nolan"]},
+}
+
+# A catalog built with `python catalog_store.py <dir>` replaces the built-in films. It is
+# opened read-only and memory-mapped, and records become MovieDetail only when looked up;
+# the same command precomputes the local recommender's sparse features next to it
+CATALOG_PATH = os.environ.get('CATALOG_PATH')
+
+if CATALOG_PATH:
+    from catalog_store import MappedCatalog
+
+    MOCK_MOVIES = MappedCatalog(Path(CATALOG_PATH), MovieDetail)
+    ALL_MOVIE_IDS = MOCK_MOVIES.ids
+    MOVIE_TAGS = MOCK_MOVIES.tags
+    # Content hash recorded when the catalog was built
+    CATALOG_VERSION = MOCK_MOVIES.version
+else:
+    MOCK_MOVIES = BUILTIN_MOVIES
+    ALL_MOVIE_IDS = list(MOCK_MOVIES.keys())
+    MOVIE_TAGS = BUILTIN_TAGS
+    # Changes whenever any catalog entry changes; used to key caches derived from the catalog
+    CATALOG_VERSION = hashlib.sha256(
+        json.dumps([MOCK_MOVIES[movie_id].model_dump() for movie_id in sorted(MOCK_MOVIES)], ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
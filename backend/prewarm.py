@@ -0,0 +1,129 @@
+# Off-peak cache prewarming from the most frequent search_history queries
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from recommend_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+async def popular_queries(collection, window_days: float, limit: int) -> List[Tuple[str, int]]:
+    """Most frequent queries over the last ``window_days`` as ``(query, count)``.
+
+    Mongo groups the raw strings; variants that only differ in case, spacing
+    or punctuation are merged here with ``normalize_query``, keeping the most
+    common spelling as the one to send to the LLM.
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=window_days)
+    pipeline = [
+        {"$match": {"created_at": {"$gte": since}, "query": {"$type": "string"}}},
+        {"$group": {"_id": "$query", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        # Headroom for variants that collapse into one normalized query
+        {"$limit": limit * 5},
+    ]
+    merged: Dict[str, Dict[str, Any]] = {}
+    async for row in collection.aggregate(pipeline):
+        key = normalize_query(row["_id"])
+        if not key:
+            continue
+        entry = merged.setdefault(key, {"query": row["_id"], "count": 0})
+        entry["count"] += row["count"]
+    ranked = sorted(merged.values(), key=lambda entry: entry["count"], reverse=True)
+    return [(entry["query"], entry["count"]) for entry in ranked[:limit]]
+
+
+async def prewarm(queries: List[str], compute: Callable[[str], Awaitable[Any]], concurrency: int) -> Dict[str, Any]:
+    """Run ``compute`` (which must cache its result) for every query, at most
+    ``concurrency`` at a time; returns a report of the run."""
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(concurrency)
+    refreshed = 0
+    failed = 0
+
+    async def warm(query: str) -> None:
+        nonlocal refreshed, failed
+        async with slots:
+            try:
+                await compute(query)
+                refreshed += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Prewarm failed for {query!r}: {e}")
+
+    await asyncio.gather(*(warm(query) for query in queries))
+    return {
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "candidates": len(queries),
+        "refreshed": refreshed,
+        "failed": failed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+async def acquire_lease(collection, name: str, owner: str, ttl: float) -> bool:
+    """Take the named lease for ``ttl`` seconds unless another owner holds an unexpired one.
+
+    The upsert only matches a free (expired) or already-owned lease; when the
+    lease is held elsewhere it tries to insert a second document with the
+    same ``_id`` and fails on the primary key, so exactly one caller wins.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await collection.update_one(
+            {"_id": name, "$or": [{"expires_at": {"$lte": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "acquired_at": now, "expires_at": now + timedelta(seconds=ttl)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+def seconds_until(hour: int, now: Optional[datetime] = None) -> float:
+    """Seconds until the next ``hour``:00 UTC."""
+    now = now or datetime.now(timezone.utc)
+    target = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+async def run_daily(hour: int, job: Callable[[], Awaitable[Any]]) -> None:
+    """Run ``job`` every day at ``hour`` UTC until cancelled."""
+    while True:
+        await asyncio.sleep(seconds_until(hour))
+        try:
+            await job()
+        except Exception as e:
+            logger.error(f"Scheduled prewarm error: {e}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prewarm the recommendation cache from popular search_history queries")
+    parser.add_argument("--window-days", type=float, default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+
+    import server
+
+    async def run() -> Dict[str, Any]:
+        try:
+            return await server.run_prewarm(args.window_days, args.limit, args.concurrency)
+        finally:
+            server.client.close()
+
+    report = asyncio.run(run())
+    print(f"Refreshed {report['refreshed']}/{report['candidates']} queries "
+          f"({report['failed']} failed) in {report['elapsed_ms'] / 1000:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Two-tier response cache for /movies/recommend: in-memory LRU + Mongo collection
+import hashlib
+import logging
+import re
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n.,!?;:…\"'«»()-—"
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a query."""
+    normalized = query.lower().replace("ё", "е")
+    normalized = _WHITESPACE.sub(" ", normalized)
+    return normalized.strip(_EDGE_PUNCTUATION)
+
+
+def cache_key(query: str, catalog_version: str) -> str:
+    raw = f"{catalog_version}\x00{normalize_query(query)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RecommendationCache:
+    """Memory tier for hot queries in this worker, Mongo tier (TTL-indexed on
+    ``expires_at``) shared by all workers and surviving restarts."""
+
+    def __init__(
+        self,
+        collection,
+        model: Type[BaseModel],
+        catalog_version: str,
+        maxsize: int = 512,
+        ttl: float = 24 * 60 * 60,
+    ):
+        self._collection = collection
+        self._model = model
+        self.catalog_version = catalog_version
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.store_hits = 0
+        self.store_misses = 0
+        self.store_errors = 0
+
+    async def get(self, query: str) -> Tuple[Optional[BaseModel], Optional[str]]:
+        """Return ``(response, tier)``; tier is "memory", "store" or None on a miss."""
+        key = cache_key(query, self.catalog_version)
+        cached = self._memory.get(key)
+        if cached is not None:
+            return cached, "memory"
+
+        try:
+            doc = await self._collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"response": 1, "expires_at": 1},
+            )
+        except Exception as e:
+            self.store_errors += 1
+            logger.warning(f"Recommendation cache read failed: {e}")
+            return None, None
+        if not doc:
+            self.store_misses += 1
+            return None, None
+
+        self.store_hits += 1
+        response = self._model(**doc["response"])
+        remaining = (doc["expires_at"] - datetime.now(timezone.utc)).total_seconds()
+        self._memory.set(key, response, ttl=remaining)
+        return response, "store"
+
+    async def set(self, query: str, response: BaseModel) -> None:
+        key = cache_key(query, self.catalog_version)
+        self._memory.set(key, response)
+        now = datetime.now(timezone.utc)
+        try:
+            await self._collection.update_one(
+                {"_id": key},
+                {"$set": {
+                    "query": normalize_query(query),
+                    "catalog_version": self.catalog_version,
+                    "response": response.model_dump(mode="json"),
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                }},
+                upsert=True,
+            )
+        except Exception as e:
+            self.store_errors += 1
+            logger.warning(f"Recommendation cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self._memory.stats(),
+            "store": {"hits": self.store_hits, "misses": self.store_misses, "errors": self.store_errors},
+        }
@@ -0,0 +1,128 @@
+# Near-duplicate query cache: local character n-gram embeddings + cosine similarity
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from recommend_cache import normalize_query
+
+_WORD = re.compile(r"\w+")
+
+# Filler words that change the phrasing but not the intent of a request
+STOP_WORDS = {
+    "как", "типа", "вроде", "похожий", "похожее", "похожие", "фильм", "фильмы", "кино",
+    "что-то", "что", "нибудь", "хочу", "посоветуй", "подбери", "но", "и", "а", "в", "на", "с", "про",
+    "like", "a", "an", "the", "movie", "movies", "film", "films", "something", "but", "with", "about",
+}
+
+# Words that flip or narrow a request while barely moving its embedding:
+# "не мрачный триллер" scores 0.95 against "мрачный триллер"
+NEGATIONS = {"не", "без", "нет", "кроме", "ни", "not", "no", "without", "except", "non"}
+
+
+def query_signature(query: str) -> frozenset:
+    """Negation words and numbers; two queries can share a response only if these match.
+
+    Numbers cover sequels and eras ("Дюна 2", "триллер 90-х"), which the
+    n-gram embedding treats as small edits.
+    """
+    return frozenset(word for word in _WORD.findall(normalize_query(query)) if word in NEGATIONS or word.isdigit())
+
+
+def embed_query(query: str, dim: int = 2048, ngram_sizes: Tuple[int, ...] = (3, 4)) -> np.ndarray:
+    """Hash word-bounded character n-grams into a unit vector.
+
+    crc32 keeps the hashing stable across processes (unlike ``hash()``), and
+    n-grams make inflections such as "Интерстеллар"/"Интерстеллара" overlap.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in _WORD.findall(normalize_query(query)):
+        if word in STOP_WORDS:
+            continue
+        padded = f" {word} "
+        for n in ngram_sizes:
+            for i in range(len(padded) - n + 1):
+                vector[zlib.crc32(padded[i:i + n].encode("utf-8")) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Serves a cached response for a query whose embedding is within
+    ``threshold`` cosine similarity of a previously answered one.
+
+    Vectors live in a preallocated ring buffer, so the oldest entry is
+    replaced once ``capacity`` is reached and lookup is one matrix-vector product.
+    Only entries with the same ``query_signature`` are eligible, so a
+    negated or re-numbered query never gets the original's response.
+    """
+
+    HISTOGRAM_BUCKETS = 10
+
+    def __init__(self, threshold: float = 0.75, capacity: int = 1024, dim: int = 2048):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.dim = dim
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._responses: List[Any] = [None] * capacity
+        self._signatures = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._next = 0
+        self.lookups = 0
+        self.hits = 0
+        self.guarded = 0
+        self._similarity_histogram = [0] * self.HISTOGRAM_BUCKETS
+
+    def lookup(self, query: str) -> Tuple[Optional[Any], float]:
+        """Return ``(response, best_similarity)``; response is None below the threshold."""
+        self.lookups += 1
+        vector = embed_query(query, self.dim)
+        if self._size == 0 or not vector.any():
+            return None, 0.0
+
+        similarities = self._vectors[:self._size] @ vector
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        bucket = min(self.HISTOGRAM_BUCKETS - 1, max(0, int(similarity * self.HISTOGRAM_BUCKETS)))
+        self._similarity_histogram[bucket] += 1
+        if similarity < self.threshold:
+            return None, similarity
+
+        eligible = self._signatures[:self._size] == hash(query_signature(query))
+        if not eligible[best]:
+            similarities = np.where(eligible, similarities, -1.0)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.guarded += 1
+                return None, similarity
+            similarity = float(similarities[best])
+        self.hits += 1
+        return self._responses[best], similarity
+
+    def add(self, query: str, response: Any) -> None:
+        vector = embed_query(query, self.dim)
+        if not vector.any():
+            return
+        slot = self._next
+        self._vectors[slot] = vector
+        self._responses[slot] = response
+        self._signatures[slot] = hash(query_signature(query))
+        self._next = (slot + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def stats(self) -> Dict[str, Any]:
+        width = 1 / self.HISTOGRAM_BUCKETS
+        return {
+            "size": self._size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "guarded": self.guarded,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "similarity_histogram": {
+                f"{i * width:.1f}-{(i + 1) * width:.1f}": count
+                for i, count in enumerate(self._similarity_histogram)
+            },
+        }
@@ -1,31 +1,96 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 import os
+import asyncio
 import logging
+import socket
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator, Literal
 import uuid
 from datetime import datetime, timezone, timedelta
 import httpx
-import json
-import base64
+import orjson
 
-from movies_data import MOCK_MOVIES, ALL_MOVIE_IDS
+from movies_data import MOCK_MOVIES, ALL_MOVIE_IDS, CATALOG_VERSION, MOVIE_TAGS
+from session_cache import SessionCache
+from session_tokens import SignedSessionCodec, RevocationList
+from metrics import LatencyStats
+from db_bootstrap import bootstrap_database, heal_string_date
+from http_client import PooledHttpClient
+from recommend_cache import RecommendationCache, normalize_query
+from semantic_cache import SemanticCache
+from single_flight import SingleFlight
+from llm_gate import ConcurrencyGate, LoadShed
+from circuit_breaker import CircuitBreaker
+from llm_provider import LlmProvider
+from compliment_store import ComplimentStore
+from avatar_store import DIGEST_PATTERN, blob_store_from_env, migrate_data_url_avatars, parse_data_url
+from avatar_jobs import AvatarJobs
+from prewarm import acquire_lease, popular_queries, prewarm, run_daily
+from graph_stream import JsonArrayItemParser, until_deadline
+from llm_contract import LlmGraph, LlmNode, catalog_node, hydrate_graph, parse_llm_reply, prompt_line
+from local_recommender import LocalRecommender
+from catalog_service import CatalogService, accepts_gzip, etag_matches
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ['DB_NAME']]
 
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 
-app = FastAPI()
+# "mongo": opaque sess_<uuid> tokens looked up in user_sessions
+# "signed": HMAC-signed tokens verified without a DB read, revoked via a denylist
+SESSION_MODE = os.environ.get('SESSION_MODE', 'mongo')
+if SESSION_MODE not in ('mongo', 'signed'):
+    raise RuntimeError(f"Unknown SESSION_MODE: {SESSION_MODE}")
+signed_sessions = SignedSessionCodec(os.environ['SESSION_SECRET']) if SESSION_MODE == 'signed' else None
+revoked_sessions = RevocationList(db.revoked_sessions, refresh_interval=float(os.environ.get('SESSION_REVOCATION_REFRESH', '30')))
+auth_stats = LatencyStats()
+auth_db_reads = 0
+
+oauth_http = PooledHttpClient(
+    connect_timeout=float(os.environ.get('OAUTH_CONNECT_TIMEOUT', '3')),
+    read_timeout=float(os.environ.get('OAUTH_READ_TIMEOUT', '10')),
+    retries=int(os.environ.get('OAUTH_RETRIES', '2')),
+)
+
+# Logout invalidates the cache of the worker that served it only. In mongo mode a hit whose session
+# was confirmed more than SESSION_CACHE_RECHECK seconds ago re-reads user_sessions, which bounds how
+# long another worker keeps honouring a logged-out token; signed mode relies on the revocation list
+session_cache = SessionCache(
+    maxsize=int(os.environ.get('SESSION_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('SESSION_CACHE_TTL', '60')),
+    recheck_after=float(os.environ.get('SESSION_CACHE_RECHECK', '5')) if SESSION_MODE == 'mongo' else None,
+)
+
+# Coalesces concurrent identical LLM calls (keyed by operation + normalized input)
+llm_flights = SingleFlight()
+
+def llm_gate(operation: str, default_limit: int) -> ConcurrencyGate:
+    prefix = f"LLM_{operation.upper()}"
+    return ConcurrencyGate(
+        operation,
+        limit=int(os.environ.get(f'{prefix}_CONCURRENCY', str(default_limit))),
+        queue_size=int(os.environ.get(f'{prefix}_QUEUE_SIZE', str(default_limit * 4))),
+        max_wait=float(os.environ.get(f'{prefix}_MAX_WAIT', '2')),
+    )
+
+# Caps outstanding provider requests per operation; saturation sheds to the degraded path
+llm_gates = {
+    "recommend": llm_gate("recommend", 8),
+    "image": llm_gate("image", 2),
+}
+
+# orjson renders every JSON response, including raw Mongo documents with datetimes
+app = FastAPI(default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -40,6 +105,7 @@ class User(BaseModel):
     name: str
     picture: Optional[str] = None
     avatar: Optional[str] = None
+    avatars: Optional[Dict[str, str]] = None
     preferences: Optional[Dict[str, Any]] = None
     onboarding_completed: bool = False
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -62,9 +128,24 @@ class GraphResponse(BaseModel):
     nodes: List[MovieNode]
     links: List[MovieLink]
     query_summary: str
+    # Top nodes' MovieDetail, only when the request sets include_details
+    details: Optional[Dict[str, Dict[str, Any]]] = None
+
+def model_response(model: BaseModel, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serialize with pydantic-core directly instead of FastAPI's re-validate-then-encode path"""
+    return Response(content=model.__pydantic_serializer__.to_json(model), media_type="application/json", headers=headers)
+
+RecommenderMode = Literal["llm", "local", "hybrid"]
 
 class QueryRequest(BaseModel):
     query: str
+    engine: Optional[RecommenderMode] = None
+    include_details: bool = False
+    detail_fields: Optional[List[str]] = None
+
+class MovieBatchRequest(BaseModel):
+    ids: List[str]
+    fields: Optional[List[str]] = None
 
 class QueryValidation(BaseModel):
     is_valid: bool
@@ -86,33 +167,94 @@ class AvatarGenerateRequest(BaseModel):
 
 # ============== AUTH HELPERS ==============
 
-async def get_current_user(request: Request) -> Optional[User]:
+def get_session_token(request: Request) -> Optional[str]:
     session_token = request.cookies.get("session_token")
     if not session_token:
         auth_header = request.headers.get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
             session_token = auth_header[7:]
-    
+    return session_token
+
+async def get_current_user(request: Request) -> Optional[User]:
+    session_token = get_session_token(request)
     if not session_token:
         return None
     
+    with auth_stats.time():
+        if SESSION_MODE == "signed":
+            return await resolve_signed_session(session_token)
+        return await resolve_mongo_session(session_token)
+
+async def resolve_mongo_session(session_token: str) -> Optional[User]:
+    global auth_db_reads
+    cached_user = await session_cache.get_verified(session_token, mongo_session_exists)
+    if cached_user:
+        return cached_user
+    
+    # Taken before the reads so a logout that lands in between is not undone by the cache fill
+    generation = session_cache.generation()
+    auth_db_reads += 1
     session_doc = await db.user_sessions.find_one({"session_token": session_token}, {"_id": 0})
     if not session_doc:
         return None
     
-    expires_at = session_doc["expires_at"]
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    if expires_at < datetime.now(timezone.utc):
+    # BSON date (tz-aware client); the TTL index removes expired sessions within ~60s.
+    # A string left by a partial migration or an old worker is parsed and rewritten as a date
+    expires_at = await heal_string_date(db.user_sessions, {"session_token": session_token}, "expires_at", session_doc["expires_at"])
+    if expires_at is None or expires_at < datetime.now(timezone.utc):
+        return None
+    
+    return await load_session_user(session_token, session_doc["user_id"], expires_at, generation)
+
+async def mongo_session_exists(session_token: str) -> bool:
+    global auth_db_reads
+    auth_db_reads += 1
+    return await db.user_sessions.find_one({"session_token": session_token}, {"_id": 1}) is not None
+
+async def resolve_signed_session(session_token: str) -> Optional[User]:
+    claims = signed_sessions.verify(session_token)
+    if not claims:
+        return None
+    
+    generation = session_cache.generation()
+    await revoked_sessions.refresh_if_stale()
+    if revoked_sessions.is_revoked(claims["jti"]):
         return None
     
-    user_doc = await db.users.find_one({"user_id": session_doc["user_id"]}, {"_id": 0})
+    cached_user = session_cache.get(session_token)
+    if cached_user:
+        return cached_user
+    
+    return await load_session_user(session_token, claims["user_id"], claims["expires_at"], generation)
+
+async def load_session_user(session_token: str, user_id: str, expires_at: datetime, generation: int) -> Optional[User]:
+    global auth_db_reads
+    auth_db_reads += 1
+    user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0})
     if not user_doc:
         return None
     
-    return User(**user_doc)
+    user = User(**user_doc)
+    session_cache.set(session_token, user, expires_at, generation)
+    return user
+
+async def issue_session(response: Response, user_id: str, lifetime: timedelta) -> str:
+    """Mint a session token for the configured SESSION_MODE and set the cookie"""
+    expires_at = datetime.now(timezone.utc) + lifetime
+    
+    if SESSION_MODE == "signed":
+        session_token, _ = signed_sessions.issue(user_id, expires_at)
+    else:
+        session_token = f"sess_{uuid.uuid4().hex}"
+        await db.user_sessions.insert_one({
+            "user_id": user_id,
+            "session_token": session_token,
+            "expires_at": expires_at,
+            "created_at": datetime.now(timezone.utc)
+        })
+    
+    response.set_cookie(key="session_token", value=session_token, httponly=True, secure=True, samesite="none", path="/", max_age=int(lifetime.total_seconds()))
+    return session_token
 
 async def require_auth(request: Request) -> User:
     user = await get_current_user(request)
@@ -130,11 +272,14 @@ async def create_session(request: Request, response: Response):
     if not session_id:
         raise HTTPException(status_code=400, detail="session_id is required")
     
-    async with httpx.AsyncClient() as client:
-        auth_response = await client.get(
+    try:
+        auth_response = await oauth_http.get(
             "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
             headers={"X-Session-ID": session_id}
         )
+    except httpx.HTTPError as e:
+        logger.error(f"Auth provider error: {e}")
+        raise HTTPException(status_code=502, detail="Auth provider unavailable")
     
     if auth_response.status_code != 200:
         raise HTTPException(status_code=401, detail="Invalid session")
@@ -150,6 +295,7 @@ async def create_session(request: Request, response: Response):
             {"email": auth_data["email"]},
             {"$set": {"name": auth_data.get("name", ""), "picture": auth_data.get("picture", "")}}
         )
+        session_cache.invalidate_user(user_id)
     else:
         await db.users.insert_one({
             "user_id": user_id,
@@ -159,20 +305,10 @@ async def create_session(request: Request, response: Response):
             "avatar": None,
             "preferences": None,
             "onboarding_completed": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         })
     
-    session_token = f"sess_{uuid.uuid4().hex}"
-    expires_at = datetime.now(timezone.utc) + timedelta(days=7)
-    
-    await db.user_sessions.insert_one({
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": expires_at.isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    })
-    
-    response.set_cookie(key="session_token", value=session_token, httponly=True, secure=True, samesite="none", path="/", max_age=7*24*60*60)
+    await issue_session(response, user_id, timedelta(days=7))
     
     user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0})
     return user_doc
@@ -191,20 +327,10 @@ async def demo_login(response: Response):
         "avatar": None,
         "preferences": None,
         "onboarding_completed": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": datetime.now(timezone.utc)
     })
     
-    session_token = f"sess_{uuid.uuid4().hex}"
-    expires_at = datetime.now(timezone.utc) + timedelta(days=1)
-    
-    await db.user_sessions.insert_one({
-        "user_id": user_id,
-        "session_token": session_token,
-        "expires_at": expires_at.isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
-    })
-    
-    response.set_cookie(key="session_token", value=session_token, httponly=True, secure=True, samesite="none", path="/", max_age=24*60*60)
+    await issue_session(response, user_id, timedelta(days=1))
     
     user_doc = await db.users.find_one({"user_id": user_id}, {"_id": 0})
     return user_doc
@@ -218,9 +344,16 @@ async def get_me(request: Request):
 
 @api_router.post("/auth/logout")
 async def logout(request: Request, response: Response):
-    session_token = request.cookies.get("session_token")
+    session_token = get_session_token(request)
     if session_token:
-        await db.user_sessions.delete_one({"session_token": session_token})
+        if SESSION_MODE == "signed":
+            claims = signed_sessions.verify(session_token)
+            if claims:
+                await revoked_sessions.revoke(claims["jti"], claims["expires_at"])
+        else:
+            await db.user_sessions.delete_one({"session_token": session_token})
+        # After the write, so a lookup racing the logout cannot re-cache the session
+        session_cache.invalidate(session_token)
     response.delete_cookie(key="session_token", path="/")
     return {"message": "Logged out"}
 
@@ -242,35 +375,79 @@ async def save_onboarding(data: OnboardingData, request: Request):
         {"user_id": user.user_id},
         {"$set": {"preferences": preferences, "onboarding_completed": True}}
     )
+    session_cache.invalidate_user(user.user_id)
     
     # Generate personalized compliment
     compliment = await generate_compliment(preferences)
     
     return {"message": "Preferences saved", "compliment": compliment}
 
+# Onboarding compliments are answered from memory, free-form answers included; see compliment_store
+compliment_store = ComplimentStore()
+background_tasks = set()
+
+def run_in_background(coro) -> None:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
 async def generate_compliment(preferences: dict) -> str:
-    """Generate a personalized compliment based on preferences"""
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
-    
-    try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"compliment_{uuid.uuid4().hex[:8]}",
-            system_message="Ты - дружелюбный киноэксперт. Сгенерируй короткий (1-2 предложения) тёплый и приятный комплимент пользователю на основе его вкусов в кино. Будь искренним и позитивным."
-        ).with_model("openai", "gpt-5.2")
-        
-        prompt = f"Пользователь любит: жанр - {preferences['favorite_genre']}, настроение - {preferences['favorite_mood']}, эпоха - {preferences['favorite_era']}. Сгенерируй комплимент."
-        response = await chat.send_message(UserMessage(text=prompt))
-        return response.strip()
-    except Exception as e:
-        logger.error(f"Compliment generation error: {e}")
-        return "У вас отличный вкус в кино! Мы подберём для вас идеальные фильмы."
+    """Personalized compliment without waiting on the LLM"""
+    genre, mood, era = (preferences.get(field) or "" for field in ("favorite_genre", "favorite_mood", "favorite_era"))
+    return compliment_store.pick(genre, mood, era)
 
 # ============== AI AVATAR ==============
 
-@api_router.post("/profile/generate-avatar")
+# Avatar bytes live in a content-addressed blob store; users.avatar holds only the URL
+avatar_store = blob_store_from_env(db, ROOT_DIR / "avatar_blobs")
+AVATAR_BASE_URL = os.environ.get('AVATAR_BASE_URL', '')
+AVATAR_MAX_BYTES = int(os.environ.get('AVATAR_MAX_BYTES', str(5 * 1024 * 1024)))
+
+def avatar_url(digest: str) -> str:
+    return f"{AVATAR_BASE_URL}/api/avatars/{digest}"
+
+async def store_avatar(data: bytes, content_type: str) -> str:
+    if len(data) > AVATAR_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Avatar image is too large")
+    return avatar_url(await avatar_store.put(data, content_type))
+
+@api_router.get("/avatars/{digest}")
+async def get_avatar(digest: str, request: Request):
+    if not DIGEST_PATTERN.match(digest):
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    # The URL is the content hash, so a cached copy can never go stale
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag_matches(request.headers.get("if-none-match"), (headers["ETag"],)):
+        return Response(status_code=304, headers=headers)
+    blob = await avatar_store.get(digest)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    data, content_type = blob
+    return Response(content=data, media_type=content_type, headers=headers)
+
+async def generate_avatar_image(prompt: str) -> bytes:
+    # A background job has no degraded answer to shed to, so it queues for the slot
+    async with llm_gates["image"].slot(background=True):
+        images = await llm_provider.generate_images(prompt)
+    if not images:
+        raise RuntimeError("No image generated")
+    return images[0]
+
+async def apply_generated_avatar(user_id: str, avatars: Dict[str, str]) -> None:
+    await db.users.update_one({"user_id": user_id}, {"$set": {"avatar": avatars["medium"], "avatars": avatars}})
+    session_cache.invalidate_user(user_id)
+
+avatar_jobs = AvatarJobs(
+    generate_avatar_image,
+    avatar_store,
+    avatar_url,
+    apply_generated_avatar,
+    ttl=float(os.environ.get('AVATAR_JOB_TTL', '600')),
+)
+
+@api_router.post("/profile/generate-avatar", status_code=202)
 async def generate_avatar(data: AvatarGenerateRequest, request: Request):
-    """Generate AI avatar based on user preferences"""
+    """Queue AI avatar generation based on user preferences; poll or subscribe for the result"""
     user = await require_auth(request)
     
     preferences = user.preferences or {}
@@ -285,24 +462,31 @@ async def generate_avatar(data: AvatarGenerateRequest, request: Request):
     if data.style_prompt:
         prompt = data.style_prompt
     
-    try:
-        from emergentintegrations.llm.openai.image_generation import OpenAIImageGeneration
-        
-        image_gen = OpenAIImageGeneration(api_key=EMERGENT_LLM_KEY)
-        images = await image_gen.generate_images(prompt=prompt, model="gpt-image-1", number_of_images=1)
-        
-        if images and len(images) > 0:
-            image_base64 = base64.b64encode(images[0]).decode('utf-8')
-            avatar_data = f"data:image/png;base64,{image_base64}"
-            
-            await db.users.update_one({"user_id": user.user_id}, {"$set": {"avatar": avatar_data}})
-            
-            return {"avatar": avatar_data}
-        else:
-            raise HTTPException(status_code=500, detail="No image generated")
-    except Exception as e:
-        logger.error(f"Avatar generation error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    job = await avatar_jobs.submit(prompt, user.user_id)
+    return job.snapshot()
+
+async def require_avatar_job(job_id: str, request: Request):
+    user = await require_auth(request)
+    job = avatar_jobs.get(job_id)
+    if job is None or user.user_id not in job.user_ids:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.get("/profile/avatar-jobs/{job_id}")
+async def get_avatar_job(job_id: str, request: Request):
+    job = await require_avatar_job(job_id, request)
+    return job.snapshot()
+
+@api_router.get("/profile/avatar-jobs/{job_id}/events")
+async def stream_avatar_job(job_id: str, request: Request):
+    """Server-sent events with the job state on every change until it is done or failed"""
+    job = await require_avatar_job(job_id, request)
+    
+    async def events():
+        async for snapshot in avatar_jobs.events(job):
+            yield f"event: {snapshot['status']}\ndata: {orjson.dumps(snapshot).decode()}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @api_router.put("/profile")
 async def update_profile(data: ProfileUpdate, request: Request):
@@ -313,105 +497,347 @@ async def update_profile(data: ProfileUpdate, request: Request):
         update_data["name"] = data.name
     if data.avatar is not None:
         update_data["avatar"] = data.avatar
+        if data.avatar.startswith("data:"):
+            parsed = parse_data_url(data.avatar)
+            if parsed is None:
+                raise HTTPException(status_code=400, detail="Avatar must be a base64 image data URL")
+            update_data["avatar"] = await store_avatar(parsed[1], parsed[0])
+        # Size variants only exist for generated avatars
+        if update_data["avatar"] != (user.avatars or {}).get("medium"):
+            update_data["avatars"] = None
     
     if update_data:
         await db.users.update_one({"user_id": user.user_id}, {"$set": update_data})
+        session_cache.invalidate_user(user.user_id)
     
     user_doc = await db.users.find_one({"user_id": user.user_id}, {"_id": 0})
     return user_doc
 
 # ============== AI MOVIE RECOMMENDATIONS ==============
 
-ALL_MOVIES_STR = """- arrival (Прибытие, 2016) - философская sci-fi
-- blade_runner_2049 (Бегущий по лезвию 2049, 2017) - неонуар
-- interstellar (Интерстеллар, 2014) - эпическая sci-fi
-- matrix (Матрица, 1999) - киберпанк
-- inception (Начало, 2010) - сны
-- ex_machina (Из машины, 2014) - камерная sci-fi
-- her (Она, 2013) - романтическая sci-fi
-- dune (Дюна, 2021) - эпическая фантастика
-- drive (Драйв, 2011) - минималистичный криминал
-- memento (Помни, 2000) - психологический триллер
-- prisoners (Пленницы, 2013) - мрачный триллер
-- no_country (Старикам тут не место, 2007) - криминальная драма
-- prestige (Престиж, 2006) - загадочный триллер
-- shutter_island (Остров проклятых, 2010) - психологический триллер
-- seven (Семь, 1995) - мрачный детектив
-- gone_girl (Исчезнувшая, 2014) - триллер
-- sicario (Убийца, 2015) - напряжённый боевик
-- nightcrawler (Стрингер, 2014) - тёмная драма
-- fight_club (Бойцовский клуб, 1999) - культовая драма
-- whiplash (Одержимость, 2014) - напряжённая драма
-- eternal_sunshine (Вечное сияние, 2004) - романтика и память
-- there_will_be_blood (Нефть, 2007) - эпическая драма
-- dark_knight (Тёмный рыцарь, 2008) - супергеройский эпик
-- pulp_fiction (Криминальное чтиво, 1994) - культовая классика
-- goodfellas (Славные парни, 1990) - гангстерская классика
-- parasite (Паразиты, 2019) - социальная сатира
-- joker (Джокер, 2019) - характерная драма
-- oppenheimer (Оппенгеймер, 2023) - эпическая биография"""
+recommendation_cache = RecommendationCache(
+    db.recommendation_cache,
+    GraphResponse,
+    CATALOG_VERSION,
+    maxsize=int(os.environ.get('RECOMMEND_CACHE_SIZE', '512')),
+    ttl=float(os.environ.get('RECOMMEND_CACHE_TTL', str(24 * 60 * 60))),
+)
 
-async def get_movie_recommendations(query: str) -> GraphResponse:
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
+semantic_cache = SemanticCache(
+    threshold=float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', '0.75')),
+    capacity=int(os.environ.get('SEMANTIC_CACHE_SIZE', '1024')),
+)
+
+async def lookup_cached_graph(query: str) -> Tuple[Optional[GraphResponse], Optional[str]]:
+    """Exact cache tiers first, then the semantic cache; returns (graph, X-Cache value)"""
+    cached, tier = await recommendation_cache.get(query)
+    if cached is not None:
+        return cached, f"HIT-{tier.upper()}"
     
-    chat = LlmChat(
-        api_key=EMERGENT_LLM_KEY,
-        session_id=f"recommend_{uuid.uuid4().hex[:8]}",
-        system_message=f"""Ты - эксперт по кино. На основе запроса выбери 15-20 фильмов из списка:
-{ALL_MOVIES_STR}
+    similar, _ = semantic_cache.lookup(query)
+    if similar is not None:
+        return similar, "HIT-SEMANTIC"
+    return None, None
+
+# "llm": LLM with the canned fallback graph, "local": catalog-only engine,
+# "hybrid": LLM, falling back to the local engine instead of the canned graph
+RECOMMENDER_MODE = os.environ.get('RECOMMENDER_MODE', 'hybrid')
+if RECOMMENDER_MODE not in ('llm', 'local', 'hybrid'):
+    raise RuntimeError(f"Unknown RECOMMENDER_MODE: {RECOMMENDER_MODE}")
+local_recommender = LocalRecommender(MOCK_MOVIES, MOVIE_TAGS)
+catalog = CatalogService(MOCK_MOVIES, MOVIE_TAGS, version=CATALOG_VERSION)
+# Full-text matches the local engine scores; fewer than a graph's worth means score the whole catalog
+RECOMMEND_CANDIDATES = int(os.environ.get('RECOMMEND_CANDIDATES', '500'))
+movie_similarity = local_recommender.similarity
+
+# Past the budget the user gets the degraded graph; the LLM call keeps running and fills the cache
+RECOMMEND_LATENCY_BUDGET = float(os.environ.get('RECOMMEND_LATENCY_BUDGET_MS', '8000')) / 1000
+recommendation_breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get('LLM_BREAKER_FAILURES', '5')),
+    cooldown=float(os.environ.get('LLM_BREAKER_COOLDOWN', '30')),
+)
+recommend_hedging = {"llm_requests": 0, "hedged": 0}
 
-Выбери 4-5 TOP фильмов (is_top: true), остальные 10-15 - связанные (is_top: false).
+def local_recommendations(query: str) -> GraphResponse:
+    return GraphResponse.model_validate(local_recommender.recommend(query, catalog.candidates(query, RECOMMEND_CANDIDATES)))
 
-Отвечай СТРОГО в JSON:
-{{"nodes": [{{"id": "arrival", "title": "Arrival", "title_ru": "Прибытие", "year": 2016, "vibe": "философская тишина", "is_top": true}}], "links": [{{"source": "arrival", "target": "her", "strength": 0.7}}], "query_summary": "Краткое описание"}}
+def degraded_recommendations(query: str, engine: str) -> Tuple[GraphResponse, str]:
+    """Graph to serve when the LLM path fails; returns (graph, X-Recommender value)"""
+    if engine == "hybrid":
+        return local_recommendations(query), "local"
+    return fallback_recommendations(), "fallback"
 
-Создай 25-35 связей между фильмами."""
-    ).with_model("openai", "gpt-5.2")
+async def recommend(query: str, engine: Optional[str] = None) -> Tuple[GraphResponse, str, str]:
+    """Serve from the response cache, else ask the LLM; returns (graph, X-Cache value, X-Recommender value)"""
+    engine = engine or RECOMMENDER_MODE
+    if engine == "local":
+        return local_recommendations(query), "BYPASS", "local"
     
+    cached, cache_status = await lookup_cached_graph(query)
+    if cached is not None:
+        return cached, cache_status, "llm"
+    
+    if not recommendation_breaker.allow():
+        graph, source = degraded_recommendations(query, engine)
+        return graph, "MISS", source
+    
+    recommend_hedging["llm_requests"] += 1
     try:
-        response = await chat.send_message(UserMessage(text=query))
-        response_text = response.strip()
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
-        result = json.loads(response_text)
-        
-        for node in result["nodes"]:
-            if node["id"] in MOCK_MOVIES:
-                node["poster"] = MOCK_MOVIES[node["id"]].poster
-        
-        return GraphResponse(**result)
+        # Timing out cancels only this waiter; single-flight keeps the shared call running
+        graph = await asyncio.wait_for(
+            llm_flights.do(("recommend", normalize_query(query)), lambda: fetch_and_cache_recommendations(query)),
+            RECOMMEND_LATENCY_BUDGET,
+        )
+    except asyncio.TimeoutError:
+        recommend_hedging["hedged"] += 1
+        graph, source = degraded_recommendations(query, engine)
+        return graph, "MISS", source
     except Exception as e:
         logger.error(f"AI recommendation error: {e}")
-        # Fast fallback
-        return GraphResponse(
-            nodes=[
-                MovieNode(id="interstellar", title="Interstellar", title_ru="Интерстеллар", year=2014, vibe="эпос", is_top=True, poster=MOCK_MOVIES["interstellar"].poster),
-                MovieNode(id="inception", title="Inception", title_ru="Начало", year=2010, vibe="сны", is_top=True, poster=MOCK_MOVIES["inception"].poster),
-                MovieNode(id="dark_knight", title="The Dark Knight", title_ru="Тёмный рыцарь", year=2008, vibe="драма", is_top=True, poster=MOCK_MOVIES["dark_knight"].poster),
-                MovieNode(id="arrival", title="Arrival", title_ru="Прибытие", year=2016, vibe="философия", is_top=True, poster=MOCK_MOVIES["arrival"].poster),
-                MovieNode(id="blade_runner_2049", title="Blade Runner 2049", title_ru="Бегущий по лезвию", year=2017, vibe="неонуар", is_top=False, poster=MOCK_MOVIES["blade_runner_2049"].poster),
-                MovieNode(id="matrix", title="Matrix", title_ru="Матрица", year=1999, vibe="киберпанк", is_top=False, poster=MOCK_MOVIES["matrix"].poster),
-                MovieNode(id="prestige", title="The Prestige", title_ru="Престиж", year=2006, vibe="загадка", is_top=False, poster=MOCK_MOVIES["prestige"].poster),
-                MovieNode(id="memento", title="Memento", title_ru="Помни", year=2000, vibe="триллер", is_top=False, poster=MOCK_MOVIES["memento"].poster),
-                MovieNode(id="fight_club", title="Fight Club", title_ru="Бойцовский клуб", year=1999, vibe="культ", is_top=False, poster=MOCK_MOVIES["fight_club"].poster),
-                MovieNode(id="pulp_fiction", title="Pulp Fiction", title_ru="Криминальное чтиво", year=1994, vibe="классика", is_top=False, poster=MOCK_MOVIES["pulp_fiction"].poster),
-            ],
-            links=[
-                MovieLink(source="interstellar", target="inception", strength=0.9),
-                MovieLink(source="interstellar", target="arrival", strength=0.8),
-                MovieLink(source="inception", target="prestige", strength=0.85),
-                MovieLink(source="inception", target="memento", strength=0.8),
-                MovieLink(source="dark_knight", target="prestige", strength=0.7),
-                MovieLink(source="arrival", target="blade_runner_2049", strength=0.75),
-                MovieLink(source="matrix", target="inception", strength=0.6),
-                MovieLink(source="matrix", target="fight_club", strength=0.5),
-                MovieLink(source="fight_club", target="pulp_fiction", strength=0.6),
-                MovieLink(source="memento", target="prestige", strength=0.7),
-            ],
-            query_summary="Подборка интеллектуального кино с глубоким смыслом."
-        )
+        graph, source = degraded_recommendations(query, engine)
+        return graph, "MISS", source
+    return graph, "MISS", "llm"
+
+async def fetch_and_cache_recommendations(query: str) -> GraphResponse:
+    async with llm_gates["recommend"].slot():
+        try:
+            graph = await get_movie_recommendations(query)
+        except Exception:
+            recommendation_breaker.record_failure()
+            raise
+    recommendation_breaker.record_success()
+    await cache_graph(query, graph)
+    return graph
+
+# Daily refresh of the most frequent queries; PREWARM_HOUR is UTC, empty disables the schedule
+PREWARM_HOUR = os.environ.get('PREWARM_HOUR', '4')
+PREWARM_WINDOW_DAYS = float(os.environ.get('PREWARM_WINDOW_DAYS', '7'))
+PREWARM_LIMIT = int(os.environ.get('PREWARM_LIMIT', '50'))
+PREWARM_CONCURRENCY = int(os.environ.get('PREWARM_CONCURRENCY', '2'))
+# Every worker schedules the job; a per-day lease in job_leases lets only one of them run it
+PREWARM_LEASE_TTL = float(os.environ.get('PREWARM_LEASE_TTL', str(12 * 60 * 60)))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+prewarm_state: Dict[str, Any] = {"last_run": None, "task": None, "skipped_cycles": 0}
+
+async def prewarm_recommendation(query: str) -> GraphResponse:
+    if not recommendation_breaker.allow():
+        raise RuntimeError("LLM circuit breaker is open")
+    return await llm_flights.do(("recommend", normalize_query(query)), lambda: fetch_and_cache_recommendations(query))
+
+async def run_prewarm(window_days: Optional[float] = None, limit: Optional[int] = None, concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """Recompute and cache graphs for the most frequent recent queries"""
+    queries = await popular_queries(db.search_history, window_days or PREWARM_WINDOW_DAYS, limit or PREWARM_LIMIT)
+    report = await prewarm([query for query, _ in queries], prewarm_recommendation, concurrency or PREWARM_CONCURRENCY)
+    logger.info(f"Prewarmed {report['refreshed']}/{report['candidates']} recommendation queries in {report['elapsed_ms']} ms")
+    prewarm_state["last_run"] = report
+    return report
+
+async def run_scheduled_prewarm() -> Optional[Dict[str, Any]]:
+    cycle = f"prewarm:{datetime.now(timezone.utc):%Y-%m-%d}"
+    try:
+        acquired = await acquire_lease(db.job_leases, cycle, WORKER_ID, PREWARM_LEASE_TTL)
+    except Exception as e:
+        logger.error(f"Prewarm lease error: {e}")
+        return None
+    if not acquired:
+        prewarm_state["skipped_cycles"] += 1
+        logger.info(f"Skipping {cycle}: another worker holds the lease")
+        return None
+    return await run_prewarm()
+
+async def cache_graph(query: str, graph: GraphResponse) -> None:
+    await recommendation_cache.set(query, graph)
+    semantic_cache.add(query, graph)
+
+# A catalog up to PROMPT_CATALOG_LIMIT films is listed whole in the system prompt; for a larger
+# one each request carries the local engine's best PROMPT_CANDIDATES films for its query
+PROMPT_CATALOG_LIMIT = int(os.environ.get('PROMPT_CATALOG_LIMIT', '100'))
+PROMPT_CANDIDATES = int(os.environ.get('PROMPT_CANDIDATES', '60'))
+PROMPT_FULL_CATALOG = len(MOCK_MOVIES) <= PROMPT_CATALOG_LIMIT
+ALL_MOVIES_STR = "\n".join(
+    line for line in (prompt_line(movie_id, MOCK_MOVIES, MOVIE_TAGS) for movie_id in ALL_MOVIE_IDS) if line
+) if PROMPT_FULL_CATALOG else ""
+
+def recommend_prompt(query: str) -> str:
+    """User message for the recommend operation: the query, plus its candidate films for a large catalog"""
+    if PROMPT_FULL_CATALOG:
+        return query
+    ranked, references = local_recommender.ranked(query, catalog.candidates(query, RECOMMEND_CANDIDATES))
+    lines = (prompt_line(movie_id, MOCK_MOVIES, MOVIE_TAGS) for movie_id in (references + ranked)[:PROMPT_CANDIDATES])
+    return f"{query}\n\nКандидаты:\n" + "\n".join(line for line in lines if line)
+
+CANDIDATE_LIST = f"из списка:\n{ALL_MOVIES_STR}" if PROMPT_FULL_CATALOG else "из списка кандидатов, который идёт после запроса."
+
+RECOMMEND_SYSTEM_PROMPT = f"""Ты - эксперт по кино. На основе запроса выбери 15-20 фильмов {CANDIDATE_LIST}
+
+Выбери 4-5 TOP фильмов (top: 1), остальные 10-15 - связанные (top: 0).
+Сначала перечисли TOP фильмы, затем связанные. Связи между фильмами НЕ нужны.
+Названия и годы НЕ пиши - только id из списка и vibe в 1-3 слова.
+
+Отвечай СТРОГО в компактном JSON без пробелов и переносов:
+{{"nodes":[{{"id":"arrival","top":1,"vibe":"философская тишина"}}],"summary":"Краткое описание"}}"""
+
+# Token streaming for /movies/recommend/stream goes through litellm and needs an endpoint that takes
+# the key (LLM_API_BASE); without LLM_STREAMING=1 the stream gets the whole reply at once
+llm_provider = LlmProvider(EMERGENT_LLM_KEY, {
+    "recommend": RECOMMEND_SYSTEM_PROMPT,
+}, streaming=os.environ.get('LLM_STREAMING') == '1', api_base=os.environ.get('LLM_API_BASE') or None)
+
+async def get_movie_recommendations(query: str) -> GraphResponse:
+    """Ask the LLM for a graph; raises on provider or parse errors"""
+    return graph_from_llm_result(parse_llm_reply(await llm_provider.complete("recommend", recommend_prompt(query))))
+
+def hydrate_node(item: LlmNode) -> Optional[MovieNode]:
+    node = catalog_node(item, MOCK_MOVIES, MOVIE_TAGS)
+    return MovieNode(**node) if node is not None else None
+
+def graph_from_llm_result(result: LlmGraph) -> GraphResponse:
+    """Hydrate the compact model output from the catalog, dropping unknown and repeated ids"""
+    # The parts are plain dicts validated in one pydantic-core pass: on pydantic 2.12
+    # that beats model_construct, which runs in Python, by about 3x for a graph this size
+    return GraphResponse.model_validate(hydrate_graph(result, MOCK_MOVIES, MOVIE_TAGS, movie_similarity))
+
+def ndjson_event(event_type: str, data: Any) -> bytes:
+    return orjson.dumps({"type": event_type, "data": data}) + b"\n"
+
+def graph_events(graph: GraphResponse, cache_status: str):
+    for node in graph.nodes:
+        yield ndjson_event("node", node.model_dump())
+    for link in graph.links:
+        yield ndjson_event("link", link.model_dump())
+    yield ndjson_event("summary", graph.query_summary)
+    yield ndjson_event("done", {"cache": cache_status})
+
+async def recommendation_events(query: str, engine: Optional[str] = None) -> AsyncIterator[bytes]:
+    """NDJSON events: each node/link as soon as the LLM has finished it, then the summary"""
+    engine = engine or RECOMMENDER_MODE
+    if engine == "local":
+        for event in graph_events(local_recommendations(query), "BYPASS"):
+            yield event
+        return
+    
+    cached, cache_status = await lookup_cached_graph(query)
+    if cached is not None:
+        for event in graph_events(cached, cache_status):
+            yield event
+        return
+    
+    if not recommendation_breaker.allow():
+        graph, _ = degraded_recommendations(query, engine)
+        for event in graph_events(graph, "MISS"):
+            yield event
+        return
+    
+    # The provider stream is read in its own task, so the gate slot is released as
+    # soon as the model finishes, however slowly this client reads its events
+    events: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+    recommend_hedging["llm_requests"] += 1
+    run_in_background(shared_llm_recommendation(query, events))
+    emitted_ids: List[str] = []
+    emitted_links = set()
+    async for kind, value in until_deadline(events, RECOMMEND_LATENCY_BUDGET):
+        if kind == "item":
+            try:
+                node = hydrate_node(LlmNode.model_validate(value))
+            except ValidationError:
+                continue
+            if node is None or node.id in emitted_ids:
+                continue
+            yield ndjson_event("node", node.model_dump())
+            # Attaching each star to its closest predecessor keeps the partial map connected
+            link = movie_similarity.attach(node.id, emitted_ids)
+            if link is not None:
+                emitted_links.add((link["source"], link["target"]))
+                yield ndjson_event("link", link)
+            emitted_ids.append(node.id)
+        elif kind == "error":
+            if not emitted_ids:
+                graph, _ = degraded_recommendations(query, engine)
+                for event in graph_events(graph, "MISS"):
+                    yield event
+            else:
+                yield ndjson_event("error", "Recommendation stream interrupted")
+            return
+        elif kind == "timeout":
+            # Same budget as /movies/recommend: the stars shown so far stay, the degraded graph fills in the rest
+            recommend_hedging["hedged"] += 1
+            graph, _ = degraded_recommendations(query, engine)
+            if not emitted_ids:
+                for event in graph_events(graph, "MISS"):
+                    yield event
+                return
+            for node in graph.nodes:
+                if len(emitted_ids) >= len(graph.nodes):
+                    break
+                if node.id in emitted_ids:
+                    continue
+                yield ndjson_event("node", node.model_dump())
+                link = movie_similarity.attach(node.id, emitted_ids)
+                if link is not None:
+                    yield ndjson_event("link", link)
+                emitted_ids.append(node.id)
+            yield ndjson_event("summary", graph.query_summary)
+            yield ndjson_event("done", {"cache": "MISS"})
+            return
+        else:
+            graph = value
+            break
+    
+    # A request that joined another one's LLM call gets its nodes only now
+    for node in graph.nodes:
+        if node.id not in emitted_ids:
+            yield ndjson_event("node", node.model_dump())
+            emitted_ids.append(node.id)
+    for link in graph.links:
+        if (link.source, link.target) not in emitted_links:
+            yield ndjson_event("link", link.model_dump())
+    yield ndjson_event("summary", graph.query_summary)
+    yield ndjson_event("done", {"cache": "MISS"})
+
+async def shared_llm_recommendation(query: str, events: asyncio.Queue) -> None:
+    """Lead or join the LLM call for ``query``; put ("graph", graph) or ("error", e) when it ends.
+
+    Shares the single-flight key of /movies/recommend and the prewarm, so identical
+    concurrent queries make one LLM call. Only the leader's queue gets ("item", ...)
+    events as the reply streams in; the others get the finished graph.
+    """
+    try:
+        graph = await llm_flights.do(("recommend", normalize_query(query)), lambda: stream_llm_recommendation(query, events))
+    except Exception as e:
+        events.put_nowait(("error", e))
+        return
+    events.put_nowait(("graph", graph))
+
+async def stream_llm_recommendation(query: str, events: asyncio.Queue) -> GraphResponse:
+    """Put ("item", raw node) as each arrives and return the cached graph; raises on provider or parse errors"""
+    parser = JsonArrayItemParser(["nodes"])
+    try:
+        async with llm_gates["recommend"].slot():
+            async for chunk in llm_provider.stream("recommend", recommend_prompt(query)):
+                for _, item in parser.feed(chunk):
+                    events.put_nowait(("item", item))
+        graph = graph_from_llm_result(LlmGraph.model_validate(parser.result()))
+    except Exception as e:
+        logger.error(f"AI recommendation stream error: {e}")
+        if not isinstance(e, LoadShed):
+            recommendation_breaker.record_failure()
+        raise
+    recommendation_breaker.record_success()
+    # Finishes even if the client has gone away
+    await cache_graph(query, graph)
+    return graph
+
+# Graph for when the LLM is unavailable, built once at import from the catalog's best-rated films
+FALLBACK_GRAPH = GraphResponse.model_validate(hydrate_graph(
+    LlmGraph(
+        nodes=[LlmNode(id=movie_id, top=i < 4) for i, movie_id in enumerate(catalog.top_rated(limit=10))],
+        summary="Подборка самых высоко оценённых фильмов каталога.",
+    ),
+    MOCK_MOVIES, MOVIE_TAGS, movie_similarity,
+))
+
+def fallback_recommendations() -> GraphResponse:
+    return FALLBACK_GRAPH
 
 # ============== MOVIE ENDPOINTS ==============
 
@@ -425,21 +851,95 @@ async def validate_query(data: QueryRequest):
 async def get_recommendations(data: QueryRequest, request: Request):
     user = await get_current_user(request)
     if user:
-        await db.search_history.insert_one({"id": str(uuid.uuid4()), "user_id": user.user_id, "query": data.query, "created_at": datetime.now(timezone.utc).isoformat()})
-    return await get_movie_recommendations(data.query)
+        await db.search_history.insert_one({"id": str(uuid.uuid4()), "user_id": user.user_id, "query": data.query, "created_at": datetime.now(timezone.utc)})
+    graph, cache_status, source = await recommend(data.query, data.engine)
+    if data.include_details:
+        fields = check_detail_fields(data.detail_fields)
+        details, _ = catalog.details((node.id for node in graph.nodes if node.is_top), fields)
+        # Cached graphs are shared, so the details go on a copy
+        graph = graph.model_copy(update={"details": details})
+    return model_response(graph, {"X-Cache": cache_status, "X-Recommender": source})
+
+@api_router.post("/movies/recommend/stream")
+async def stream_recommendations(data: QueryRequest, request: Request):
+    user = await get_current_user(request)
+    if user:
+        await db.search_history.insert_one({"id": str(uuid.uuid4()), "user_id": user.user_id, "query": data.query, "created_at": datetime.now(timezone.utc)})
+    return StreamingResponse(recommendation_events(data.query, data.engine), media_type="application/x-ndjson")
+
+@api_router.get("/movies/search")
+async def search_movies(q: str, limit: int = 10, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                        min_rating: Optional[float] = None, tag: Optional[str] = None):
+    allowed = None
+    if year_from is not None or year_to is not None:
+        allowed = set(catalog.in_years(year_from if year_from is not None else 0, year_to if year_to is not None else 9999))
+    if min_rating is not None:
+        rated = set(catalog.top_rated(min_rating))
+        allowed = rated if allowed is None else allowed & rated
+    if tag:
+        tagged = catalog.with_tag(tag)
+        allowed = tagged if allowed is None else allowed & tagged
+    return {"query": q, "results": catalog.search(q, max(1, min(limit, 50)), allowed)}
+
+@api_router.get("/movies/search/text")
+async def search_movie_text(q: str, limit: int = 10):
+    return {"query": q, "results": catalog.search_text(q, max(1, min(limit, 50)))}
+
+MOVIE_BATCH_LIMIT = 100
+
+def check_detail_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    if fields is None:
+        return None
+    unknown = sorted(set(fields) - catalog.detail_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def movie_batch(ids: List[str], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if len(ids) > MOVIE_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {MOVIE_BATCH_LIMIT} ids per batch")
+    movies, missing = catalog.details(ids, check_detail_fields(fields))
+    return {"movies": movies, "missing": missing}
+
+def split_csv(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+@api_router.get("/movies/batch")
+async def get_movie_batch(ids: str, fields: Optional[str] = None):
+    return movie_batch(split_csv(ids), split_csv(fields) if fields is not None else None)
+
+@api_router.post("/movies/batch")
+async def post_movie_batch(data: MovieBatchRequest):
+    return movie_batch(data.ids, data.fields)
+
+# Details only change with a deploy, and the catalog version is part of every ETag
+MOVIE_CACHE_CONTROL = f"public, max-age={int(os.environ.get('MOVIE_CACHE_MAX_AGE', '3600'))}"
 
 @api_router.get("/movies/{movie_id}")
-async def get_movie_detail(movie_id: str):
-    if movie_id not in MOCK_MOVIES:
+async def get_movie_detail(movie_id: str, request: Request):
+    payload = catalog.payload(movie_id)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Movie not found")
-    return MOCK_MOVIES[movie_id].model_dump()
+    use_gzip = accepts_gzip(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": payload.gzip_etag if use_gzip else payload.etag,
+        "Cache-Control": MOVIE_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), (payload.etag, payload.gzip_etag)):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=payload.gzipped, media_type="application/json", headers=headers)
+    return Response(content=payload.raw, media_type="application/json", headers=headers)
 
 # ============== HISTORY & FAVORITES ==============
 
 @api_router.get("/history")
 async def get_history(request: Request):
     user = await require_auth(request)
-    return await db.search_history.find({"user_id": user.user_id}, {"_id": 0}).sort("created_at", -1).limit(20).to_list(20)
+    # orjson handles the datetimes itself, so skip FastAPI's jsonable_encoder walk
+    return ORJSONResponse(await db.search_history.find({"user_id": user.user_id}, {"_id": 0}).sort("created_at", -1).limit(20).to_list(20))
 
 @api_router.delete("/history")
 async def clear_history(request: Request):
@@ -450,7 +950,7 @@ async def clear_history(request: Request):
 @api_router.get("/favorites")
 async def get_favorites(request: Request):
     user = await require_auth(request)
-    return await db.favorites.find({"user_id": user.user_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    return ORJSONResponse(await db.favorites.find({"user_id": user.user_id}, {"_id": 0}).sort("created_at", -1).to_list(100))
 
 @api_router.post("/favorites")
 async def add_favorite(request: Request):
@@ -466,8 +966,11 @@ async def add_favorite(request: Request):
     if existing:
         return existing
     
-    favorite = {"id": str(uuid.uuid4()), "user_id": user.user_id, "movie_id": movie_id, "movie_title": movie.title_ru or movie.title, "movie_poster": movie.poster, "created_at": datetime.now(timezone.utc).isoformat()}
-    await db.favorites.insert_one(favorite)
+    favorite = {"id": str(uuid.uuid4()), "user_id": user.user_id, "movie_id": movie_id, "movie_title": movie.title_ru or movie.title, "movie_poster": movie.poster, "created_at": datetime.now(timezone.utc)}
+    try:
+        await db.favorites.insert_one(favorite)
+    except DuplicateKeyError:
+        return await db.favorites.find_one({"user_id": user.user_id, "movie_id": movie_id}, {"_id": 0})
     if "_id" in favorite:
         del favorite["_id"]
     return favorite
@@ -484,6 +987,30 @@ async def remove_favorite(movie_id: str, request: Request):
 async def root():
     return {"message": "StarMaps API", "version": "2.1.0", "movies_count": len(MOCK_MOVIES)}
 
+@api_router.get("/metrics")
+async def get_metrics():
+    return {
+        "session_cache": session_cache.stats(),
+        "oauth_http": oauth_http.stats(),
+        "recommendation_cache": recommendation_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "llm_single_flight": llm_flights.stats(),
+        "llm_gates": {operation: gate.stats() for operation, gate in llm_gates.items()},
+        "llm_provider": llm_provider.stats(),
+        "compliment_store": compliment_store.stats(),
+        "avatar_jobs": avatar_jobs.stats(),
+        "recommend_llm": {
+            "latency_budget_ms": RECOMMEND_LATENCY_BUDGET * 1000,
+            **recommend_hedging,
+            "hedge_rate": round(recommend_hedging["hedged"] / recommend_hedging["llm_requests"], 4) if recommend_hedging["llm_requests"] else 0.0,
+            "breaker": recommendation_breaker.stats(),
+        },
+        "similarity_matrix": movie_similarity.stats(),
+        "catalog": catalog.stats(),
+        "prewarm": {"schedule_hour_utc": PREWARM_HOUR or None, "last_run": prewarm_state["last_run"], "skipped_cycles": prewarm_state["skipped_cycles"]},
+        "auth": {"mode": SESSION_MODE, "db_reads": auth_db_reads, "revoked_sessions": len(revoked_sessions), "revocation_refresh_errors": revoked_sessions.refresh_errors, **auth_stats.snapshot()},
+    }
+
 app.include_router(api_router)
 
 frontend_url = os.environ.get('FRONTEND_URL', 'https://film-search.preview.emergentagent.com')
@@ -491,6 +1018,36 @@ allowed_origins = [frontend_url, "http://localhost:3000", "https://localhost:300
 
 app.add_middleware(CORSMiddleware, allow_credentials=True, allow_origins=allowed_origins, allow_methods=["*"], allow_headers=["*"])
 
+@app.on_event("startup")
+async def bootstrap_db():
+    try:
+        await bootstrap_database(db)
+    except Exception as e:
+        # Serving without new indexes beats not booting; the next deploy retries
+        logger.error(f"Database bootstrap failed, starting without it: {e}")
+    try:
+        await migrate_data_url_avatars(db.users, avatar_store, avatar_url)
+    except Exception as e:
+        logger.error(f"Avatar migration error: {e}")
+
+@app.on_event("startup")
+async def warm_catalog_indexes():
+    # Built in a thread, so the first search or local recommendation does not pay for it
+    run_in_background(asyncio.to_thread(catalog.warm))
+
+@app.on_event("startup")
+async def start_avatar_workers():
+    avatar_jobs.start(workers=int(os.environ.get('AVATAR_WORKERS', '2')))
+
+@app.on_event("startup")
+async def schedule_prewarm():
+    if PREWARM_HOUR:
+        prewarm_state["task"] = asyncio.create_task(run_daily(int(PREWARM_HOUR), run_scheduled_prewarm))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if prewarm_state["task"]:
+        prewarm_state["task"].cancel()
+    avatar_jobs.shutdown()
+    await oauth_http.aclose()
     client.close()
@@ -0,0 +1,105 @@
+# Session token -> resolved user cache used by get_current_user
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from ttl_cache import TTLCache
+
+
+class SessionCache:
+    """Caches the user resolved for a session token until the cache TTL or the
+    session expiry, whichever comes first.
+
+    Every invalidation bumps ``generation``. A caller that reads the user from
+    the database takes ``generation()`` first and passes it to ``set``, so a
+    logout or profile update that lands during the read is not overwritten by
+    the stale user.
+
+    Invalidation only reaches this process. With ``recheck_after`` set,
+    ``get_verified`` asks the caller whether a session last confirmed longer
+    ago still exists, since another worker may have logged it out.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, recheck_after: Optional[float] = None):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, on_evict=self._forget)
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self._checked_at: Dict[str, float] = {}
+        self.recheck_after = recheck_after
+        self._generation = 0
+        self.stale_sets = 0
+        self.rechecks = 0
+
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, session_token: str) -> Optional[Any]:
+        entry = self._cache.get(session_token)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at < datetime.now(timezone.utc):
+            self._cache.pop(session_token)
+            self._forget(session_token, entry)
+            return None
+        return user
+
+    def set(self, session_token: str, user: Any, expires_at: datetime, generation: Optional[int] = None) -> None:
+        if generation is not None and generation != self._generation:
+            self.stale_sets += 1
+            return
+        remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+        previous = self._cache.pop(session_token)
+        if previous is not None:
+            self._forget(session_token, previous)
+        self._cache.set(session_token, (user, expires_at), ttl=remaining)
+        if session_token in self._cache:
+            self._tokens_by_user.setdefault(user.user_id, set()).add(session_token)
+            self._checked_at[session_token] = time.monotonic()
+
+    async def get_verified(self, session_token: str, session_exists: Callable[[str], Awaitable[bool]]) -> Optional[Any]:
+        """``get``, re-confirmed with ``session_exists`` once ``recheck_after`` has passed"""
+        user = self.get(session_token)
+        if user is None or not self.needs_recheck(session_token):
+            return user
+        if await session_exists(session_token):
+            self.confirm(session_token)
+            return user
+        self.invalidate(session_token)
+        return None
+
+    def needs_recheck(self, session_token: str) -> bool:
+        if self.recheck_after is None:
+            return False
+        checked_at = self._checked_at.get(session_token)
+        return checked_at is None or time.monotonic() - checked_at > self.recheck_after
+
+    def confirm(self, session_token: str) -> None:
+        """Record that the session was just found still valid"""
+        self.rechecks += 1
+        if session_token in self._cache:
+            self._checked_at[session_token] = time.monotonic()
+
+    def invalidate(self, session_token: str) -> None:
+        self._generation += 1
+        entry = self._cache.pop(session_token)
+        if entry is not None:
+            self._forget(session_token, entry)
+
+    def invalidate_user(self, user_id: str) -> None:
+        self._generation += 1
+        for session_token in self._tokens_by_user.pop(user_id, set()):
+            self._cache.pop(session_token)
+            self._checked_at.pop(session_token, None)
+
+    def _forget(self, session_token: str, entry: tuple) -> None:
+        """Drop a token from the reverse index once its cache entry is gone"""
+        self._checked_at.pop(session_token, None)
+        user_id = entry[0].user_id
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(session_token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "indexed_users": len(self._tokens_by_user), "stale_sets": self.stale_sets, "rechecks": self.rechecks}
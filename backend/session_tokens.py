@@ -0,0 +1,117 @@
+# Stateless HMAC-signed session tokens and their logout denylist
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+TOKEN_PREFIX = "sst1"
+
+logger = logging.getLogger(__name__)
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class SignedSessionCodec:
+    """Issues and verifies ``sst1.<payload>.<signature>`` tokens.
+
+    The payload carries ``user_id``, the expiry timestamp and a random session
+    id (``jti``) used for revocation, so verification needs no database read.
+    """
+
+    def __init__(self, secret: str):
+        if not secret:
+            raise ValueError("A non-empty secret is required for signed sessions")
+        self._key = secret.encode("utf-8")
+
+    def _sign(self, message: bytes) -> str:
+        return _b64encode(hmac.new(self._key, message, hashlib.sha256).digest())
+
+    def issue(self, user_id: str, expires_at: datetime) -> Tuple[str, str]:
+        jti = uuid.uuid4().hex
+        claims = {"u": user_id, "e": int(expires_at.timestamp()), "j": jti}
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        signing_input = f"{TOKEN_PREFIX}.{payload}"
+        return f"{signing_input}.{self._sign(signing_input.encode('ascii'))}", jti
+
+    def verify(self, token: str) -> Optional[Dict[str, Any]]:
+        parts = token.split(".")
+        if len(parts) != 3 or parts[0] != TOKEN_PREFIX:
+            return None
+        signing_input = f"{parts[0]}.{parts[1]}"
+        if not hmac.compare_digest(self._sign(signing_input.encode("ascii")), parts[2]):
+            return None
+        try:
+            claims = json.loads(_b64decode(parts[1]))
+            user_id, expires_ts, jti = claims["u"], int(claims["e"]), claims["j"]
+        except (ValueError, KeyError, TypeError):
+            return None
+        if expires_ts <= time.time():
+            return None
+        return {
+            "user_id": user_id,
+            "expires_at": datetime.fromtimestamp(expires_ts, tz=timezone.utc),
+            "jti": jti,
+        }
+
+
+class RevocationList:
+    """Denylist of logged-out signed sessions.
+
+    Revocations are written to Mongo so every worker sees them; each worker
+    keeps a local copy and re-reads it at most once per ``refresh_interval``
+    seconds, so the request path normally stays DB-free. A failed re-read
+    keeps the last-known list and is retried on the next interval.
+    """
+
+    def __init__(self, collection, refresh_interval: float = 30.0):
+        self._collection = collection
+        self.refresh_interval = refresh_interval
+        self._revoked: Dict[str, datetime] = {}
+        self._last_refresh = 0.0
+        self.refresh_errors = 0
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    async def revoke(self, jti: str, expires_at: datetime) -> None:
+        self._revoked[jti] = expires_at
+        await self._collection.update_one(
+            {"jti": jti},
+            {"$set": {"jti": jti, "expires_at": expires_at}},
+            upsert=True,
+        )
+
+    async def refresh_if_stale(self) -> None:
+        if time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = time.monotonic()
+        now = datetime.now(timezone.utc)
+        try:
+            docs = await self._collection.find(
+                {"expires_at": {"$gt": now}}, {"_id": 0, "jti": 1, "expires_at": 1}
+            ).to_list(None)
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning(f"Revocation list refresh failed, keeping {len(self._revoked)} known entries: {e}")
+            return
+        revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        for doc in docs:
+            expires_at = doc["expires_at"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            revoked[doc["jti"]] = expires_at
+        self._revoked = revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
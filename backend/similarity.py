@@ -0,0 +1,151 @@
+# Film-to-film similarity over sparse feature rows, used to derive graph links server-side
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import LatencyStats
+
+
+class SparseRows(NamedTuple):
+    """CSR matrix: row ``i`` holds ``data[indptr[i]:indptr[i + 1]]`` at those ``indices``.
+
+    A film's feature row has a few dozen non-zero terms out of a vocabulary of
+    tens of thousands, so this is what keeps the catalog's vectors O(nnz)
+    instead of films x vocabulary.
+    """
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+    width: int
+
+    @classmethod
+    def from_dense(cls, matrix: np.ndarray) -> "SparseRows":
+        rows, columns = np.nonzero(matrix)
+        indptr = np.zeros(matrix.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=matrix.shape[0]), out=indptr[1:])
+        return cls(indptr, columns.astype(np.int32), matrix[rows, columns].astype(np.float32), matrix.shape[1])
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.indptr.nbytes + self.indices.nbytes + self.data.nbytes)
+
+    def row(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def dot(self, vector: np.ndarray) -> np.ndarray:
+        """Every row times a dense ``vector``, in one pass over the non-zeros."""
+        products = np.append(self.data * vector[self.indices], np.float32(0))
+        starts = self.indptr[:-1]
+        # reduceat yields the element at an empty row's start rather than 0
+        sums = np.add.reduceat(products, starts) if len(starts) else products[:0]
+        sums[starts == self.indptr[1:]] = 0
+        return sums
+
+    def dense(self, rows: Sequence[int]) -> np.ndarray:
+        """``rows`` as a dense block over just the columns they use."""
+        parts = [self.row(row) for row in rows]
+        columns = np.unique(np.concatenate([indices for indices, _ in parts])) if parts else np.array([], dtype=np.int32)
+        block = np.zeros((len(parts), len(columns)), dtype=np.float32)
+        for i, (indices, data) in enumerate(parts):
+            block[i, np.searchsorted(columns, indices)] = data
+        return block
+
+
+class SimilarityMatrix:
+    """Cosine similarities between L2-normalised film rows.
+
+    Only the handful of films in one graph are ever compared, so the
+    similarities are computed per call from the sparse rows instead of being
+    held as a films x films matrix. ``links_for`` turns any node set into
+    links without asking the LLM, so link strengths are consistent between calls.
+    There is nothing to build up front; ``calls`` times the per-graph work instead.
+    """
+
+    def __init__(self, ids: Sequence[str], vectors: Any, row_of: Optional[Callable[[str], Optional[int]]] = None):
+        self.ids = ids
+        self.vectors = vectors if isinstance(vectors, SparseRows) else SparseRows.from_dense(np.asarray(vectors, dtype=np.float32))
+        if row_of is None:
+            row_of = {movie_id: i for i, movie_id in enumerate(ids)}.get
+        self._row = row_of
+        self.calls = LatencyStats()
+
+    @staticmethod
+    def strength(similarity: float) -> float:
+        return round(0.3 + 0.65 * max(0.0, similarity), 2)
+
+    def _link(self, source: str, target: str, similarity: float) -> Dict[str, Any]:
+        return {"source": source, "target": target, "strength": self.strength(float(similarity))}
+
+    def _known(self, ids: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+        """The ids with a feature row, and their pairwise similarities with a zero diagonal."""
+        with self.calls.time():
+            return self._gram(ids)
+
+    def _gram(self, ids: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+        known, rows = [], []
+        for movie_id in ids:
+            row = self._row(movie_id)
+            if row is not None and movie_id not in known:
+                known.append(movie_id)
+                rows.append(row)
+        block = self.vectors.dense(rows)
+        gram = block @ block.T
+        np.fill_diagonal(gram, 0.0)
+        return known, gram
+
+    def attach(self, movie_id: str, previous: List[str]) -> Optional[Dict[str, Any]]:
+        """Link ``movie_id`` to its most similar film in ``previous``.
+
+        Applying this to every node in order yields a spanning tree, which is
+        what guarantees the final graph is connected.
+        """
+        if self._row(movie_id) is None:
+            return None
+        known, gram = self._known([movie_id, *(other for other in previous if other != movie_id)])
+        if len(known) < 2:
+            return None
+        best = int(np.argmax(gram[0, 1:])) + 1
+        return self._link(known[best], movie_id, gram[0, best])
+
+    def neighbour_links(self, ids: Iterable[str], neighbours: int = 2, exclude: Iterable[Tuple[str, str]] = ()) -> List[Dict[str, Any]]:
+        """Each node's top-``neighbours`` most similar films within ``ids``."""
+        known, gram = self._known(ids)
+        return self._neighbours(known, gram, neighbours, exclude)
+
+    def _neighbours(self, known: List[str], gram: np.ndarray, neighbours: int, exclude: Iterable[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        if len(known) < 2:
+            return []
+        ranked = gram.copy()
+        np.fill_diagonal(ranked, -np.inf)
+        seen = {frozenset(pair) for pair in exclude}
+        links = []
+        for i, source in enumerate(known):
+            for j in np.argsort(-ranked[i])[:min(neighbours, len(known) - 1)]:
+                pair = frozenset((source, known[int(j)]))
+                if pair in seen:
+                    continue
+                seen.add(pair)
+                links.append(self._link(source, known[int(j)], gram[i, int(j)]))
+        return links
+
+    def links_for(self, ids: List[str], neighbours: int = 2) -> List[Dict[str, Any]]:
+        """Spanning-tree links in node order plus top-k neighbour links, deduplicated."""
+        known, gram = self._known(ids)
+        tree = []
+        for i in range(1, len(known)):
+            j = int(np.argmax(gram[i, :i]))
+            tree.append(self._link(known[j], known[i], gram[i, j]))
+        pairs = [(link["source"], link["target"]) for link in tree]
+        return tree + self._neighbours(known, gram, neighbours, pairs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "films": len(self.vectors),
+            "nonzeros": int(len(self.vectors.data)),
+            "bytes": self.vectors.nbytes,
+            "calls": self.calls.snapshot(),
+        }
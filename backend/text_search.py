@@ -0,0 +1,136 @@
+# Full-text search over catalog descriptions: light RU/EN stemming and an incremental BM25 inverted index
+import math
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from local_recommender import STOP_WORDS
+
+_WORD = re.compile(r"\w+")
+_CYRILLIC = re.compile(r"[а-я]")
+
+TEXT_STOP_WORDS = STOP_WORDS | {
+    "of", "to", "in", "on", "and", "or", "is", "are", "his", "its", "their", "who", "for", "from", "by", "into",
+    "без", "из", "за", "от", "до", "для", "его", "ее", "их", "он", "она", "они", "который", "которая", "которые",
+}
+
+# Noun and adjective endings only, longest first; verb endings ("-ет", "-ть")
+# would clip nouns like "бюджет" and "память", and descriptions are mostly nouns
+_RU_ENDINGS = sorted([
+    "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "иях", "ией",
+    "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие", "ую", "юю", "ом", "ем", "ах", "ях",
+    "ов", "ев", "ам", "ям", "ию", "ия", "ью",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+], key=len, reverse=True)
+
+MIN_STEM = 3
+
+
+def stem(word: str) -> str:
+    if _CYRILLIC.search(word):
+        for ending in _RU_ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+                return word[:-len(ending)]
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")) and len(word) > 3:
+        word = word[:-1]
+    for suffix in ("ing", "ed", "ly"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM + 1:
+            word = word[:-len(suffix)]
+            break
+    # "communicate"/"communicating", "memory"/"memories" share a stem
+    if len(word) > MIN_STEM + 1 and word[-1] in "ey":
+        word = word[:-1]
+    return word
+
+
+def analyze(text: str) -> List[str]:
+    words = _WORD.findall(text.lower().replace("ё", "е"))
+    return [stem(word) for word in words if word not in TEXT_STOP_WORDS and len(word) > 1]
+
+
+class InvertedIndex:
+    """BM25 over weighted fields, updated one document at a time.
+
+    Postings map a stem to ``{doc_id: weighted term frequency}``, so a query
+    term costs one dict lookup plus one step per matching document. Document
+    frequencies and the average length are read at query time, which keeps
+    ``add`` and ``remove`` cheap and the scores exact after every update.
+    """
+
+    def __init__(self, field_weights: Dict[str, float], k1: float = 1.2, b: float = 0.75):
+        self.field_weights = field_weights
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._lengths: Dict[str, float] = {}
+        self._terms: Dict[str, List[str]] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._lengths
+
+    def add(self, doc_id: str, fields: Dict[str, str]) -> None:
+        if doc_id in self._lengths:
+            self.remove(doc_id)
+        frequencies: Dict[str, float] = defaultdict(float)
+        for field, text in fields.items():
+            weight = self.field_weights.get(field, 1.0)
+            for term in analyze(text or ""):
+                frequencies[term] += weight
+        for term, frequency in frequencies.items():
+            self._postings[term][doc_id] = frequency
+        length = sum(frequencies.values())
+        self._lengths[doc_id] = length
+        self._terms[doc_id] = list(frequencies)
+        self._total_length += length
+
+    def remove(self, doc_id: str) -> None:
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._terms.pop(doc_id):
+            del self._postings[term][doc_id]
+            if not self._postings[term]:
+                del self._postings[term]
+
+    def idf(self, term: str) -> float:
+        frequency = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self._lengths) - frequency + 0.5) / (frequency + 0.5))
+
+    def scores(self, query: str) -> Dict[str, float]:
+        if not self._lengths:
+            return {}
+        average = self._total_length / len(self._lengths) or 1.0
+        totals: Dict[str, float] = defaultdict(float)
+        for term in set(analyze(query)):
+            docs = self._postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf(term)
+            for doc_id, frequency in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average)
+                totals[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return totals
+
+    def search(self, query: str, limit: int = 10, allowed: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        totals = self.scores(query)
+        if allowed is not None:
+            allowed = set(allowed)
+            totals = {doc_id: score for doc_id, score in totals.items() if doc_id in allowed}
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "documents": len(self._lengths),
+            "terms": len(self._postings),
+            "postings": sum(len(docs) for docs in self._postings.values()),
+        }
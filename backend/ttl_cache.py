@@ -0,0 +1,75 @@
+# Bounded in-process LRU cache with per-entry expiry
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """LRU cache where every entry also carries an absolute expiry (monotonic seconds).
+
+    Not shared between workers: each uvicorn process keeps its own copy, so
+    ``ttl`` bounds how long a stale entry can be served after a write elsewhere.
+    ``on_evict(key, value)`` runs when an entry is dropped by the LRU bound or
+    found expired, but not for ``pop`` or ``clear``.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires = entry
+        if expires <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            evicted_key, (evicted, _) = self._data.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.pop(key, None)
+        return entry[0] if entry else None
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
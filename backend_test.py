@@ -145,6 +145,37 @@ class StarMapsAPITester:
                 
         return all_passed
     
+    def test_recommendation_stream(self):
+        """Test NDJSON streaming recommendation endpoint"""
+        url = f"{self.base_url}/api/movies/recommend/stream"
+        self.tests_run += 1
+        self.log("Testing Recommendation Stream...")
+        
+        try:
+            started = time.time()
+            first_node_at = None
+            events = []
+            with self.session.post(url, json={"query": "Медленная философская фантастика"}, stream=True) as response:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event["type"] == "node" and first_node_at is None:
+                        first_node_at = time.time() - started
+                    events.append(event["type"])
+        except Exception as e:
+            self.log(f"❌ Recommendation Stream - Error: {str(e)}", "FAIL")
+            return False
+        
+        nodes = events.count("node")
+        self.log(f"   Nodes: {nodes}, links: {events.count('link')}, first node after: {first_node_at}s")
+        if nodes > 0 and events[-1] == "done":
+            self.tests_passed += 1
+            self.log("✅ Recommendation Stream", "PASS")
+            return True
+        self.log(f"❌ Recommendation Stream - unexpected events: {events[-3:]}", "FAIL")
+        return False
+    
     def test_movie_detail(self):
         """Test movie detail endpoint"""
         # Test with a known movie ID
@@ -267,6 +298,7 @@ class StarMapsAPITester:
         tests = [
             ("API Root & Database", self.test_root_endpoint),
             ("Movie Recommendations (Core Feature)", self.test_movie_recommendations),
+            ("Recommendation Stream", self.test_recommendation_stream),
             ("Movie Details", self.test_movie_detail),
             ("Query Validation", self.test_query_validation),
             ("Demo Login Authentication", self.test_demo_login_auth),
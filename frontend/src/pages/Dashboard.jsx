@@ -4,6 +4,9 @@ import axios from 'axios';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
 
+// Stored avatars are served by the backend under /api/avatars
+const assetUrl = (url) => (url && url.startsWith('/api/') ? `${API_URL}${url}` : url);
+
 const Dashboard = ({ user, onLogout }) => {
   const [query, setQuery] = useState('');
   const [isLoading, setIsLoading] = useState(false);
@@ -16,11 +19,15 @@ const Dashboard = ({ user, onLogout }) => {
   const [showProfile, setShowProfile] = useState(false);
   const [profileName, setProfileName] = useState(user?.name || '');
   const [profileAvatar, setProfileAvatar] = useState(user?.avatar || user?.picture || '');
+  const [profileAvatarThumb, setProfileAvatarThumb] = useState(user?.avatars?.thumb || '');
   const [generatingAvatar, setGeneratingAvatar] = useState(false);
+  const [avatarError, setAvatarError] = useState('');
   const canvasRef = useRef(null);
   const trailCanvasRef = useRef(null);
   const animationRef = useRef(null);
   const nodesRef = useRef([]);
+  const detailsRef = useRef({});
+  const positionsRef = useRef({});
   const [hoveredNode, setHoveredNode] = useState(null);
   const trailRef = useRef([]);
 
@@ -136,10 +143,44 @@ const Dashboard = ({ user, onLogout }) => {
     setIsLoading(true);
     setSelectedMovie(null);
     setMovieDetail(null);
+    setGraphData(null);
+    detailsRef.current = {};
+    positionsRef.current = {};
+    
+    // NDJSON events from the stream endpoint: each star is drawn as soon as it arrives
+    const graph = { nodes: [], links: [], query_summary: '' };
+    const apply = (line) => {
+      if (!line.trim()) return;
+      const { type, data } = JSON.parse(line);
+      if (type === 'node') graph.nodes = [...graph.nodes, data];
+      else if (type === 'link') graph.links = [...graph.links, data];
+      else if (type === 'summary') graph.query_summary = data;
+      else return;
+      setGraphData({ ...graph });
+      setIsLoading(false);
+    };
     
     try {
-      const res = await axios.post(`${API_URL}/api/movies/recommend`, { query: q }, { withCredentials: true });
-      setGraphData(res.data);
+      const res = await fetch(`${API_URL}/api/movies/recommend/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        credentials: 'include',
+        body: JSON.stringify({ query: q }),
+      });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (value) buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.forEach(apply);
+        if (done) break;
+      }
+      apply(buffer + decoder.decode());
+      prefetchDetails(graph.nodes);
       if (user) fetchHistory();
     } catch (e) {
       console.error('Error:', e);
@@ -152,7 +193,21 @@ const Dashboard = ({ user, onLogout }) => {
     if (e.key === 'Enter') handleSearch();
   };
 
+  // One batch request for the stars whose details did not come with the graph
+  const prefetchDetails = async (nodes) => {
+    const ids = nodes.map(n => n.id).filter(id => !detailsRef.current[id]);
+    if (!ids.length) return;
+    try {
+      const res = await axios.get(`${API_URL}/api/movies/batch`, { params: { ids: ids.join(',') } });
+      detailsRef.current = { ...detailsRef.current, ...res.data.movies };
+    } catch (e) {}
+  };
+
   const fetchMovieDetail = async (movieId) => {
+    if (detailsRef.current[movieId]) {
+      setMovieDetail(detailsRef.current[movieId]);
+      return;
+    }
     try {
       const res = await axios.get(`${API_URL}/api/movies/${movieId}`);
       setMovieDetail(res.data);
@@ -184,18 +239,34 @@ const Dashboard = ({ user, onLogout }) => {
     const file = e.target.files[0];
     if (file) {
       const reader = new FileReader();
-      reader.onload = (event) => setProfileAvatar(event.target.result);
+      reader.onload = (event) => {
+        setProfileAvatar(event.target.result);
+        setProfileAvatarThumb('');
+      };
       reader.readAsDataURL(file);
     }
   };
 
   const generateAIAvatar = async () => {
     setGeneratingAvatar(true);
+    setAvatarError('');
     try {
-      const res = await axios.post(`${API_URL}/api/profile/generate-avatar`, {}, { withCredentials: true });
-      setProfileAvatar(res.data.avatar);
+      let res = await axios.post(`${API_URL}/api/profile/generate-avatar`, {}, { withCredentials: true });
+      // Generation runs as a background job; poll until it settles
+      while (res.data.status !== 'done' && res.data.status !== 'failed') {
+        await new Promise((resolve) => setTimeout(resolve, 1500));
+        res = await axios.get(`${API_URL}/api/profile/avatar-jobs/${res.data.job_id}`, { withCredentials: true });
+      }
+      if (res.data.status === 'done') {
+        setProfileAvatar(res.data.avatar);
+        setProfileAvatarThumb(res.data.avatars.thumb);
+      } else {
+        console.error('Avatar generation error:', res.data.error);
+        setAvatarError('Не удалось создать аватар. Попробуйте ещё раз.');
+      }
     } catch (e) {
       console.error('Avatar generation error:', e);
+      setAvatarError('Не удалось создать аватар. Попробуйте ещё раз.');
     }
     setGeneratingAvatar(false);
   };
@@ -217,19 +288,21 @@ const Dashboard = ({ user, onLogout }) => {
     canvas.style.height = `${containerHeight}px`;
     ctx.scale(dpr, dpr);
     
+    // Placed once per star, so stars that streamed in earlier keep their spot as more arrive
     const nodes = graphData.nodes.map((node, i) => {
-      const isTop = node.is_top;
-      const angle = (i / graphData.nodes.length) * Math.PI * 2;
-      const baseRadius = isTop ? 80 + Math.random() * 120 : 150 + Math.random() * 250;
-      
-      return {
-        ...node,
-        x: containerWidth / 2 + Math.cos(angle) * baseRadius + (Math.random() - 0.5) * 150,
-        y: containerHeight / 2 + Math.sin(angle) * baseRadius + (Math.random() - 0.5) * 150,
-        size: isTop ? 4 + Math.random() * 2 : 2 + Math.random() * 2.5,
-        glowIntensity: isTop ? 0.8 : 0.4 + Math.random() * 0.3,
-        pulsePhase: Math.random() * Math.PI * 2
-      };
+      if (!positionsRef.current[node.id]) {
+        const isTop = node.is_top;
+        const angle = i * 2.39996;
+        const baseRadius = isTop ? 80 + Math.random() * 120 : 150 + Math.random() * 250;
+        positionsRef.current[node.id] = {
+          x: containerWidth / 2 + Math.cos(angle) * baseRadius + (Math.random() - 0.5) * 150,
+          y: containerHeight / 2 + Math.sin(angle) * baseRadius + (Math.random() - 0.5) * 150,
+          size: isTop ? 4 + Math.random() * 2 : 2 + Math.random() * 2.5,
+          glowIntensity: isTop ? 0.8 : 0.4 + Math.random() * 0.3,
+          pulsePhase: Math.random() * Math.PI * 2
+        };
+      }
+      return { ...node, ...positionsRef.current[node.id] };
     });
     nodesRef.current = nodes;
     
@@ -361,7 +434,7 @@ const Dashboard = ({ user, onLogout }) => {
             >
               <div className="w-10 h-10 rounded-full overflow-hidden" style={{ border: '1px solid rgba(201, 162, 39, 0.3)' }}>
                 {profileAvatar || user.picture ? (
-                  <img src={profileAvatar || user.picture} alt="" className="w-full h-full object-cover" />
+                  <img src={assetUrl(profileAvatarThumb || profileAvatar || user.picture)} alt="" className="w-full h-full object-cover" />
                 ) : (
                   <div className="w-full h-full flex items-center justify-center" style={{ background: 'rgba(201, 162, 39, 0.1)' }}>
                     <User className="w-5 h-5 text-white/50" />
@@ -578,7 +651,7 @@ const Dashboard = ({ user, onLogout }) => {
             <div className="flex gap-4 mb-6">
               <div className="w-20 h-20 rounded-full overflow-hidden flex-shrink-0" style={{ border: '1px solid rgba(201, 162, 39, 0.3)' }}>
                 {profileAvatar ? (
-                  <img src={profileAvatar} alt="" className="w-full h-full object-cover" />
+                  <img src={assetUrl(profileAvatar)} alt="" className="w-full h-full object-cover" />
                 ) : (
                   <div className="w-full h-full flex items-center justify-center" style={{ background: 'rgba(201, 162, 39, 0.1)' }}>
                     <User className="w-8 h-8 text-white/30" />
@@ -599,6 +672,9 @@ const Dashboard = ({ user, onLogout }) => {
                 </button>
               </div>
             </div>
+            {avatarError && (
+              <p className="text-xs mb-4" style={{ color: '#E07070' }} role="alert">{avatarError}</p>
+            )}
             
             <div className="mb-6">
               <label className="block text-xs text-white/50 mb-2">Имя</label>
@@ -0,0 +1,89 @@
+# Per-operation concurrency gate for LLM provider calls with a bounded wait queue
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+from metrics import LatencyStats
+
+
+class LoadShed(Exception):
+    """Raised instead of queueing when the gate is saturated; callers degrade."""
+
+    def __init__(self, operation: str, reason: str):
+        super().__init__(f"LLM gate '{operation}' shed load: {reason}")
+        self.operation = operation
+        self.reason = reason
+
+
+class ConcurrencyGate:
+    """At most ``limit`` calls run at once; up to ``queue_size`` more wait at most
+    ``max_wait`` seconds for a slot. Anything beyond that raises ``LoadShed``
+    immediately, so a spike turns into fast degraded answers rather than a pile
+    of outstanding provider requests.
+
+    Background work that has no degraded answer (e.g. avatar jobs) uses
+    ``slot(background=True)``: it still respects ``limit`` but waits in line
+    for as long as it takes instead of being shed.
+    """
+
+    def __init__(self, operation: str, limit: int, queue_size: int, max_wait: float):
+        self.operation = operation
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self._slots = asyncio.Semaphore(limit)
+        self.active = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.wait = LatencyStats()
+
+    @asynccontextmanager
+    async def slot(self, background: bool = False):
+        await self._acquire(background)
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    async def _acquire(self, background: bool = False) -> None:
+        if not self._slots.locked() and self.queued == 0:
+            await self._slots.acquire()
+            self.admitted += 1
+            self.wait.observe(0.0)
+            return
+        if self.queued >= self.queue_size and not background:
+            self.shed_queue_full += 1
+            raise LoadShed(self.operation, "queue full")
+
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), None if background else self.max_wait)
+        except asyncio.TimeoutError:
+            self.shed_timeout += 1
+            self.wait.observe((time.perf_counter() - started) * 1000, error=True)
+            raise LoadShed(self.operation, "max wait exceeded")
+        finally:
+            self.queued -= 1
+        self.admitted += 1
+        self.wait.observe((time.perf_counter() - started) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": self.queued,
+            "queue_size": self.queue_size,
+            "max_queue_depth": self.max_queued,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "wait": self.wait.snapshot(),
+        }
@@ -0,0 +1,163 @@
+# Rule-based fast path for /movies/validate; only ambiguous queries go to the LLM
+import re
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+_WORD = re.compile(r"[^\W_]+")
+_VOWELS = "аеёиоуыэюяaeiouy"
+_REPEATED_CHAR = re.compile(r"(.)\1{3,}")
+# Five consonants in a row is vanishingly rare in real RU/EN words
+_CONSONANT_RUN = re.compile(rf"[^{_VOWELS}]{{5,}}")
+
+# Word prefixes are compared, so inflections ("мрачного", "триллеры") still match
+STEM_LENGTH = 6
+# Shorter vocabulary stems ("добр", "умн", "sad") prefix far too many unrelated
+# words ("умножить", "sadovod"); they only match as a whole word or stem + ending
+SHORT_STEM = 5
+ENDINGS = (
+    "ый", "ий", "ой", "ая", "яя", "ое", "ее", "ые", "ие", "ого", "его", "ому", "ым", "им", "ых", "их", "ую", "юю",
+    "ный", "ная", "ное", "ные", "ных", "ного", "ной",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ом", "ем", "ов", "ев", "ами", "ах", "ях",
+    "s", "es", "er", "y",
+)
+
+# Genre, mood, pace and theme vocabulary that makes a query clearly about films
+FILM_VOCABULARY = [
+    # genres
+    "фантаст", "sci", "scifi", "триллер", "thrill", "драма", "драмат", "drama", "комеди", "comedy",
+    "ужас", "ужаст", "хоррор", "horror", "детект", "detect", "крими", "crime", "нуар", "noir",
+    "боевик", "action", "мелодр", "романт", "romant", "вестерн", "wester", "мюзик", "musica",
+    "анимац", "мульт", "animat", "аниме", "anime", "докуме", "docume", "фэнтез", "fantas", "антиут", "дистоп", "dystop",
+    "киберп", "cyberp", "неонуа", "артхау", "биопик", "biopic", "военн", "истори",
+    # moods and atmosphere
+    "мрачн", "грустн", "печал", "меланх", "атмосф", "atmosp", "уютн", "светл", "добр", "тепл",
+    "напряж", "тревож", "жутк", "страшн", "смешн", "весел", "легк", "тяжел", "депрес",
+    "философ", "philos", "глубок", "умн", "интелл", "медлен", "slow", "динами", "эпич", "epic",
+    "красив", "визуал", "visual", "сюрреа", "surrea", "странн", "абсурд", "ностал", "носталь",
+    "dark", "sad", "mood", "cozy", "tense", "mind",
+    # story and theme
+    "сюжет", "концов", "финал", "развяз", "plot", "twist", "ending", "режисс", "direct",
+    "космос", "космич", "space", "будущ", "future", "искусс", "робот", "robot", "ии", "ai",
+    "любов", "love", "одиноч", "lonely", "маньяк", "серийн", "serial", "ограбл", "heist", "мафи",
+    "пришел", "alien", "время", "времен", "сны", "снов", "памят", "memory", "реальн",
+]
+
+# Words that on their own make a query too general to answer
+GENERIC_WORDS = {
+    "хороший", "хорошее", "хорошие", "хорошего", "интересный", "интересное", "интересные", "лучший", "лучшие",
+    "классный", "крутой", "новый", "новые", "фильм", "фильмы", "фильмец", "кино", "что", "то", "нибудь",
+    "посмотреть", "глянуть", "посоветуй", "посоветуйте", "подбери", "хочу", "какой", "какое", "какие",
+    "мне", "на", "вечер", "сегодня", "можно", "ну", "и", "а", "the", "good", "movie", "movies", "film",
+    "films", "watch", "something", "to", "best", "some", "please",
+}
+
+# Greetings and small talk; a query made only of these and generic words is not about films
+SMALL_TALK_WORDS = {
+    "привет", "здравствуй", "здравствуйте", "добрый", "доброе", "доброй", "день", "утро", "вечер", "ночи",
+    "как", "дела", "спасибо", "пока", "hello", "hi", "hey", "thanks", "thank", "you", "how", "are", "morning",
+}
+SMALL_TALK_MARKERS = {"привет", "здравствуй", "здравствуйте", "день", "утро", "ночи", "дела", "спасибо", "пока",
+                      "hello", "hi", "hey", "thanks", "morning"}
+
+# Catalog titles that are also everyday words, so they never decide a query alone
+AMBIGUOUS_TITLES = {"her", "она", "drive", "драйв", "moon", "луна", "помни", "начало", "семь", "se7en"}
+
+_TITLE_FILLER = {"the", "of", "for", "a", "года", "тут", "не", "из"}
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.lower().replace("ё", "е").split())
+
+
+def _stem(word: str) -> str:
+    return word[:STEM_LENGTH]
+
+
+def _is_gibberish_word(word: str) -> bool:
+    if len(word) < 4 or any(char.isdigit() for char in word):
+        return False
+    if not any(char in _VOWELS for char in word):
+        return True
+    return bool(_REPEATED_CHAR.search(word) or _CONSONANT_RUN.search(word))
+
+
+class LocalQueryValidator:
+    """Decides clear-cut queries in-process.
+
+    ``classify`` returns ``(is_valid, error_message)`` for queries it is sure
+    about and ``None`` for the ambiguous rest, which the caller sends to the LLM.
+    """
+
+    def __init__(self, titles: Iterable[str], min_letters: int = 3):
+        self.min_letters = min_letters
+        self.stems = {entry[:STEM_LENGTH] for entry in FILM_VOCABULARY if len(entry) >= SHORT_STEM}
+        self.short_stems = {entry for entry in FILM_VOCABULARY if len(entry) < SHORT_STEM}
+        self.titles: List[Tuple[str, ...]] = []
+        for title in titles:
+            normalized = normalize(title)
+            if not normalized or normalized in AMBIGUOUS_TITLES:
+                continue
+            words = tuple(_stem(word) for word in _WORD.findall(normalized) if word not in _TITLE_FILLER)
+            if words:
+                self.titles.append(words)
+
+    def mentions_title(self, stems: set) -> bool:
+        return any(all(word in stems for word in title) for title in self.titles)
+
+    def matches_vocabulary(self, word: str) -> bool:
+        if word in self.short_stems:
+            return True
+        for size in range(SHORT_STEM, min(len(word), STEM_LENGTH) + 1):
+            if word[:size] in self.stems:
+                return True
+        return any(word.endswith(ending) and word[:-len(ending)] in self.short_stems for ending in ENDINGS)
+
+    def mentions_vocabulary(self, words: List[str]) -> bool:
+        return any(self.matches_vocabulary(word) for word in words)
+
+    def classify(self, query: str) -> Optional[Tuple[bool, Optional[str]]]:
+        text = normalize(query)
+        words = _WORD.findall(text)
+        letters = sum(char.isalpha() for char in text)
+        if letters < self.min_letters:
+            return False, "Слишком короткий запрос"
+
+        visible = len(text.replace(" ", ""))
+        junk = sum(_is_gibberish_word(word) for word in words)
+        if letters / visible < 0.6 or (words and junk * 2 >= len(words)):
+            return False, "Запрос не похож на описание фильма"
+
+        if all(word in GENERIC_WORDS for word in words):
+            return False, "Слишком общий запрос"
+        if any(word in SMALL_TALK_MARKERS for word in words) and all(word in GENERIC_WORDS or word in SMALL_TALK_WORDS for word in words):
+            return False, "Запрос не похож на описание фильма"
+
+        if self.mentions_title({_stem(word) for word in words}) or self.mentions_vocabulary(words):
+            return True, None
+        # A short query outside the vocabulary is still often a name ("Нолан", "Marvel"): the LLM decides
+        return None
+
+
+class VerdictCache:
+    """Small LRU of validation verdicts keyed by normalized query."""
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+
+    def get(self, query: str):
+        key = normalize(query)
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def set(self, query: str, verdict) -> None:
+        key = normalize(query)
+        self._entries[key] = verdict
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -11,7 +11,10 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone, timedelta
 import httpx
-import json
+
+from query_validator import LocalQueryValidator, VerdictCache, normalize
+from single_flight import SingleFlight
+from llm_gate import ConcurrencyGate
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,8 +27,8 @@ db = client[os.environ['DB_NAME']]
 # LLM Key
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 
-# Create the main app
-app = FastAPI()
+# Create the main app; orjson renders every JSON response
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -754,7 +757,8 @@ async def send_magic_link(data: MagicLinkRequest):
     await db.magic_links.insert_one({
         "token": magic_token,
         "user_id": user_id,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat(),
+        # BSON date, so the TTL index on magic_links drops unused links
+        "expires_at": datetime.now(timezone.utc) + timedelta(hours=1),
         "created_at": datetime.now(timezone.utc).isoformat()
     })
     
@@ -773,7 +777,10 @@ async def verify_magic_link(request: Request, response: Response):
     if not magic_doc:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    expires_at = datetime.fromisoformat(magic_doc["expires_at"])
+    # Links issued before the TTL index stored ISO strings; the client returns naive UTC dates
+    expires_at = magic_doc["expires_at"]
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
     if expires_at.tzinfo is None:
         expires_at = expires_at.replace(tzinfo=timezone.utc)
     if expires_at < datetime.now(timezone.utc):
@@ -808,6 +815,39 @@ async def verify_magic_link(request: Request, response: Response):
 
 # ============== AI MOVIE RECOMMENDATIONS ==============
 
+QUERY_SUGGESTIONS = [
+    "Подбери фильм как Интерстеллар, но медленнее",
+    "Хочу мрачный триллер с неожиданной концовкой",
+    "Что-то философское про искусственный интеллект"
+]
+
+# Clear-cut queries are decided locally; LLM verdicts for the ambiguous rest are cached
+local_validator = LocalQueryValidator(
+    [movie.title for movie in MOCK_MOVIES.values()] + [movie.title_ru for movie in MOCK_MOVIES.values() if movie.title_ru]
+)
+validation_cache = VerdictCache(maxsize=int(os.environ.get('VALIDATION_CACHE_SIZE', '2048')))
+# Same coalescing and per-operation gate as the main backend: concurrent identical
+# queries share one LLM call, and a saturated gate sheds to the local fallback verdict
+validation_flights = SingleFlight()
+validation_gate = ConcurrencyGate(
+    "validate",
+    limit=int(os.environ.get('LLM_VALIDATE_CONCURRENCY', '4')),
+    queue_size=int(os.environ.get('LLM_VALIDATE_QUEUE_SIZE', '16')),
+    max_wait=float(os.environ.get('LLM_VALIDATE_MAX_WAIT', '2')),
+)
+
+async def validate_movie_query(query: str) -> QueryValidation:
+    """Local rules first, then the verdict cache, then the LLM"""
+    verdict = local_validator.classify(query)
+    if verdict is not None:
+        is_valid, error_message = verdict
+        return QueryValidation(is_valid=is_valid, error_message=error_message, suggestions=[] if is_valid else QUERY_SUGGESTIONS)
+    
+    cached = validation_cache.get(query)
+    if cached is not None:
+        return cached
+    return await validation_flights.do(("validate", normalize(query)), lambda: validate_query_with_ai(query))
+
 async def validate_query_with_ai(query: str) -> QueryValidation:
     """Validate user query using GPT-5.2"""
     from emergentintegrations.llm.chat import LlmChat, UserMessage
@@ -839,15 +879,17 @@ async def validate_query_with_ai(query: str) -> QueryValidation:
     ).with_model("openai", "gpt-5.2")
     
     try:
-        response = await chat.send_message(UserMessage(text=f"Проверь этот запрос: {query}"))
+        async with validation_gate.slot():
+            response = await chat.send_message(UserMessage(text=f"Проверь этот запрос: {query}"))
         # Parse JSON from response
         response_text = response.strip()
         if response_text.startswith("```"):
             response_text = response_text.split("```")[1]
             if response_text.startswith("json"):
                 response_text = response_text[4:]
-        result = json.loads(response_text)
-        return QueryValidation(**result)
+        validation = QueryValidation.model_validate_json(response_text)
+        validation_cache.set(query, validation)
+        return validation
     except Exception as e:
         logger.error(f"AI validation error: {e}")
         # Fallback validation
@@ -855,11 +897,7 @@ async def validate_query_with_ai(query: str) -> QueryValidation:
             return QueryValidation(
                 is_valid=False,
                 error_message="Слишком короткий запрос",
-                suggestions=[
-                    "Подбери фильм как Интерстеллар, но медленнее",
-                    "Хочу мрачный триллер с неожиданной концовкой",
-                    "Что-то философское про искусственный интеллект"
-                ]
+                suggestions=QUERY_SUGGESTIONS
             )
         return QueryValidation(is_valid=True)
 
@@ -930,47 +968,49 @@ ID фильмов: arrival, blade_runner_2049, drive, gattaca, memento, prisoner
             response_text = response_text.split("```")[1]
             if response_text.startswith("json"):
                 response_text = response_text[4:]
-        result = json.loads(response_text)
+        graph = GraphResponse.model_validate_json(response_text)
         
         # Add poster URLs to nodes
-        for node in result["nodes"]:
-            if node["id"] in MOCK_MOVIES:
-                node["poster"] = MOCK_MOVIES[node["id"]].poster
+        for node in graph.nodes:
+            if node.id in MOCK_MOVIES:
+                node.poster = MOCK_MOVIES[node.id].poster
         
-        return GraphResponse(**result)
+        return graph
     except Exception as e:
         logger.error(f"AI recommendation error: {e}")
-        # Fallback response
-        return GraphResponse(
-            nodes=[
-                MovieNode(id="arrival", title="Arrival", title_ru="Прибытие", year=2016, vibe="философская тишина", is_top=True, poster=MOCK_MOVIES["arrival"].poster),
-                MovieNode(id="blade_runner_2049", title="Blade Runner 2049", title_ru="Бегущий по лезвию 2049", year=2017, vibe="неонуар", is_top=True, poster=MOCK_MOVIES["blade_runner_2049"].poster),
-                MovieNode(id="drive", title="Drive", title_ru="Драйв", year=2011, vibe="минимализм", is_top=True, poster=MOCK_MOVIES["drive"].poster),
-                MovieNode(id="gattaca", title="Gattaca", title_ru="Гаттака", year=1997, vibe="интеллектуальная", is_top=True, poster=MOCK_MOVIES["gattaca"].poster),
-                MovieNode(id="memento", title="Memento", title_ru="Помни", year=2000, vibe="психологический", is_top=False, poster=MOCK_MOVIES["memento"].poster),
-                MovieNode(id="prisoners", title="Prisoners", title_ru="Пленницы", year=2013, vibe="мрачный", is_top=False, poster=MOCK_MOVIES["prisoners"].poster),
-                MovieNode(id="her", title="Her", title_ru="Она", year=2013, vibe="романтический", is_top=False, poster=MOCK_MOVIES["her"].poster),
-                MovieNode(id="no_country", title="No Country for Old Men", title_ru="Старикам тут не место", year=2007, vibe="напряжённый", is_top=False, poster=MOCK_MOVIES["no_country"].poster),
-            ],
-            links=[
-                MovieLink(source="arrival", target="her", strength=0.7),
-                MovieLink(source="arrival", target="gattaca", strength=0.8),
-                MovieLink(source="blade_runner_2049", target="drive", strength=0.6),
-                MovieLink(source="blade_runner_2049", target="gattaca", strength=0.7),
-                MovieLink(source="drive", target="no_country", strength=0.5),
-                MovieLink(source="memento", target="prisoners", strength=0.6),
-                MovieLink(source="gattaca", target="ex_machina", strength=0.8),
-                MovieLink(source="her", target="ex_machina", strength=0.7),
-            ],
-            query_summary="Подобрано медленное, философское кино с атмосферой Интерстеллара, но без космоса."
-        )
+        return FALLBACK_GRAPH
+
+# Fallback response, built once at import
+FALLBACK_GRAPH = GraphResponse(
+    nodes=[
+        MovieNode(id="arrival", title="Arrival", title_ru="Прибытие", year=2016, vibe="философская тишина", is_top=True, poster=MOCK_MOVIES["arrival"].poster),
+        MovieNode(id="blade_runner_2049", title="Blade Runner 2049", title_ru="Бегущий по лезвию 2049", year=2017, vibe="неонуар", is_top=True, poster=MOCK_MOVIES["blade_runner_2049"].poster),
+        MovieNode(id="drive", title="Drive", title_ru="Драйв", year=2011, vibe="минимализм", is_top=True, poster=MOCK_MOVIES["drive"].poster),
+        MovieNode(id="gattaca", title="Gattaca", title_ru="Гаттака", year=1997, vibe="интеллектуальная", is_top=True, poster=MOCK_MOVIES["gattaca"].poster),
+        MovieNode(id="memento", title="Memento", title_ru="Помни", year=2000, vibe="психологический", is_top=False, poster=MOCK_MOVIES["memento"].poster),
+        MovieNode(id="prisoners", title="Prisoners", title_ru="Пленницы", year=2013, vibe="мрачный", is_top=False, poster=MOCK_MOVIES["prisoners"].poster),
+        MovieNode(id="her", title="Her", title_ru="Она", year=2013, vibe="романтический", is_top=False, poster=MOCK_MOVIES["her"].poster),
+        MovieNode(id="no_country", title="No Country for Old Men", title_ru="Старикам тут не место", year=2007, vibe="напряжённый", is_top=False, poster=MOCK_MOVIES["no_country"].poster),
+    ],
+    links=[
+        MovieLink(source="arrival", target="her", strength=0.7),
+        MovieLink(source="arrival", target="gattaca", strength=0.8),
+        MovieLink(source="blade_runner_2049", target="drive", strength=0.6),
+        MovieLink(source="blade_runner_2049", target="gattaca", strength=0.7),
+        MovieLink(source="drive", target="no_country", strength=0.5),
+        MovieLink(source="memento", target="prisoners", strength=0.6),
+        MovieLink(source="gattaca", target="ex_machina", strength=0.8),
+        MovieLink(source="her", target="ex_machina", strength=0.7),
+    ],
+    query_summary="Подобрано медленное, философское кино с атмосферой Интерстеллара, но без космоса."
+)
 
 # ============== MOVIE ENDPOINTS ==============
 
 @api_router.post("/movies/validate", response_model=QueryValidation)
 async def validate_query(data: QueryRequest):
     """Validate movie search query"""
-    return await validate_query_with_ai(data.query)
+    return await validate_movie_query(data.query)
 
 @api_router.post("/movies/recommend", response_model=GraphResponse)
 async def get_recommendations(data: QueryRequest, request: Request):
@@ -986,14 +1026,19 @@ async def get_recommendations(data: QueryRequest, request: Request):
             "created_at": datetime.now(timezone.utc).isoformat()
         })
     
-    return await get_movie_recommendations(data.query)
+    graph = await get_movie_recommendations(data.query)
+    # Already validated; skip FastAPI's second validation pass on the way out
+    return Response(content=graph.model_dump_json(), media_type="application/json")
+
+# Catalog entries never change at runtime, so each is rendered to JSON once
+MOVIE_DETAIL_JSON = {movie_id: movie.model_dump_json().encode("utf-8") for movie_id, movie in MOCK_MOVIES.items()}
 
 @api_router.get("/movies/{movie_id}", response_model=MovieDetail)
 async def get_movie_detail(movie_id: str):
     """Get movie details"""
-    if movie_id not in MOCK_MOVIES:
+    if movie_id not in MOVIE_DETAIL_JSON:
         raise HTTPException(status_code=404, detail="Movie not found")
-    return MOCK_MOVIES[movie_id]
+    return Response(content=MOVIE_DETAIL_JSON[movie_id], media_type="application/json")
 
 # ============== HISTORY & FAVORITES ==============
 
@@ -1081,6 +1126,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def create_indexes():
+    try:
+        # expires_at is the link's own expiry, so expireAfterSeconds=0
+        await db.magic_links.create_index("expires_at", expireAfterSeconds=0)
+    except Exception as e:
+        logger.error(f"magic_links TTL index error: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
@@ -0,0 +1,61 @@
+import pytest
+
+from query_validator import LocalQueryValidator, VerdictCache
+
+validator = LocalQueryValidator(["Interstellar", "Интерстеллар", "Blade Runner 2049", "Бегущий по лезвию 2049", "Her", "Она"])
+
+
+@pytest.mark.parametrize("query", [
+    "мрачный триллер",
+    "Фантастика про космос",
+    "умный фильм",
+    "Тёплое кино на вечер",
+    "добрый фильм для всей семьи",
+    "фильмы ужасов",
+    "sad movie with a twist",
+    "что-то как Интерстеллар, но медленнее",
+    "добрый день, хочу мрачный детектив",
+])
+def test_clear_film_queries_are_accepted(query):
+    assert validator.classify(query) == (True, None)
+
+
+@pytest.mark.parametrize("query, message", [
+    ("добрый день", "Запрос не похож на описание фильма"),
+    ("Привет, как дела?", "Запрос не похож на описание фильма"),
+    ("hello how are you", "Запрос не похож на описание фильма"),
+    ("asdfgh qwrtzx", "Запрос не похож на описание фильма"),
+    ("что посмотреть", "Слишком общий запрос"),
+    ("кино на вечер", "Слишком общий запрос"),
+    ("ok", "Слишком короткий запрос"),
+    ("", "Слишком короткий запрос"),
+    ("?!...", "Слишком короткий запрос"),
+    ("12345 678", "Слишком короткий запрос"),
+])
+def test_non_film_queries_are_rejected(query, message):
+    assert validator.classify(query) == (False, message)
+
+
+@pytest.mark.parametrize("query", ["умножить два числа", "теплица на даче", "sadovod forum", "timer settings"])
+def test_short_stems_do_not_prefix_unrelated_words(query):
+    # Not decidable locally: these go to the LLM instead of being waved through
+    assert validator.classify(query) is None
+
+
+@pytest.mark.parametrize("query", ["аниме", "Тарантино", "Marvel", "Нолан", "про собак"])
+def test_short_queries_are_not_rejected_locally(query):
+    assert validator.classify(query) in (None, (True, None))
+
+
+def test_everyday_titles_do_not_decide_alone():
+    assert validator.classify("она сказала нет") is None
+    assert validator.classify("Бегущий по лезвию 2049") == (True, None)
+
+
+def test_verdict_cache_is_normalized_and_bounded():
+    cache = VerdictCache(maxsize=2)
+    cache.set("Мрачный  триллер", "valid")
+    assert cache.get("мрачный триллер") == "valid"
+    cache.set("b", 1)
+    cache.set("c", 2)
+    assert cache.get("мрачный триллер") is None and len(cache) == 2
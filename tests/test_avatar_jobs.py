@@ -0,0 +1,79 @@
+import asyncio
+import io
+
+from PIL import Image
+
+from avatar_jobs import AvatarJobs, render_webp_sizes
+from avatar_store import LocalBlobStore
+
+
+def png(size=512):
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (200, 30, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_renders_webp_sizes():
+    renders = render_webp_sizes(png(512))
+    sizes = {name: Image.open(io.BytesIO(data)).size for name, data in renders.items()}
+    assert sizes == {"thumb": (64, 64), "medium": (256, 256), "full": (512, 512)}
+    assert all(data[8:12] == b"WEBP" for data in renders.values())
+
+
+def test_identical_prompts_share_one_job(tmp_path):
+    calls = 0
+    applied = {}
+
+    async def generate(prompt):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return png()
+
+    async def on_done(user_id, avatars):
+        applied[user_id] = avatars
+
+    jobs = AvatarJobs(generate, LocalBlobStore(tmp_path), lambda digest: f"/api/avatars/{digest}", on_done)
+
+    async def run():
+        first = await jobs.submit("noir portrait", "alice")
+        second = await jobs.submit("noir portrait", "bob")
+        statuses = [snapshot["status"] async for snapshot in jobs.events(first)]
+        # Once the job is done, the same prompt generates a new picture
+        third = await jobs.submit("noir portrait", "carol")
+        [snapshot async for snapshot in jobs.events(third)]
+        return first, second, third, statuses
+
+    first, second, third, statuses = asyncio.run(run())
+    assert first is second and third is not first
+    assert calls == 2
+    assert statuses[-1] == "done"
+    assert set(applied) == {"alice", "bob", "carol"}
+    assert first.snapshot()["avatar"] == applied["alice"]["medium"]
+    assert jobs.get(first.id) is first
+    assert jobs.stats()["deduplicated"] == 1
+
+
+def test_failed_job_reports_error_and_is_retried(tmp_path):
+    attempts = 0
+
+    async def generate(prompt):
+        nonlocal attempts
+        attempts += 1
+        raise RuntimeError("provider down")
+
+    async def on_done(user_id, avatars):
+        raise AssertionError("should not be applied")
+
+    jobs = AvatarJobs(generate, LocalBlobStore(tmp_path), str, on_done)
+
+    async def run():
+        job = await jobs.submit("p", "alice")
+        [snapshot async for snapshot in jobs.events(job)]
+        retry = await jobs.submit("p", "alice")
+        return job, retry
+
+    job, retry = asyncio.run(run())
+    assert job.snapshot()["status"] == "failed"
+    assert job.snapshot()["error"] == "provider down"
+    assert retry is not job
@@ -0,0 +1,71 @@
+import asyncio
+import base64
+
+from avatar_store import LocalBlobStore, digest_of, migrate_data_url_avatars, parse_data_url
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+def test_local_store_is_content_addressed(tmp_path):
+    store = LocalBlobStore(tmp_path)
+
+    async def run():
+        first = await store.put(PNG, "image/png")
+        second = await store.put(PNG, "image/png")
+        return first, second, await store.get(first), await store.get("0" * 64)
+
+    first, second, blob, missing = asyncio.run(run())
+    assert first == second == digest_of(PNG)
+    assert blob == (PNG, "image/png")
+    assert missing is None
+    assert len(list(tmp_path.rglob("*"))) == 2  # one shard directory, one file
+
+
+def test_concurrent_writes_of_one_digest(tmp_path):
+    store = LocalBlobStore(tmp_path)
+    data = PNG + b"\x01" * 1_000_000
+
+    async def run():
+        return await asyncio.gather(*(store.put(data, "image/png") for _ in range(8)))
+
+    digests = asyncio.run(run())
+    assert set(digests) == {digest_of(data)}
+    assert asyncio.run(store.get(digests[0]))[0] == data
+    # Every temp file was renamed into place; nothing is left behind
+    assert [path.name for path in tmp_path.rglob("*") if path.is_file()] == [digest_of(data)]
+
+
+def test_parse_data_url():
+    url = "data:image/png;base64," + base64.b64encode(PNG).decode()
+    assert parse_data_url(url) == ("image/png", PNG)
+    assert parse_data_url("data:text/html;base64,PGI+") is None
+    assert parse_data_url("data:image/png;base64,@@@") is None
+    assert parse_data_url("https://example.com/a.png") is None
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def find(self, query, projection):
+        for doc in list(self.docs):
+            if doc.get("avatar", "").startswith("data:"):
+                yield doc
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if doc["_id"] == query["_id"] and doc["avatar"] == query["avatar"]:
+                doc.update(update["$set"])
+
+
+def test_migrates_inline_avatars(tmp_path):
+    inline = "data:image/png;base64," + base64.b64encode(PNG).decode()
+    users = FakeUsers([
+        {"_id": 1, "user_id": "a", "avatar": inline},
+        {"_id": 2, "user_id": "b", "avatar": "https://example.com/b.png"},
+    ])
+    store = LocalBlobStore(tmp_path)
+    migrated = asyncio.run(migrate_data_url_avatars(users, store, lambda digest: f"/api/avatars/{digest}"))
+    assert migrated == 1
+    assert users.docs[0]["avatar"] == f"/api/avatars/{digest_of(PNG)}"
+    assert users.docs[1]["avatar"] == "https://example.com/b.png"
@@ -0,0 +1,106 @@
+import gzip
+import json
+
+from movies_data import CATALOG_VERSION, MOCK_MOVIES, MOVIE_TAGS
+from catalog_service import CatalogService, PrefixTrie, accepts_gzip, etag_matches
+
+catalog = CatalogService(MOCK_MOVIES, MOVIE_TAGS, version=CATALOG_VERSION)
+
+
+def ids(results):
+    return [hit["id"] for hit in results]
+
+
+def test_exact_title_ranks_first():
+    results = catalog.search("Dune")
+    assert results[0]["id"] == "dune"
+    assert results[0]["match"] == "exact"
+
+
+def test_prefix_autocomplete_in_both_languages():
+    assert ids(catalog.search("inter"))[0] == "interstellar"
+    assert ids(catalog.search("Бегущий по"))[0] == "blade_runner_2049"
+    # Word starts inside a title are entry points too
+    assert "blade_runner_2049" in ids(catalog.search("runner"))
+
+
+def test_typos_fall_back_to_fuzzy_matches():
+    for query, expected in [("matrx", "matrix"), ("Интерстелар", "interstellar"), ("incepton", "inception")]:
+        results = catalog.search(query)
+        assert expected in ids(results)[:3], query
+    assert catalog.search("matrx")[0]["match"] == "fuzzy"
+
+
+def test_search_respects_allowed_ids():
+    assert ids(catalog.search("the", allowed={"matrix"})) == ["matrix"]
+    assert catalog.search("   ") == []
+
+
+def test_secondary_indexes():
+    assert set(catalog.in_years(2019, 2019)) == {"parasite", "joker"}
+    assert catalog.top_rated(limit=1) == ["dark_knight"]
+    assert all(MOCK_MOVIES[movie_id].rating >= 8.7 for movie_id in catalog.top_rated(8.7))
+    assert "seven" in catalog.with_tag("Финчер")
+
+
+def test_trie_keeps_first_inserted_per_node():
+    trie = PrefixTrie(per_node=2)
+    for movie_id in ("a", "b", "c"):
+        trie.insert("star", movie_id)
+    assert trie.lookup("st") == ["a", "b"]
+    assert trie.lookup("stop") == []
+
+
+def test_batch_details_with_sparse_fields():
+    found, missing = catalog.details(["matrix", "nope", "dune", "matrix"], ["rating", "poster"])
+    assert list(found) == ["matrix", "dune"]
+    assert found["matrix"] == {"id": "matrix", "rating": 8.7, "poster": MOCK_MOVIES["matrix"].poster}
+    assert missing == ["nope"]
+    assert catalog.details(["her"])[0]["her"] == MOCK_MOVIES["her"].model_dump()
+
+
+def test_detail_payloads_are_serialized_once():
+    payload = catalog.payload("her")
+    assert json.loads(payload.raw) == MOCK_MOVIES["her"].model_dump()
+    assert gzip.decompress(payload.gzipped) == payload.raw
+    assert payload.etag.startswith(f'"{CATALOG_VERSION[:12]}-') and payload.gzip_etag != payload.etag
+    # Another catalog version invalidates every ETag
+    other = CatalogService(MOCK_MOVIES, MOVIE_TAGS, version="0" * 16)
+    assert other.payload("her").etag != payload.etag
+    assert other.payload("her").raw == payload.raw
+
+
+def test_conditional_and_encoding_headers():
+    etags = ('"v1-abc"', '"v1-abc-gz"')
+    assert etag_matches('"v1-abc"', etags)
+    assert etag_matches('"other", W/"v1-abc-gz"', etags)
+    assert etag_matches("*", etags)
+    assert not etag_matches('"v0-abc"', etags) and not etag_matches(None, etags)
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, gzip;q=0.8")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("identity") and not accepts_gzip(None)
+
+
+def test_exact_title_found_past_the_trie_node_limit():
+    movies = {}
+    for i in range(30):
+        movie = MOCK_MOVIES["her"].model_copy(update={"id": f"her_{i}", "title": f"Her {i}", "title_ru": None, "rating": 9.0})
+        movies[movie.id] = movie
+    movies["her"] = MOCK_MOVIES["her"].model_copy(update={"rating": 1.0})
+    crowded = CatalogService(movies, {})
+    # The low-rated film is not among the 20 ids kept on the "her" trie node
+    assert "her" not in crowded.trie.lookup("her")
+    results = crowded.search("Her", limit=3)
+    assert results[0]["id"] == "her" and results[0]["match"] == "exact"
+    assert [hit["match"] for hit in results[1:]] == ["prefix", "prefix"]
+
+
+def test_lazy_indexes_are_built_once_on_use():
+    fresh = CatalogService(MOCK_MOVIES, MOVIE_TAGS, version=CATALOG_VERSION)
+    assert fresh.stats()["trie_nodes"] is None and fresh.index_ms == {}
+    fresh.search("dune")
+    assert fresh.stats()["trie_nodes"] > 0 and fresh.stats()["text_index"] is None
+    trie = fresh.trie
+    fresh.warm()
+    assert fresh.trie is trie and set(fresh.index_ms) == {"titles", "tags", "text"}
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from movies_data import BUILTIN_MOVIES, BUILTIN_TAGS, MovieDetail
+from catalog_service import CatalogService
+from catalog_store import MappedCatalog, catalog_columns, write_catalog
+from local_recommender import LocalRecommender, write_features
+
+
+@pytest.fixture(scope="module")
+def catalog(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("catalog")
+    write_catalog(directory, [movie.model_dump() for movie in BUILTIN_MOVIES.values()], BUILTIN_TAGS)
+    return MappedCatalog(directory, MovieDetail)
+
+
+def test_records_round_trip(catalog):
+    assert len(catalog) == len(BUILTIN_MOVIES)
+    assert list(catalog.ids) == sorted(BUILTIN_MOVIES)
+    for movie_id, movie in BUILTIN_MOVIES.items():
+        assert catalog[movie_id] == movie
+        assert catalog.tags[movie_id] == BUILTIN_TAGS[movie_id]
+
+
+def test_mapping_compatibility(catalog):
+    assert "her" in catalog and "nope" not in catalog and 42 not in catalog
+    assert catalog.get("nope") is None
+    with pytest.raises(KeyError):
+        catalog["nope"]
+    assert dict(catalog.items())["dune"].title == "Dune"
+    assert catalog.ids[:2] == sorted(BUILTIN_MOVIES)[:2]
+
+
+def test_records_hydrate_lazily(catalog):
+    catalog._hydrate.cache_clear()
+    assert catalog["matrix"] is catalog["matrix"]
+    assert catalog.stats()["hydrated"] == 1
+
+
+def test_strings_are_interned(tmp_path, catalog):
+    meta = json.loads((catalog.directory / "meta.json").read_text())
+    assert meta["strings"] < meta["string_references"]
+    # Same content, same version; any edit changes it
+    assert write_catalog(tmp_path / "same", [m.model_dump() for m in BUILTIN_MOVIES.values()], BUILTIN_TAGS)["version"] == catalog.version
+    edited = [m.model_dump() for m in BUILTIN_MOVIES.values()]
+    edited[0]["rating"] = 1.0
+    assert write_catalog(tmp_path / "edited", edited, BUILTIN_TAGS)["version"] != catalog.version
+
+
+def test_catalog_service_over_mapped_catalog(catalog):
+    service = CatalogService(catalog, catalog.tags, version=catalog.version)
+    assert service.search("matrx")[0]["id"] == "matrix"
+    assert service.top_rated(limit=1) == ["dark_knight"]
+    assert json.loads(service.payload("her").raw) == BUILTIN_MOVIES["her"].model_dump()
+
+
+def test_columns_match_records(catalog):
+    names = ("rating", "year", "title_ru", "why_recommended", "vibe", "tags")
+    mapped = catalog_columns(catalog, catalog.tags, names)
+    ids = list(catalog.ids)
+    builtin = catalog_columns({movie_id: BUILTIN_MOVIES[movie_id] for movie_id in ids}, BUILTIN_TAGS, names)
+    for name in names:
+        assert list(mapped[name]) == list(builtin[name]), name
+
+
+def test_engines_start_without_hydrating_records(catalog):
+    catalog._hydrate.cache_clear()
+    recommender = LocalRecommender(catalog, catalog.tags)
+    service = CatalogService(catalog, catalog.tags, version=catalog.version)
+    # Only the film whose fields name the detail projection
+    assert catalog.stats()["hydrated"] <= 1
+    assert service.stats()["text_index"] is None
+    assert recommender.recommend("Мрачный триллер")["nodes"]
+
+
+def test_precomputed_features_match_in_memory_build(tmp_path):
+    movies = [movie.model_dump() for movie in BUILTIN_MOVIES.values()]
+    write_catalog(tmp_path / "plain", movies, BUILTIN_TAGS)
+    write_catalog(tmp_path / "features", movies, BUILTIN_TAGS)
+    assert write_features(tmp_path / "features")["films"] == len(movies)
+    built = LocalRecommender(MappedCatalog(tmp_path / "plain", MovieDetail), BUILTIN_TAGS)
+    loaded = LocalRecommender(MappedCatalog(tmp_path / "features", MovieDetail), BUILTIN_TAGS)
+    assert not built.precomputed and loaded.precomputed
+    for query in ("Мрачный триллер с неожиданной концовкой", "Как Интерстеллара, но медленнее"):
+        assert loaded.recommend(query) == built.recommend(query)
+
+
+def test_features_of_another_catalog_version_are_ignored(tmp_path):
+    movies = [movie.model_dump() for movie in BUILTIN_MOVIES.values()]
+    write_catalog(tmp_path, movies, BUILTIN_TAGS)
+    write_features(tmp_path)
+    movies[0]["rating"] = 1.0
+    write_catalog(tmp_path, movies, BUILTIN_TAGS)
+    assert not LocalRecommender(MappedCatalog(tmp_path, MovieDetail), BUILTIN_TAGS).precomputed
@@ -0,0 +1,39 @@
+import time
+
+from circuit_breaker import CircuitBreaker
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.stats()["short_circuited"] == 1
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.02)
+
+    # Only one probe is let through while half-open
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+    assert breaker.stats()["opened"] == 2
@@ -0,0 +1,27 @@
+from itertools import product
+
+from compliment_store import DEFAULT_COMPLIMENT, ERA_PHRASES, GENERIC_PHRASES, GENRE_PHRASES, MOOD_PHRASES, ComplimentStore
+
+
+def test_every_menu_combination_has_variants():
+    store = ComplimentStore()
+    for genre, mood, era in product(GENRE_PHRASES, MOOD_PHRASES, ERA_PHRASES):
+        assert store.pick(genre, mood, era)
+    assert store.stats()["combinations"] == 125
+    assert store.stats()["variants"] == 125 * 8
+    # Lookup is tolerant of case and spacing
+    assert store.pick(" драма ", "ФИЛОСОФСКОЕ", "Любые")
+
+
+def test_free_form_answers_get_generic_phrases_without_growing_the_table():
+    store = ComplimentStore()
+    compliment = store.pick("Аниме", "философское", "Любые")
+    genre, rest = compliment.split(".", 1)
+    assert genre + "." in GENERIC_PHRASES["genre"]
+    assert any(rest.strip().startswith(phrase) for phrase in MOOD_PHRASES["Философское"])
+    assert store.pick("Аниме", "Уютное", "90-е") is not None
+    assert store.pick("", "", "") == DEFAULT_COMPLIMENT
+    for i in range(1000):
+        store.pick(f"жанр {i}", "Уютное", "Любые")
+    assert store.stats()["combinations"] == 125
+    assert store.stats()["misses"] == 1003
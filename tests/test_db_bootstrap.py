@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, timezone
+
+from pymongo.errors import OperationFailure
+
+from db_bootstrap import INDEXES, MIGRATION_ID, ensure_indexes, heal_string_date, migrate_string_dates
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = {doc["_id"]: dict(doc) for doc in docs}
+        self.indexes = []
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {"_id": query["_id"]}).update(update["$set"])
+
+    async def find(self, query, projection):
+        (field, _), = query.items()
+        for doc in list(self.docs.values()):
+            if isinstance(doc.get(field), str):
+                yield {"_id": doc["_id"], field: doc[field]}
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self.docs[op._filter["_id"]].update(op._doc["$set"])
+        return type("Result", (), {"modified_count": len(ops)})()
+
+    async def create_indexes(self, indexes):
+        self.indexes.extend(indexes)
+
+
+class FakeDb(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+    __getattr__ = dict.__getitem__
+
+
+def test_migration_converts_only_string_dates():
+    already = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    db = FakeDb()
+    db["users"] = FakeCollection([
+        {"_id": 1, "created_at": "2024-05-01T10:00:00+00:00"},
+        {"_id": 2, "created_at": already},
+        {"_id": 3, "created_at": "2024-05-01T10:00:00"},
+        {"_id": 4, "created_at": "yesterday"},
+    ])
+    assert asyncio.run(migrate_string_dates(db)) == 2
+    users = db["users"].docs
+    assert users[1]["created_at"] == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+    # Naive strings are read as UTC; existing dates and unparseable values are left alone
+    assert users[3]["created_at"].tzinfo is timezone.utc
+    assert users[2]["created_at"] is already
+    assert users[4]["created_at"] == "yesterday"
+    assert db["schema_migrations"].docs[MIGRATION_ID]["converted"] == 2
+
+
+def test_migration_rerun_is_a_no_op():
+    db = FakeDb()
+    db["favorites"] = FakeCollection([{"_id": 1, "created_at": "2024-05-01T10:00:00+00:00"}])
+    assert asyncio.run(migrate_string_dates(db)) == 1
+    db["favorites"].docs[2] = {"_id": 2, "created_at": "2024-06-01T10:00:00+00:00"}
+    assert asyncio.run(migrate_string_dates(db)) == 0
+    # Without the marker a second pass only touches what is still a string
+    del db["schema_migrations"].docs[MIGRATION_ID]
+    assert asyncio.run(migrate_string_dates(db)) == 1
+
+
+def test_index_conflict_does_not_stop_other_collections():
+    class Conflicting(FakeCollection):
+        async def create_indexes(self, indexes):
+            raise OperationFailure("Index with name: email_1 already exists with different options", code=85)
+
+    db = FakeDb()
+    db["users"] = Conflicting()
+    asyncio.run(ensure_indexes(db))
+    assert all(db[name].indexes for name in INDEXES if name != "users")
+
+
+def test_string_dates_seen_after_the_migration_are_rewritten():
+    class Sessions:
+        def __init__(self):
+            self.updates = []
+
+        async def update_one(self, query, update):
+            self.updates.append((query, update))
+
+    sessions = Sessions()
+    stamp = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    parsed = asyncio.run(heal_string_date(sessions, {"session_token": "t"}, "expires_at", "2030-01-01T00:00:00"))
+    assert parsed == stamp
+    # Conditional on the old string, so a concurrent rewrite is not overwritten
+    assert sessions.updates == [({"session_token": "t", "expires_at": "2030-01-01T00:00:00"}, {"$set": {"expires_at": stamp}})]
+    assert asyncio.run(heal_string_date(sessions, {}, "expires_at", stamp)) is stamp
+    assert asyncio.run(heal_string_date(sessions, {}, "expires_at", "soon")) is None
+    assert asyncio.run(heal_string_date(sessions, {}, "expires_at", None)) is None
+    assert len(sessions.updates) == 1
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from graph_stream import JsonArrayItemParser, until_deadline
+
+DOCUMENT = {
+    "nodes": [
+        {"id": "arrival", "top": 1, "vibe": "тихая {философия}"},
+        {"id": "her", "top": 0, "vibe": "say \"hi\" [softly]"},
+        {"id": "seven", "top": 0, "vibe": "back\\slash\\"},
+    ],
+    "summary": "Фильмы про \"nodes\": [{...}]",
+}
+
+
+def feed_in_chunks(text, size, arrays=("nodes",)):
+    parser = JsonArrayItemParser(arrays)
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return parser, items
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_items_split_across_chunks(size):
+    text = json.dumps(DOCUMENT, ensure_ascii=False)
+    parser, items = feed_in_chunks(text, size)
+    assert items == [("nodes", node) for node in DOCUMENT["nodes"]]
+    assert parser.result() == DOCUMENT
+
+
+def test_each_item_arrives_with_its_closing_brace():
+    parser = JsonArrayItemParser(["nodes"])
+    assert parser.feed('{"nodes":[{"id":"a","vibe":"x}') == []
+    assert parser.feed('"}') == [("nodes", {"id": "a", "vibe": "x}"})]
+    assert parser.feed(',{"id":"b"') == []
+    assert parser.feed('}]}') == [("nodes", {"id": "b"})]
+
+
+def test_code_fenced_output():
+    text = "```json\n" + json.dumps(DOCUMENT, ensure_ascii=False, indent=2) + "\n```"
+    parser, items = feed_in_chunks(text, 5)
+    assert [item["id"] for _, item in items] == ["arrival", "her", "seven"]
+    assert parser.result() == DOCUMENT
+
+
+def test_only_watched_top_level_arrays():
+    text = '{"links":[{"source":"a"}],"nodes":[{"id":"a","tags":[{"x":1}]}],"meta":{"nodes":[{"id":"b"}]}}'
+    _, items = feed_in_chunks(text, 4)
+    assert items == [("nodes", {"id": "a", "tags": [{"x": 1}]})]
+
+
+def test_result_of_truncated_stream_raises():
+    parser, items = feed_in_chunks('{"nodes":[{"id":"a"},{"id":', 3)
+    assert items == [("nodes", {"id": "a"})]
+    with pytest.raises(ValueError):
+        parser.result()
+    with pytest.raises(ValueError):
+        JsonArrayItemParser(["nodes"]).result()
+
+
+class SlowProvider:
+    """Streams the document in chunks, ``delay`` seconds apart"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def stream(self, text):
+        for start in range(0, len(text), 40):
+            await asyncio.sleep(self.delay)
+            yield text[start:start + 40]
+
+
+async def produce(provider, events):
+    parser = JsonArrayItemParser(["nodes"])
+    async for chunk in provider.stream(json.dumps(DOCUMENT, ensure_ascii=False)):
+        for _, item in parser.feed(chunk):
+            events.put_nowait(("item", item))
+    events.put_nowait(("graph", parser.result()))
+
+
+def read_events(provider, budget):
+    async def main():
+        events = asyncio.Queue()
+        producer = asyncio.ensure_future(produce(provider, events))
+        started = time.perf_counter()
+        received = []
+        async for kind, value in until_deadline(events, budget):
+            received.append((kind, value, time.perf_counter() - started))
+            if kind in ("graph", "timeout"):
+                break
+        producer.cancel()
+        return received
+
+    return asyncio.run(main())
+
+
+def test_slow_provider_times_out_within_budget():
+    received = read_events(SlowProvider(delay=0.5), budget=0.1)
+    assert [kind for kind, _, _ in received] == ["timeout"]
+    assert received[0][2] < 0.3
+
+
+def test_items_before_the_deadline_pass_through():
+    received = read_events(SlowProvider(delay=0.05), budget=0.12)
+    kinds = [kind for kind, _, _ in received]
+    assert kinds[-1] == "timeout"
+    assert kinds[:-1] == ["item"] * (len(kinds) - 1)
+    assert received[-1][2] < 0.3
+
+
+def test_fast_provider_finishes_inside_budget():
+    received = read_events(SlowProvider(delay=0), budget=1.0)
+    assert [kind for kind, _, _ in received] == ["item", "item", "item", "graph"]
+    assert received[-1][1] == DOCUMENT
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from http_client import PooledHttpClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.peers.append(self.client_address)
+        if self.path == "/flaky" and server.flaky_failures > 0:
+            server.flaky_failures -= 1
+            self._send(503, {"error": "busy"})
+        elif self.path == "/slow":
+            time.sleep(0.5)
+            self._send(200, {"ok": True})
+        else:
+            self._send(200, {"email": "stub@example.com"})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.peers = []
+    server.flaky_failures = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_reuses_keepalive_connection(stub_server):
+    server, base = stub_server
+    http = PooledHttpClient()
+
+    async def run():
+        for _ in range(3):
+            assert (await http.get(f"{base}/ok")).json()["email"] == "stub@example.com"
+        await http.aclose()
+
+    asyncio.run(run())
+    assert len(set(server.peers)) == 1
+    assert http.stats()["count"] == 3
+
+
+def test_retries_retryable_status(stub_server):
+    server, base = stub_server
+    server.flaky_failures = 2
+    http = PooledHttpClient(retries=2, backoff_base=0.01)
+
+    async def run():
+        response = await http.get(f"{base}/flaky")
+        await http.aclose()
+        return response
+
+    assert asyncio.run(run()).status_code == 200
+    assert http.stats()["retries"] == 2
+
+
+def test_read_timeout_is_bounded(stub_server):
+    _, base = stub_server
+    http = PooledHttpClient(read_timeout=0.1, retries=1, backoff_base=0.01)
+
+    async def run():
+        try:
+            with pytest.raises(httpx.ReadTimeout):
+                await http.get(f"{base}/slow")
+        finally:
+            await http.aclose()
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    assert time.perf_counter() - started < 0.5
+    assert http.stats()["errors"] == 2
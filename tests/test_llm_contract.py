@@ -0,0 +1,59 @@
+import pytest
+
+from llm_contract import LlmGraph, hydrate_graph, parse_llm_reply, prompt_line
+from local_recommender import LocalRecommender
+from movies_data import MOCK_MOVIES, MOVIE_TAGS
+
+similarity = LocalRecommender(MOCK_MOVIES, MOVIE_TAGS).similarity
+
+
+def hydrate(reply, movies=MOCK_MOVIES, links=similarity):
+    return hydrate_graph(parse_llm_reply(reply), movies, MOVIE_TAGS, links)
+
+
+def test_unknown_and_repeated_ids_are_dropped():
+    graph = hydrate('{"nodes":[{"id":"arrival","top":1,"vibe":"тишина"},{"id":"made_up","top":1},'
+                    '{"id":"her","top":0},{"id":"arrival","top":0,"vibe":"повтор"}],"summary":"ok"}')
+    assert [node["id"] for node in graph["nodes"]] == ["arrival", "her"]
+    # The first occurrence wins
+    assert graph["nodes"][0]["is_top"] is True and graph["nodes"][0]["vibe"] == "тишина"
+    assert graph["query_summary"] == "ok"
+
+
+def test_fields_are_hydrated_from_the_catalog():
+    graph = hydrate('```json\n{"nodes":[{"id":"her","top":"1","vibe":"",'
+                    '"title":"Not Her","year":1901,"poster":"http://evil"}],"summary":"x"}\n```')
+    node = graph["nodes"][0]
+    movie = MOCK_MOVIES["her"]
+    assert (node["title"], node["title_ru"], node["year"], node["poster"]) == (movie.title, movie.title_ru, movie.year, movie.poster)
+    # An empty vibe falls back to the catalog tag
+    assert node["vibe"] == MOVIE_TAGS["her"]["vibe"] and node["is_top"] is True
+
+
+def test_links_only_join_returned_nodes():
+    reply = ('{"nodes":[{"id":"seven"},{"id":"ghost"},{"id":"prisoners"},{"id":"memento"}],'
+             '"links":[{"source":"seven","target":"ghost"}],"summary":""}')
+    graph = hydrate(reply)
+    ids = {node["id"] for node in graph["nodes"]}
+    assert ids == {"seven", "prisoners", "memento"}
+    assert graph["links"] and all({link["source"], link["target"]} <= ids for link in graph["links"])
+
+    # A film the similarity index does not know yet stays in the graph without links
+    partial = LocalRecommender({k: v for k, v in MOCK_MOVIES.items() if k != "memento"}, MOVIE_TAGS).similarity
+    graph = hydrate(reply, links=partial)
+    assert "memento" in {node["id"] for node in graph["nodes"]}
+    assert all("memento" not in (link["source"], link["target"]) for link in graph["links"])
+
+
+def test_reply_without_catalog_films_is_an_error():
+    with pytest.raises(ValueError):
+        hydrate('{"nodes":[{"id":"made_up"}],"summary":""}')
+    with pytest.raises(ValueError):
+        parse_llm_reply("Извините, не могу помочь")
+    assert parse_llm_reply('{"nodes":[{"id":42,"top":0}]}') == LlmGraph(nodes=[{"id": "42"}])
+
+
+def test_prompt_lines_come_from_the_catalog():
+    assert prompt_line("dune", MOCK_MOVIES, MOVIE_TAGS) == f"- dune (Дюна, 2021) - {MOVIE_TAGS['dune']['vibe']}"
+    assert prompt_line("dune", MOCK_MOVIES, {}) == "- dune (Дюна, 2021)"
+    assert prompt_line("nope", MOCK_MOVIES, MOVIE_TAGS) is None
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from llm_gate import ConcurrencyGate, LoadShed
+
+
+async def hold(gate, release):
+    async with gate.slot():
+        await release.wait()
+
+
+def test_limits_concurrency_and_queues_within_deadline():
+    gate = ConcurrencyGate("recommend", limit=2, queue_size=4, max_wait=1.0)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with gate.slot():
+            peak = max(peak, gate.active)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(work() for _ in range(6)))
+
+    asyncio.run(run())
+    stats = gate.stats()
+    assert peak == 2
+    assert stats["admitted"] == 6
+    assert stats["max_queue_depth"] == 4
+    assert stats["active"] == 0 and stats["queue_depth"] == 0
+
+
+def test_sheds_when_queue_is_full():
+    gate = ConcurrencyGate("image", limit=1, queue_size=1, max_wait=1.0)
+
+    async def run():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(gate, release))
+        waiter = asyncio.ensure_future(hold(gate, release))
+        await asyncio.sleep(0)
+        with pytest.raises(LoadShed) as shed:
+            async with gate.slot():
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return shed.value
+
+    shed = asyncio.run(run())
+    assert shed.reason == "queue full"
+    assert gate.stats()["shed_queue_full"] == 1
+
+
+def test_sheds_after_max_wait():
+    gate = ConcurrencyGate("compliment", limit=1, queue_size=4, max_wait=0.01)
+
+    async def run():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(gate, release))
+        await asyncio.sleep(0)
+        with pytest.raises(LoadShed):
+            async with gate.slot():
+                pass
+        release.set()
+        await holder
+        # The slot is usable again once the holder finishes
+        async with gate.slot():
+            pass
+
+    asyncio.run(run())
+    stats = gate.stats()
+    assert stats["shed_timeout"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["wait"]["errors"] == 1
+
+
+def test_background_callers_wait_past_the_deadline_and_queue_limit():
+    gate = ConcurrencyGate("image", limit=1, queue_size=0, max_wait=0.01)
+    done = []
+
+    async def background(name):
+        async with gate.slot(background=True):
+            done.append(name)
+
+    async def run():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(gate, release))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(background(name)) for name in ("a", "b")]
+        await asyncio.sleep(0.05)
+        # Foreground callers are still shed while background jobs wait
+        with pytest.raises(LoadShed):
+            async with gate.slot():
+                pass
+        assert done == [] and gate.queued == 2
+        release.set()
+        await asyncio.gather(holder, *waiters)
+
+    asyncio.run(run())
+    assert done == ["a", "b"]
+    assert gate.stats()["shed_timeout"] == 0
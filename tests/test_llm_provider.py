@@ -0,0 +1,127 @@
+import asyncio
+import sys
+import types
+from types import SimpleNamespace
+
+import pytest
+
+
+def _stub_module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules.setdefault(name, module)
+
+
+# emergentintegrations is installed from a private index; without it, empty
+# stand-ins let llm_provider import and the fixture swaps in the fakes below
+try:
+    import emergentintegrations.llm.chat  # noqa: F401
+    import emergentintegrations.llm.openai.image_generation  # noqa: F401
+except ImportError:
+    for package in ("emergentintegrations", "emergentintegrations.llm", "emergentintegrations.llm.openai"):
+        _stub_module(package)
+    _stub_module("emergentintegrations.llm.chat", LlmChat=None, UserMessage=lambda text: SimpleNamespace(text=text))
+    _stub_module("emergentintegrations.llm.openai.image_generation", OpenAIImageGeneration=None)
+
+import llm_provider  # noqa: E402
+from llm_provider import LlmProvider  # noqa: E402
+
+
+class FakeChat:
+    created = []
+
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        self.api_key = api_key
+        self.session_id = session_id
+        self.system_message = system_message
+        self.model = None
+        FakeChat.created.append(self)
+
+    def with_model(self, provider, model):
+        self.model = (provider, model)
+        return self
+
+    async def send_message(self, message):
+        if message.text == "fail":
+            raise RuntimeError("provider error")
+        return f"{self.system_message}:{message.text}"
+
+
+class FakeLitellm:
+    """litellm.acompletion with stream=True: an async iterator of delta chunks"""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.calls = []
+
+    async def acompletion(self, **kwargs):
+        self.calls.append(kwargs)
+        return self._chunks()
+
+    async def _chunks(self):
+        for part in self.parts:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+
+
+class FakeImages:
+    def __init__(self, api_key=None):
+        self.calls = []
+
+    async def generate_images(self, prompt, model, number_of_images):
+        self.calls.append((prompt, model, number_of_images))
+        return [b"png"] * number_of_images
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    FakeChat.created = []
+    monkeypatch.setattr(llm_provider, "LlmChat", FakeChat)
+    monkeypatch.setattr(llm_provider, "OpenAIImageGeneration", FakeImages)
+    return LlmProvider("key", {"recommend": "REC", "compliment": "COMP"}, provider="anthropic", model="m-1", image_model="img-1")
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_each_call_gets_a_fresh_chat_with_the_operation_prompt(provider):
+    assert asyncio.run(provider.complete("recommend", "q")) == "REC:q"
+    assert asyncio.run(provider.complete("compliment", "q")) == "COMP:q"
+    first, second = FakeChat.created
+    assert first.model == second.model == ("anthropic", "m-1")
+    assert first.session_id.startswith("recommend_") and second.session_id.startswith("compliment_")
+    with pytest.raises(KeyError):
+        provider.chat("validate")
+
+
+def test_stream_yields_one_chunk_without_token_streaming(provider):
+    assert asyncio.run(collect(provider.stream("recommend", "q"))) == ["REC:q"]
+    assert provider.stats()["streaming"] is False
+    assert provider.stats()["recommend"]["count"] == 1
+
+
+def test_token_streaming_goes_through_litellm(monkeypatch):
+    litellm = FakeLitellm(["ab", None, "cd"])
+    monkeypatch.setitem(sys.modules, "litellm", litellm)
+    monkeypatch.setattr(llm_provider, "OpenAIImageGeneration", FakeImages)
+    provider = LlmProvider("key", {"recommend": "REC"}, provider="openai", model="m-1", streaming=True, api_base="http://llm")
+    assert asyncio.run(collect(provider.stream("recommend", "q"))) == ["ab", "cd"]
+    (call,) = litellm.calls
+    assert call["model"] == "openai/m-1" and call["stream"] is True and call["api_base"] == "http://llm"
+    assert call["messages"] == [{"role": "system", "content": "REC"}, {"role": "user", "content": "q"}]
+    assert provider.stats()["streaming"] is True and provider.stats()["recommend"]["count"] == 1
+
+
+def test_failures_are_timed_as_errors(provider):
+    with pytest.raises(RuntimeError):
+        asyncio.run(provider.complete("recommend", "fail"))
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect(provider.stream("compliment", "fail")))
+    stats = provider.stats()
+    assert stats["recommend"]["errors"] == 1 and stats["compliment"]["errors"] == 1
+
+
+def test_images_use_the_configured_model(provider):
+    assert asyncio.run(provider.generate_images("portrait", number_of_images=2)) == [b"png", b"png"]
+    assert provider.images.calls == [("portrait", "img-1", 2)]
+    assert provider.stats()["image"]["count"] == 1
@@ -0,0 +1,54 @@
+from movies_data import MOCK_MOVIES, MOVIE_TAGS
+from local_recommender import LocalRecommender, parse_query
+
+recommender = LocalRecommender(MOCK_MOVIES, MOVIE_TAGS)
+
+
+def top_ids(graph):
+    return [node["id"] for node in graph["nodes"] if node["is_top"]]
+
+
+def test_graph_shape():
+    graph = recommender.recommend("Мрачный триллер с неожиданной концовкой")
+    assert len(top_ids(graph)) == 5
+    assert 15 <= len(graph["nodes"]) <= 20
+    ids = {node["id"] for node in graph["nodes"]}
+    assert all(link["source"] in ids and link["target"] in ids for link in graph["links"])
+    assert graph["query_summary"]
+
+
+def test_genre_query_ranks_matching_films():
+    assert {"her", "ex_machina"} <= set(top_ids(recommender.recommend("Что-то про искусственный интеллект")))
+    assert "memento" in top_ids(recommender.recommend("films about memory loss"))
+
+
+def test_referenced_title_is_anchor_not_top_pick():
+    graph = recommender.recommend("Как Интерстеллара, но медленнее")
+    assert "interstellar" not in top_ids(graph)
+    assert "interstellar" in {node["id"] for node in graph["nodes"]}
+    assert "arrival" in top_ids(graph)
+
+
+def test_candidates_limit_scoring():
+    candidates = list(MOCK_MOVIES)[:20]
+    graph = recommender.recommend("Мрачный триллер", candidates)
+    assert {node["id"] for node in graph["nodes"]} <= set(candidates)
+    # Too few candidates to fill a graph: the whole catalog is scored
+    assert recommender.recommend("Мрачный триллер", ["memento"]) == recommender.recommend("Мрачный триллер")
+
+
+def test_ranking_matches_the_graph_and_sets_references_apart():
+    ranked, references = recommender.ranked("Как Интерстеллара, но медленнее")
+    assert references == ["interstellar"] and "interstellar" not in ranked
+    assert len(ranked) == len(MOCK_MOVIES) - 1
+    assert ranked[:5] == top_ids(recommender.recommend("Как Интерстеллара, но медленнее"))
+
+
+def test_negated_terms_count_against_films():
+    assert parse_query("Как Интерстеллар, но без космоса") == (["интерс"], ["космос"])
+    assert parse_query("не мрачный триллер") == (["трилле"], ["мрачны"])
+    # The app's own suggestion: "without space" must not push the space films up
+    assert not {"dune", "interstellar"} & set(top_ids(recommender.recommend("Как Интерстеллар, но без космоса")))
+    gloomy = {"prisoners", "seven", "shutter_island"}
+    assert gloomy <= set(top_ids(recommender.recommend("мрачный триллер")))
+    assert not gloomy & set(top_ids(recommender.recommend("не мрачный триллер")))
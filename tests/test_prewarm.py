@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+from prewarm import acquire_lease, popular_queries, prewarm, seconds_until
+
+
+class FakeHistory:
+    def __init__(self, rows):
+        self.rows = rows
+        self.pipeline = None
+
+    async def aggregate(self, pipeline):
+        self.pipeline = pipeline
+        for row in self.rows:
+            yield row
+
+
+def test_popular_queries_merges_normalized_variants():
+    history = FakeHistory([
+        {"_id": "Как Интерстеллар", "count": 5},
+        {"_id": "мрачный детектив", "count": 4},
+        {"_id": "  как интерстеллар!", "count": 2},
+        {"_id": "что-то грустное", "count": 1},
+    ])
+    result = asyncio.run(popular_queries(history, window_days=7, limit=2))
+    assert result == [("Как Интерстеллар", 7), ("мрачный детектив", 4)]
+    assert history.pipeline[-1] == {"$limit": 10}
+
+
+def test_prewarm_bounds_concurrency_and_reports():
+    active = 0
+    peak = 0
+
+    async def compute(query):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        if query == "bad":
+            raise RuntimeError("provider down")
+
+    report = asyncio.run(prewarm(["a", "b", "bad", "c", "d"], compute, concurrency=2))
+    assert peak == 2
+    assert report["candidates"] == 5
+    assert report["refreshed"] == 4
+    assert report["failed"] == 1
+
+
+def test_seconds_until_next_run():
+    now = datetime(2024, 1, 1, 3, 30, tzinfo=timezone.utc)
+    assert seconds_until(4, now) == 1800
+    assert seconds_until(3, now) == 23.5 * 3600
+
+
+class FakeLeases:
+    """update_one with Mongo's upsert semantics for the lease filter."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def update_one(self, query, update, upsert=False):
+        await asyncio.sleep(0)
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            self.docs[query["_id"]] = dict(update["$set"])
+            return
+        expired, owned = query["$or"]
+        if doc["expires_at"] <= expired["expires_at"]["$lte"] or doc["owner"] == owned["owner"]:
+            doc.update(update["$set"])
+            return
+        raise DuplicateKeyError("E11000 duplicate key error")
+
+
+def test_only_one_worker_takes_a_cycle_lease():
+    leases = FakeLeases()
+
+    async def race():
+        return await asyncio.gather(*(acquire_lease(leases, "prewarm:2024-01-01", f"worker-{i}", 60) for i in range(4)))
+
+    assert sorted(asyncio.run(race())) == [False, False, False, True]
+    owner = leases.docs["prewarm:2024-01-01"]["owner"]
+    assert asyncio.run(acquire_lease(leases, "prewarm:2024-01-01", owner, 60))
+    assert asyncio.run(acquire_lease(leases, "prewarm:2024-01-02", "worker-9", 60))
+
+
+def test_expired_lease_can_be_taken_over():
+    leases = FakeLeases()
+    assert asyncio.run(acquire_lease(leases, "prewarm", "crashed", 60))
+    leases.docs["prewarm"]["expires_at"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+    assert asyncio.run(acquire_lease(leases, "prewarm", "worker-2", 60))
+    assert leases.docs["prewarm"]["owner"] == "worker-2"
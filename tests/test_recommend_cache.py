@@ -0,0 +1,86 @@
+import asyncio
+import time
+from datetime import datetime, timezone, timedelta
+from typing import List
+
+from pydantic import BaseModel
+
+from recommend_cache import RecommendationCache, cache_key, normalize_query
+
+
+class Graph(BaseModel):
+    ids: List[str]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+        self.down = False
+
+    async def find_one(self, query, projection):
+        self.reads += 1
+        if self.down:
+            raise ConnectionError("mongo is down")
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc["expires_at"] <= query["expires_at"]["$gt"]:
+            return None
+        return doc
+
+    async def update_one(self, query, update, upsert=False):
+        if self.down:
+            raise ConnectionError("mongo is down")
+        self.docs.setdefault(query["_id"], {"_id": query["_id"]}).update(update["$set"])
+
+
+def test_normalized_queries_share_a_key():
+    assert normalize_query("  Мрачный   ТРИЛЛЕР!! ") == "мрачный триллер"
+    assert cache_key("Ёлки", "v1") == cache_key("елки", "v1") != cache_key("елки", "v2")
+
+
+def test_memory_hit_skips_the_store():
+    collection = FakeCollection()
+    cache = RecommendationCache(collection, Graph, "v1")
+    asyncio.run(cache.set("dark thriller", Graph(ids=["seven"])))
+    graph, tier = asyncio.run(cache.get("Dark thriller!"))
+    assert (graph.ids, tier) == (["seven"], "memory")
+    assert collection.reads == 0
+
+
+def test_store_fallback_promotes_to_memory():
+    collection = FakeCollection()
+    asyncio.run(RecommendationCache(collection, Graph, "v1").set("dark thriller", Graph(ids=["seven"])))
+    # A fresh worker has an empty memory tier but shares the collection
+    cache = RecommendationCache(collection, Graph, "v1")
+    graph, tier = asyncio.run(cache.get("dark thriller"))
+    assert (graph.ids, tier) == (["seven"], "store")
+    assert asyncio.run(cache.get("dark thriller"))[1] == "memory"
+    assert collection.reads == 1
+    assert asyncio.run(RecommendationCache(collection, Graph, "v2").get("dark thriller")) == (None, None)
+
+
+def test_expired_entries_miss_in_both_tiers():
+    collection = FakeCollection()
+    cache = RecommendationCache(collection, Graph, "v1", ttl=0.05)
+    asyncio.run(cache.set("dark thriller", Graph(ids=["seven"])))
+    time.sleep(0.06)
+    assert asyncio.run(cache.get("dark thriller")) == (None, None)
+    assert cache.stats()["store"]["misses"] == 1
+
+    # A store entry close to expiry is promoted only for its remaining lifetime
+    cache = RecommendationCache(collection, Graph, "v1")
+    key = cache_key("dark thriller", "v1")
+    collection.docs[key]["expires_at"] = datetime.now(timezone.utc) + timedelta(seconds=0.05)
+    assert asyncio.run(cache.get("dark thriller"))[1] == "store"
+    time.sleep(0.06)
+    assert asyncio.run(cache.get("dark thriller")) == (None, None)
+
+
+def test_store_errors_degrade_to_misses():
+    collection = FakeCollection()
+    collection.down = True
+    cache = RecommendationCache(collection, Graph, "v1")
+    asyncio.run(cache.set("dark thriller", Graph(ids=["seven"])))
+    assert asyncio.run(cache.get("dark thriller"))[1] == "memory"
+    assert asyncio.run(cache.get("something else")) == (None, None)
+    assert cache.stats()["store"]["errors"] == 2
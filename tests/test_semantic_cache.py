@@ -0,0 +1,53 @@
+from semantic_cache import SemanticCache, embed_query
+
+
+def test_rephrased_query_hits():
+    cache = SemanticCache(threshold=0.75, capacity=8, dim=2048)
+    cache.add("как Интерстеллар но медленнее", "graph")
+    response, similarity = cache.lookup("медленный фильм типа Интерстеллара")
+    assert response == "graph"
+    assert similarity >= 0.75
+
+
+def test_different_intent_misses():
+    cache = SemanticCache(threshold=0.75, capacity=8, dim=2048)
+    cache.add("как Интерстеллар но медленнее", "graph")
+    response, _ = cache.lookup("комедия про собак")
+    assert response is None
+    assert cache.stats()["lookups"] == 1 and cache.stats()["hits"] == 0
+
+
+def test_ring_buffer_replaces_oldest():
+    cache = SemanticCache(threshold=0.99, capacity=2, dim=512)
+    cache.add("мрачный триллер", 1)
+    cache.add("философская фантастика", 2)
+    cache.add("романтическая комедия", 3)
+    assert cache.lookup("мрачный триллер")[0] is None
+    assert cache.lookup("романтическая комедия")[0] == 3
+
+
+def test_embedding_is_unit_length():
+    vector = embed_query("Бегущий по лезвию", dim=256)
+    assert abs(float(vector @ vector) - 1.0) < 1e-5
+
+
+def test_negations_and_numbers_never_share_a_response():
+    cache = SemanticCache(threshold=0.75, capacity=8, dim=2048)
+    for query in ("мрачный триллер", "фильмы про космос", "мрачный триллер 90-х", "Как Дюна"):
+        cache.add(query, query)
+    for query in ("не мрачный триллер", "фильмы не про космос", "мрачный триллер 2010-х", "Как Дюна 2", "кино без космоса"):
+        response, similarity = cache.lookup(query)
+        assert response is None, (query, response, similarity)
+    assert cache.stats()["guarded"] >= 4
+    # The guard compares signatures, so same negation and same number still hit
+    assert cache.lookup("Кино про космос")[0] == "фильмы про космос"
+    assert cache.lookup("мрачные триллеры 90-х")[0] == "мрачный триллер 90-х"
+
+
+def test_guard_falls_back_to_an_eligible_entry():
+    cache = SemanticCache(threshold=0.75, capacity=8, dim=2048)
+    cache.add("не мрачный триллер", "negated")
+    cache.add("мрачный триллер нуар", "plain")
+    # The negated entry is the closest (0.95) but ineligible; the next one (0.89) is served
+    response, similarity = cache.lookup("мрачный триллер")
+    assert response == "plain" and similarity < 0.9
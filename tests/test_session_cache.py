@@ -0,0 +1,114 @@
+import asyncio
+import time
+from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
+
+from session_cache import SessionCache
+
+
+def make_user(user_id="user_1"):
+    return SimpleNamespace(user_id=user_id)
+
+
+def test_hit_after_set_and_counters():
+    cache = SessionCache(maxsize=10, ttl=60)
+    expires = datetime.now(timezone.utc) + timedelta(days=1)
+    assert cache.get("sess_a") is None
+    cache.set("sess_a", make_user(), expires)
+    assert cache.get("sess_a").user_id == "user_1"
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_expired_session_is_not_served():
+    cache = SessionCache(maxsize=10, ttl=60)
+    cache.set("sess_a", make_user(), datetime.now(timezone.utc) - timedelta(seconds=1))
+    assert cache.get("sess_a") is None
+
+
+def test_invalidate_user_drops_all_tokens():
+    cache = SessionCache(maxsize=10, ttl=60)
+    expires = datetime.now(timezone.utc) + timedelta(days=1)
+    cache.set("sess_a", make_user(), expires)
+    cache.set("sess_b", make_user(), expires)
+    cache.set("sess_c", make_user("user_2"), expires)
+    cache.invalidate_user("user_1")
+    assert cache.get("sess_a") is None
+    assert cache.get("sess_b") is None
+    assert cache.get("sess_c") is not None
+
+
+def test_lru_bound():
+    cache = SessionCache(maxsize=2, ttl=60)
+    expires = datetime.now(timezone.utc) + timedelta(days=1)
+    for token in ("a", "b", "c"):
+        cache.set(token, make_user(token), expires)
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_reverse_index_is_pruned_on_eviction():
+    cache = SessionCache(maxsize=2, ttl=60)
+    expires = datetime.now(timezone.utc) + timedelta(days=1)
+    for i in range(100):
+        cache.set(f"sess_{i}", make_user(f"user_{i}"), expires)
+    assert cache.stats()["indexed_users"] == 2
+    cache.set("short", make_user("user_x"), datetime.now(timezone.utc) + timedelta(milliseconds=1))
+    time.sleep(0.01)
+    assert cache.get("short") is None
+    assert "user_x" not in cache._tokens_by_user
+
+
+def test_set_from_before_an_invalidation_is_dropped():
+    cache = SessionCache(maxsize=10, ttl=60)
+    expires = datetime.now(timezone.utc) + timedelta(days=1)
+    generation = cache.generation()
+    # A logout lands while the user is being read from the database
+    cache.invalidate("sess_a")
+    cache.set("sess_a", make_user(), expires, generation)
+    assert cache.get("sess_a") is None
+    assert cache.stats()["stale_sets"] == 1
+    cache.set("sess_a", make_user(), expires, cache.generation())
+    assert cache.get("sess_a") is not None
+
+
+def test_logout_on_another_worker_is_seen_after_the_recheck_window():
+    # Two workers share user_sessions but each has its own cache
+    sessions = {"sess_a"}
+    reads = []
+
+    async def session_exists(token):
+        reads.append(token)
+        return token in sessions
+
+    worker_a = SessionCache(maxsize=10, ttl=60, recheck_after=0.05)
+    worker_b = SessionCache(maxsize=10, ttl=60, recheck_after=0.05)
+    expires = datetime.now(timezone.utc) + timedelta(days=1)
+    worker_a.set("sess_a", make_user(), expires)
+    worker_b.set("sess_a", make_user(), expires)
+
+    # Worker B serves the logout: deletes the session, invalidates its own cache only
+    sessions.discard("sess_a")
+    worker_b.invalidate("sess_a")
+    assert asyncio.run(worker_b.get_verified("sess_a", session_exists)) is None
+
+    # Worker A still honours the token inside the window, without a read
+    assert asyncio.run(worker_a.get_verified("sess_a", session_exists)) is not None
+    assert reads == []
+    time.sleep(0.06)
+    assert asyncio.run(worker_a.get_verified("sess_a", session_exists)) is None
+    assert reads == ["sess_a"]
+    assert worker_a.get("sess_a") is None
+
+
+def test_recheck_confirms_a_live_session():
+    async def session_exists(token):
+        return True
+
+    cache = SessionCache(maxsize=10, ttl=60, recheck_after=0.0)
+    cache.set("sess_a", make_user(), datetime.now(timezone.utc) + timedelta(days=1))
+    time.sleep(0.001)
+    assert asyncio.run(cache.get_verified("sess_a", session_exists)).user_id == "user_1"
+    assert cache.stats()["rechecks"] == 1
+    # Without recheck_after (signed sessions) hits never go back to the database
+    assert not SessionCache(maxsize=10, ttl=60).needs_recheck("sess_a")
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from session_tokens import RevocationList, SignedSessionCodec
+
+
+def test_round_trip():
+    codec = SignedSessionCodec("secret")
+    expires = datetime.now(timezone.utc) + timedelta(hours=1)
+    token, jti = codec.issue("user_1", expires)
+    claims = codec.verify(token)
+    assert claims["user_id"] == "user_1"
+    assert claims["jti"] == jti
+    assert int(claims["expires_at"].timestamp()) == int(expires.timestamp())
+
+
+def test_rejects_tampered_and_foreign_tokens():
+    codec = SignedSessionCodec("secret")
+    token, _ = codec.issue("user_1", datetime.now(timezone.utc) + timedelta(hours=1))
+    prefix, payload, signature = token.split(".")
+    assert codec.verify(f"{prefix}.{payload}x.{signature}") is None
+    assert SignedSessionCodec("other").verify(token) is None
+    assert codec.verify("sess_0123456789abcdef") is None
+
+
+def test_rejects_expired_token():
+    codec = SignedSessionCodec("secret")
+    token, _ = codec.issue("user_1", datetime.now(timezone.utc) - timedelta(seconds=1))
+    assert codec.verify(token) is None
+
+
+class FlakyCollection:
+    def __init__(self):
+        self.docs = []
+        self.fail = False
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.append(update["$set"])
+
+    def find(self, query, projection):
+        return self
+
+    async def to_list(self, length):
+        if self.fail:
+            raise ConnectionError("mongo is down")
+        return list(self.docs)
+
+
+def test_revocation_refresh_keeps_last_known_list_on_db_errors():
+    collection = FlakyCollection()
+    expires = datetime.now(timezone.utc) + timedelta(hours=1)
+    collection.docs.append({"jti": "elsewhere", "expires_at": expires})
+    revocations = RevocationList(collection, refresh_interval=0)
+    asyncio.run(revocations.refresh_if_stale())
+    assert revocations.is_revoked("elsewhere")
+
+    collection.fail = True
+    asyncio.run(revocations.refresh_if_stale())
+    assert revocations.is_revoked("elsewhere")
+    assert revocations.refresh_errors == 1
@@ -0,0 +1,67 @@
+import numpy as np
+
+from similarity import SimilarityMatrix, SparseRows
+
+
+def make_matrix():
+    vectors = np.array([[1, 0], [0.9, 0.1], [0, 1], [0.1, 0.9], [0.7, 0.7]], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return SimilarityMatrix(["a", "b", "c", "d", "e"], vectors)
+
+
+def connected(ids, links):
+    adjacency = {movie_id: set() for movie_id in ids}
+    for link in links:
+        adjacency[link["source"]].add(link["target"])
+        adjacency[link["target"]].add(link["source"])
+    seen, stack = {ids[0]}, [ids[0]]
+    while stack:
+        for other in adjacency[stack.pop()] - seen:
+            seen.add(other)
+            stack.append(other)
+    return seen == set(ids)
+
+
+def test_links_are_connected_and_deduplicated():
+    matrix = make_matrix()
+    ids = ["a", "c", "b", "d"]
+    links = matrix.links_for(ids, neighbours=1)
+    assert connected(ids, links)
+    pairs = [frozenset((link["source"], link["target"])) for link in links]
+    assert len(pairs) == len(set(pairs))
+    assert all(link["source"] != link["target"] for link in links)
+
+
+def test_attach_picks_most_similar_predecessor():
+    matrix = make_matrix()
+    assert matrix.attach("b", ["c", "a"])["source"] == "a"
+    assert matrix.attach("b", []) is None
+    assert matrix.attach("unknown", ["a"]) is None
+
+
+def test_small_sets_and_stats():
+    matrix = make_matrix()
+    assert matrix.links_for(["a"]) == []
+    assert len(matrix.links_for(["a", "b"], neighbours=3)) == 1
+    # Eight non-zeros stored sparse, never a films x films matrix
+    assert matrix.stats()["nonzeros"] == 8
+    assert matrix.stats()["bytes"] == 6 * 8 + 8 * 4 + 8 * 4
+    assert matrix.stats()["calls"]["count"] == 2 and "build_ms" not in matrix.stats()
+
+
+def test_sparse_rows_match_dense_products():
+    dense = np.array([[0, 2, 0, 1], [0, 0, 0, 0], [3, 0, 0, 0], [0, 0, 0, 0]], dtype=np.float32)
+    rows = SparseRows.from_dense(dense)
+    vector = np.array([1, 2, 3, 4], dtype=np.float32)
+    assert rows.dot(vector).tolist() == (dense @ vector).tolist()
+    block = rows.dense([2, 0])
+    assert (block @ block.T).tolist() == (dense[[2, 0]] @ dense[[2, 0]].T).tolist()
+    assert rows.dense([1, 3]).shape == (2, 0)
+
+
+def test_links_match_dense_cosine():
+    matrix = make_matrix()
+    vectors = np.array([[1, 0], [0.9, 0.1]], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = SimilarityMatrix.strength(float(vectors[0] @ vectors[1]))
+    assert matrix.attach("b", ["a"]) == {"source": "a", "target": "b", "strength": expected}
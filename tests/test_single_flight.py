@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "graph"
+
+    async def run():
+        return await asyncio.gather(*(flights.do("q", work) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["graph"] * 10
+    assert calls == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 9}
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flights.do("q", work))
+        second = asyncio.ensure_future(flights.do("q", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_errors_propagate_and_key_is_released():
+    flights = SingleFlight()
+
+    async def boom():
+        raise ValueError("provider down")
+
+    async def ok():
+        return "ok"
+
+    async def run():
+        with pytest.raises(ValueError):
+            await flights.do("q", boom)
+        return await flights.do("q", ok)
+
+    assert asyncio.run(run()) == "ok"
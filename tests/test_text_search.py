@@ -0,0 +1,35 @@
+from movies_data import MOCK_MOVIES, MOVIE_TAGS
+from catalog_service import CatalogService
+from text_search import InvertedIndex, analyze, stem
+
+catalog = CatalogService(MOCK_MOVIES, MOVIE_TAGS)
+
+
+def test_stemming_merges_inflections():
+    assert stem("памяти") == stem("память")
+    assert stem("одиночестве") == stem("одиночество")
+    assert stem("memories") == stem("memory")
+    assert stem("communicating") == stem("communicate")
+    assert analyze("Films about the loss") == ["loss"]
+
+
+def test_content_queries_in_both_languages():
+    assert catalog.text.search("films about memory loss")[0][0] == "memento"
+    assert catalog.text.search("про одиночество")[0][0] == "her"
+    assert catalog.search_text("aliens", limit=1)[0]["match"] == "text"
+
+
+def test_index_updates_incrementally():
+    index = InvertedIndex({"body": 1.0})
+    index.add("a", {"body": "a heist in a dream"})
+    index.add("b", {"body": "a quiet drama about a family"})
+    assert [doc_id for doc_id, _ in index.search("dreams")] == ["a"]
+
+    index.add("a", {"body": "a family road trip"})
+    assert index.search("dreams") == []
+    assert {doc_id for doc_id, _ in index.search("family")} == {"a", "b"}
+
+    index.remove("b")
+    assert len(index) == 1
+    assert index.stats()["postings"] == 3
+    assert index.search("family", allowed={"b"}) == []